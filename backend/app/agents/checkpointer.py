@@ -0,0 +1,206 @@
+"""LangGraph checkpointer selection and a MongoDB-backed checkpoint saver."""
+import logging
+import os
+import random
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.db.indexes import ensure_indexes
+from app.db.repositories import GraphCheckpointRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _pack(typed: Tuple[str, bytes]) -> Dict[str, Any]:
+    type_, data = typed
+    return {"type": type_, "data": data}
+
+
+def _unpack(document: Dict[str, Any]) -> Tuple[str, bytes]:
+    return document["type"], bytes(document["data"])
+
+
+class MongoCheckpointSaver(BaseCheckpointSaver):
+    """
+    Async LangGraph checkpoint saver storing the latest checkpoint per thread in MongoDB.
+
+    Paused plans only ever resume from their latest checkpoint, so history
+    is not kept: each thread is one document holding the checkpoint, its
+    channel values and the pending writes for the step in progress.
+    """
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Versions carry a random fraction, as in LangGraph's own savers, so
+        # parallel branches never tie and update_state can tell which node
+        # wrote last.
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    async def setup(self) -> None:
+        """Create the registry's indexes for the checkpoint collection (lifespan applies them all at startup)."""
+        await ensure_indexes([GraphCheckpointRepository.COLLECTION])
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        document = await GraphCheckpointRepository.get(thread_id, checkpoint_ns)
+        if not document:
+            return None
+
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id and checkpoint_id != document["checkpoint_id"]:
+            return None
+
+        checkpoint: Checkpoint = self.serde.loads_typed(_unpack(document["checkpoint"]))
+        blobs = document.get("blobs", {})
+        channel_values = {
+            channel: self.serde.loads_typed(_unpack(blobs[channel]))
+            for channel in checkpoint["channel_versions"]
+            if channel in blobs
+        }
+        writes = sorted(document.get("writes", {}).values(), key=lambda w: (w["task_id"], w["idx"]))
+        parent_checkpoint_id = document.get("parent_checkpoint_id")
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": document["checkpoint_id"]
+                }
+            },
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed(_unpack(document["metadata"])),
+            pending_writes=[
+                (w["task_id"], w["channel"], self.serde.loads_typed(_unpack(w["value"]))) for w in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            )
+        )
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        # Only the latest checkpoint per thread is stored
+        if not config:
+            return
+        checkpoint_tuple = await self.aget_tuple(config)
+        if checkpoint_tuple is None:
+            return
+        if before and (before_id := get_checkpoint_id(before)):
+            if checkpoint_tuple.config["configurable"]["checkpoint_id"] >= before_id:
+                return
+        if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+            return
+        if limit is not None and limit <= 0:
+            return
+        yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        values: Dict[str, Any] = checkpoint.pop("channel_values")
+
+        blobs = {}
+        removed_channels = []
+        for channel, version in new_versions.items():
+            if channel in values:
+                blobs[channel] = {"version": version, **_pack(self.serde.dumps_typed(values[channel]))}
+            else:
+                removed_channels.append(channel)
+
+        await GraphCheckpointRepository.put(
+            thread_id,
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            _pack(self.serde.dumps_typed(checkpoint)),
+            _pack(self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))),
+            blobs,
+            removed_channels
+        )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"]
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        entries = {}
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            entries[f"{task_id}|{write_idx}"] = {
+                "task_id": task_id,
+                "idx": write_idx,
+                "channel": channel,
+                "value": _pack(self.serde.dumps_typed(value)),
+                "task_path": task_path
+            }
+        if entries:
+            await GraphCheckpointRepository.put_writes(thread_id, checkpoint_ns, checkpoint_id, entries)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await GraphCheckpointRepository.delete_thread(thread_id)
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """
+    Build the graph checkpointer from CHECKPOINT_BACKEND.
+
+    "mongo" (default) persists paused graphs so any worker can resume them;
+    "memory" keeps them in-process (development and tests).
+    """
+    backend = os.getenv("CHECKPOINT_BACKEND", "mongo").lower()
+    if backend == "memory":
+        return MemorySaver()
+    return MongoCheckpointSaver()
@@ -1,8 +1,9 @@
 """LangGraph workflow definition."""
+import inspect
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Callable
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 
 from app.agents.state import AgentState
 from app.agents.nodes import (
@@ -10,14 +11,33 @@ from app.agents.nodes import (
     invoice_agent_node,
     closing_agent_node,
     audit_agent_node,
-    approval_checkpoint_node
+    approval_checkpoint_node,
+    extraction_review_node,
+    hitl_agent_node,
+    merge_results_node
 )
 from app.agents.salesforce_node import salesforce_agent_node
 from app.agents.zoho_agent_node import zoho_agent_node
 from app.agents.supervisor import supervisor_router
+from app.agents.checkpointer import create_checkpointer
 
 logger = logging.getLogger(__name__)
 
+# Nodes the graph pauses before, waiting for a human decision
+PLAN_APPROVAL_NODE = "approval"
+EXTRACTION_REVIEW_NODE = "extraction_review"
+HITL_NODE = "hitl"
+HUMAN_GATES = [PLAN_APPROVAL_NODE, EXTRACTION_REVIEW_NODE, HITL_NODE]
+MERGE_NODE = "merge"
+
+SPECIALIZED_AGENTS = {
+    "invoice": invoice_agent_node,
+    "closing": closing_agent_node,
+    "audit": audit_agent_node,
+    "salesforce": salesforce_agent_node,
+    "zoho": zoho_agent_node
+}
+
 
 def should_continue_after_approval(state: AgentState) -> str:
     """Check if approval was granted."""
@@ -27,49 +47,125 @@ def should_continue_after_approval(state: AgentState) -> str:
         return "end"
 
 
-def create_agent_graph():
+def route_after_approval(state: AgentState) -> str:
+    """After plan approval, hand off to the supervisor's choice of agent; stop if rejected."""
+    if should_continue_after_approval(state) == "continue":
+        return supervisor_router(state)
+    return "end"
+
+
+def with_result_tracking(name: str, node: Callable) -> Callable:
+    """
+    Wrap a specialized agent node so its output is also recorded under
+    `agent_results[name]` for the merge node.
+    """
+    accepts_config = "config" in inspect.signature(node).parameters
+
+    async def tracked_node(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        result = node(state, config) if accepts_config else node(state)
+        if inspect.isawaitable(result):
+            result = await result
+        return {
+            **result,
+            "agent_results": {
+                name: {
+                    "agent": result.get("current_agent", name.capitalize()),
+                    "final_result": result.get("final_result", "")
+                }
+            }
+        }
+
+    tracked_node.__name__ = getattr(node, "__name__", name)
+    return tracked_node
+
+
+def route_after_agent(state: AgentState) -> str:
+    """Merge parallel branches first; otherwise go to review."""
+    if len(state.get("next_agents") or []) > 1:
+        return MERGE_NODE
+    return route_to_review(state)
+
+
+def route_to_review(state: AgentState) -> str:
+    """Send agent results to extraction review, HITL review, or finish."""
+    if state.get("requires_extraction_approval"):
+        return EXTRACTION_REVIEW_NODE
+    if state.get("require_hitl"):
+        return HITL_NODE
+    return "end"
+
+
+def route_after_hitl(state: AgentState) -> str:
+    """Finish when the user approved; otherwise route the revision back to the agent."""
+    if state.get("hitl_approved"):
+        return "end"
+    return supervisor_router(state)
+
+
+def create_agent_graph(checkpointer=None):
     """
     Create multi-agent LangGraph workflow with supervisor routing.
-    Phase 6: Simplified - approval handled in service layer, not graph.
+
+    planner → [approval] → specialized agent(s) → (merge) → [extraction_review | hitl] → END
+
+    The graph interrupts before each human gate; the service sets the
+    decision on the paused thread (thread_id = plan_id) and resumes it with
+    `ainvoke(None, config)`, so completed nodes are never re-run. A HITL
+    revision loops back to the specialized agent.
+
+    When the planner names several agents the supervisor fans out to them
+    as parallel branches, and the merge node combines their results.
     """
     # Create the graph
     workflow = StateGraph(AgentState)
-    
+
     # Add nodes
     workflow.add_node("planner", planner_node)
-    workflow.add_node("invoice", invoice_agent_node)
-    workflow.add_node("closing", closing_agent_node)
-    workflow.add_node("audit", audit_agent_node)
-    workflow.add_node("salesforce", salesforce_agent_node)
-    workflow.add_node("zoho", zoho_agent_node)
-    
+    workflow.add_node(PLAN_APPROVAL_NODE, approval_checkpoint_node)
+    for name, node in SPECIALIZED_AGENTS.items():
+        workflow.add_node(name, with_result_tracking(name, node))
+    workflow.add_node(MERGE_NODE, merge_results_node)
+    workflow.add_node(EXTRACTION_REVIEW_NODE, extraction_review_node)
+    workflow.add_node(HITL_NODE, hitl_agent_node)
+
+    agent_routes = {name: name for name in SPECIALIZED_AGENTS}
+
     # Set entry point
     workflow.set_entry_point("planner")
-    
-    # Add conditional edges from planner (supervisor routing)
+    workflow.add_edge("planner", PLAN_APPROVAL_NODE)
+
+    # Supervisor routing once the plan is approved
     workflow.add_conditional_edges(
-        "planner",
-        supervisor_router,
-        {
-            "invoice": "invoice",
-            "closing": "closing",
-            "audit": "audit",
-            "salesforce": "salesforce",
-            "zoho": "zoho",
-            "end": END
-        }
+        PLAN_APPROVAL_NODE,
+        route_after_approval,
+        {**agent_routes, "end": END}
     )
-    
-    # Add edges from specialized agents to end
-    workflow.add_edge("invoice", END)
-    workflow.add_edge("closing", END)
-    workflow.add_edge("audit", END)
-    workflow.add_edge("salesforce", END)
-    workflow.add_edge("zoho", END)
-    
+
+    # Specialized agents go to merge (parallel runs), review, or finish
+    review_routes = {EXTRACTION_REVIEW_NODE: EXTRACTION_REVIEW_NODE, HITL_NODE: HITL_NODE, "end": END}
+    for name in SPECIALIZED_AGENTS:
+        workflow.add_conditional_edges(
+            name,
+            route_after_agent,
+            {MERGE_NODE: MERGE_NODE, **review_routes}
+        )
+    workflow.add_conditional_edges(MERGE_NODE, route_to_review, review_routes)
+
+    workflow.add_edge(EXTRACTION_REVIEW_NODE, END)
+
+    # HITL: approve ends, revision loops back to the specialized agent
+    workflow.add_conditional_edges(
+        HITL_NODE,
+        route_after_hitl,
+        {**agent_routes, "end": END}
+    )
+
     # Compile the graph
-    graph = workflow.compile()
-    
+    graph = workflow.compile(
+        checkpointer=checkpointer or create_checkpointer(),
+        interrupt_before=HUMAN_GATES
+    )
+
     logger.info("Multi-agent graph created successfully")
     return graph
 
@@ -1,7 +1,10 @@
 """Agent node implementations."""
 import logging
 import os
-from typing import Dict, Any
+import re
+from typing import Dict, Any, Optional
+
+from langchain_core.runnables import RunnableConfig
 
 from app.agents.state import AgentState
 from app.services.llm_service import LLMService
@@ -78,6 +81,27 @@ def detect_invoice_text(text: str) -> bool:
 
 logger = logging.getLogger(__name__)
 
+# External systems whose agents also run (in parallel) when the task names them
+# alongside the primary agent; matched as whole words
+AGENT_MENTIONS = {
+    "zoho": re.compile(r"\bzoho\b"),
+    "salesforce": re.compile(r"\bsalesforce\b")
+}
+
+
+def get_websocket_manager(state: AgentState, config: Optional[RunnableConfig] = None):
+    """
+    Get the WebSocket manager for a node.
+    
+    Graph runs pass it in ``config["configurable"]`` so it stays out of the
+    checkpointed state; direct callers may still put it in the state.
+    """
+    if config:
+        manager = config.get("configurable", {}).get("websocket_manager")
+        if manager is not None:
+            return manager
+    return state.get("websocket_manager")
+
 
 def planner_node(state: AgentState) -> Dict[str, Any]:
     """
@@ -119,21 +143,36 @@ def planner_node(state: AgentState) -> Dict[str, Any]:
         next_agent = "invoice"
         response = "I've analyzed your task. Routing to Invoice Agent for processing."
     
+    # Fan out to other systems the task names explicitly, e.g.
+    # "reconcile the Zoho invoice against the Salesforce opportunity".
+    # Pasted invoice text never fans out: a vendor or line item naming a
+    # system isn't a request to query it.
+    next_agents = [next_agent]
+    if os.getenv("ENABLE_PARALLEL_AGENTS", "true").lower() == "true" and not detect_invoice_text(task):
+        next_agents += [
+            agent for agent, pattern in AGENT_MENTIONS.items()
+            if agent != next_agent and pattern.search(task_lower)
+        ]
+    if len(next_agents) > 1:
+        agent_list = " and ".join(f"{agent.capitalize()} Agent" for agent in next_agents)
+        response = f"I've analyzed your task: It spans multiple systems. Routing to {agent_list} in parallel."
+    
     return {
         "messages": [response],
         "current_agent": "Planner",
-        "next_agent": next_agent
+        "next_agent": next_agent,
+        "next_agents": next_agents
     }
 
 
-async def invoice_agent_node(state: AgentState) -> Dict[str, Any]:
+async def invoice_agent_node(state: AgentState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Invoice agent node - handles invoice management with structured extraction.
     Supports both structured extraction and text analysis.
     """
     task = state["task_description"]
     plan_id = state["plan_id"]
-    websocket_manager = state.get("websocket_manager")
+    websocket_manager = get_websocket_manager(state, config)
     
     logger.info(f"Invoice Agent processing task for plan {plan_id}")
     
@@ -150,7 +189,6 @@ async def invoice_agent_node(state: AgentState) -> Dict[str, Any]:
             # Import here to avoid errors if not installed
             from app.services.langextract_service import LangExtractService
             from datetime import datetime
-            import asyncio
             
             # Send initial processing message via WebSocket
             if websocket_manager:
@@ -164,8 +202,6 @@ async def invoice_agent_node(state: AgentState) -> Dict[str, Any]:
                         "timestamp": datetime.utcnow().isoformat() + "Z"
                     }
                 })
-                # Small delay to ensure message is sent before extraction starts
-                await asyncio.sleep(0.1)
             
             # Extract structured data
             logger.info(f"📊 [Invoice Agent] Starting extraction for plan {plan_id}")
@@ -194,8 +230,6 @@ async def invoice_agent_node(state: AgentState) -> Dict[str, Any]:
                         "timestamp": datetime.utcnow().isoformat() + "Z"
                     }
                 })
-                # Small delay to ensure message is sent before returning
-                await asyncio.sleep(0.1)
             
             # Store extraction result in state for HITL approval
             # DO NOT store to database yet - wait for human approval
@@ -240,7 +274,7 @@ async def invoice_agent_node(state: AgentState) -> Dict[str, Any]:
         }
     
     # Build prompt for LLM
-    prompt = build_invoice_prompt(task)
+    prompt = build_invoice_prompt(task, state.get("execution_context"))
     
     # Call LLM with streaming if websocket_manager is available
     if websocket_manager:
@@ -317,25 +351,65 @@ def audit_agent_node(state: AgentState) -> Dict[str, Any]:
     }
 
 
+def merge_results_node(state: AgentState) -> Dict[str, Any]:
+    """
+    Merge node - combines the results of agents that ran in parallel.
+    Each branch records its output in `agent_results`; the combined result
+    replaces the last-write-wins `final_result` for review and completion.
+    """
+    plan_id = state["plan_id"]
+    agents = state.get("next_agents") or []
+    results = state.get("agent_results") or {}
+    
+    merged = [results[agent] for agent in agents if agent in results]
+    logger.info(f"Merging results from {len(merged)} agents for plan {plan_id}")
+    
+    final_result = "\n\n".join(
+        f"### {result['agent']}\n\n{result['final_result']}" for result in merged
+    )
+    
+    return {
+        "current_agent": " + ".join(result["agent"] for result in merged),
+        "final_result": final_result
+    }
+
+
 def approval_checkpoint_node(state: AgentState) -> Dict[str, Any]:
     """
-    Approval checkpoint node - requests human approval before proceeding.
-    Phase 6: Sets approval_required flag and waits for human input.
+    Approval checkpoint node - records the human plan approval decision.
+    The graph interrupts before this node; the service sets `approved`
+    on the paused state and resumes, so this runs once the user decided.
+    """
+    plan_id = state["plan_id"]
+    
+    logger.info(f"Approval checkpoint passed for plan {plan_id}: approved={state.get('approved')}")
+    
+    return {
+        "approval_required": False
+    }
+
+
+def extraction_review_node(state: AgentState) -> Dict[str, Any]:
+    """
+    Extraction review node - records the human extraction review decision.
+    The graph interrupts before this node while the user reviews the
+    extracted invoice data; `extraction_approved` is set on resume.
     """
     plan_id = state["plan_id"]
     
-    logger.info(f"Approval checkpoint reached for plan {plan_id}")
+    logger.info(f"Extraction review passed for plan {plan_id}: approved={state.get('extraction_approved')}")
     
     return {
-        "approval_required": True,
-        "approved": None
+        "requires_extraction_approval": False
     }
 
 
 def hitl_agent_node(state: AgentState) -> Dict[str, Any]:
     """
-    Human-in-the-Loop (HITL) agent node - requests human approval or revision.
-    Phase 7: Takes specialized agent result and formats clarification request.
+    Human-in-the-Loop (HITL) agent node - applies the human approval or revision.
+    Phase 7: The graph interrupts before this node while the user reviews the
+    specialized agent result; on resume it records the review and the graph
+    either ends (approved) or routes the revision back to the agent.
     
     **Feature: multi-agent-hitl-loop, Property 1: HITL Routing**
     **Validates: Requirements 1.1, 1.2**
@@ -354,8 +428,7 @@ def hitl_agent_node(state: AgentState) -> Dict[str, Any]:
     )
     
     return {
-        "messages": [clarification_message],
         "current_agent": "HITL",
-        "clarification_required": True,
+        "clarification_required": False,
         "clarification_message": clarification_message
     }
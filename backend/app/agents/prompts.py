@@ -1,5 +1,6 @@
 """Prompt templates for specialized agents."""
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -67,12 +68,13 @@ Please analyze this audit-related task and provide:
 Provide your analysis in a clear, structured format. If the task description lacks specific audit details, work with the information provided and note what additional information would be helpful."""
 
 
-def build_invoice_prompt(task_description: str) -> str:
+def build_invoice_prompt(task_description: str, execution_context: Optional[str] = None) -> str:
     """
     Build invoice agent prompt with task details.
     
     Args:
         task_description: The user's task description
+        execution_context: Plan history from earlier iterations (revision runs)
         
     Returns:
         str: Formatted prompt ready for LLM
@@ -82,6 +84,8 @@ def build_invoice_prompt(task_description: str) -> str:
         task_description = "No specific task provided. Please provide general invoice analysis guidance."
     
     prompt = INVOICE_AGENT_PROMPT.format(task_description=task_description.strip())
+    if execution_context:
+        prompt += f"\n\nFor context, the plan so far:\n{execution_context.strip()}"
     logger.debug(f"Built invoice prompt (length: {len(prompt)} chars)")
     return prompt
 
@@ -1,14 +1,17 @@
 """Salesforce agent node for LangGraph."""
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from langchain_core.runnables import RunnableConfig
+
+from app.agents.nodes import get_websocket_manager
 from app.agents.state import AgentState
 from app.services.salesforce_mcp_service import get_salesforce_service
 
 logger = logging.getLogger(__name__)
 
 
-async def salesforce_agent_node(state: AgentState) -> Dict[str, Any]:
+async def salesforce_agent_node(state: AgentState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Salesforce agent node - handles Salesforce data queries and operations.
     
@@ -19,7 +22,7 @@ async def salesforce_agent_node(state: AgentState) -> Dict[str, Any]:
     """
     task = state["task_description"]
     plan_id = state["plan_id"]
-    websocket_manager = state.get("websocket_manager")
+    websocket_manager = get_websocket_manager(state, config)
     
     logger.info(f"Salesforce Agent processing task for plan {plan_id}")
     
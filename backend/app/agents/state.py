@@ -1,22 +1,39 @@
 """Agent state definitions for LangGraph."""
-from typing import TypedDict, Annotated, Sequence, Optional, Any
+from typing import TypedDict, Annotated, Sequence, Optional, Any, Dict, List
 import operator
 
 
+def keep_last(current: Any, update: Any) -> Any:
+    """Reducer allowing parallel agent branches to write the same key in one step (last write wins)."""
+    return update
+
+
+def merge_agent_results(current: Optional[Dict[str, Any]], update: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Reducer combining per-agent results written by parallel branches."""
+    return {**(current or {}), **(update or {})}
+
+
 class AgentState(TypedDict):
     """State for agent workflow."""
     messages: Annotated[Sequence[str], operator.add]
     plan_id: str
     session_id: str
     task_description: str
-    current_agent: str
+    execution_context: Optional[str]  # Bounded plan history for revision runs, kept out of task_description
+    current_agent: Annotated[str, keep_last]
     next_agent: Optional[str]
-    final_result: str
+    next_agents: Optional[List[str]]  # Agents to run in parallel (planner fan-out)
+    final_result: Annotated[str, keep_last]
+    agent_results: Annotated[Dict[str, Dict[str, Any]], merge_agent_results]  # Per-agent results for merging
     approval_required: bool
     approved: Optional[bool]
-    websocket_manager: Optional[Any]  # WebSocket manager for streaming
+    websocket_manager: Optional[Any]  # WebSocket manager for streaming (graph runs pass it via config instead)
     llm_provider: Optional[str]  # Override LLM provider
     llm_temperature: Optional[float]  # Override temperature
     extraction_result: Optional[Any]  # Stores extraction for HITL approval
     requires_extraction_approval: Optional[bool]  # Flag for extraction approval
     extraction_approved: Optional[bool]  # Extraction approval status
+    require_hitl: Optional[bool]  # Route specialized agent results to HITL review
+    hitl_approved: Optional[bool]  # HITL review outcome (False = revision requested)
+    clarification_required: Optional[bool]  # HITL review pending
+    clarification_message: Optional[str]  # Formatted HITL review message
@@ -1,17 +1,27 @@
 """Supervisor logic for routing between agents."""
 import logging
-from typing import Literal
+from typing import List, Literal, Union
 
 from app.agents.state import AgentState
 
 logger = logging.getLogger(__name__)
 
 
-def supervisor_router(state: AgentState) -> Literal["invoice", "closing", "audit", "salesforce", "zoho", "end"]:
+AgentName = Literal["invoice", "closing", "audit", "salesforce", "zoho", "end"]
+
+
+def supervisor_router(state: AgentState) -> Union[AgentName, List[AgentName]]:
     """
-    Supervisor router - decides which agent to call next.
+    Supervisor router - decides which agent(s) to call next.
     Routes based on planner's decision, including Salesforce agent.
+    Returns a list when the planner fanned out, so LangGraph runs the
+    agents as parallel branches.
     """
+    next_agents = state.get("next_agents") or []
+    if len(next_agents) > 1:
+        logger.info(f"Supervisor routing in parallel to: {', '.join(next_agents)}")
+        return list(next_agents)
+    
     next_agent = state.get("next_agent")
     
     if next_agent:
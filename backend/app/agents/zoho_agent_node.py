@@ -1,14 +1,17 @@
 """Zoho Invoice agent node for LangGraph."""
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from langchain_core.runnables import RunnableConfig
+
+from app.agents.nodes import get_websocket_manager
 from app.agents.state import AgentState
 from app.services.zoho_mcp_service import get_zoho_service
 
 logger = logging.getLogger(__name__)
 
 
-async def zoho_agent_node(state: AgentState) -> Dict[str, Any]:
+async def zoho_agent_node(state: AgentState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Zoho Invoice agent node - handles Zoho Invoice operations.
     
@@ -20,7 +23,7 @@ async def zoho_agent_node(state: AgentState) -> Dict[str, Any]:
     """
     task = state["task_description"]
     plan_id = state["plan_id"]
-    websocket_manager = state.get("websocket_manager")
+    websocket_manager = get_websocket_manager(state, config)
     
     logger.info(f"Zoho Agent processing task for plan {plan_id}")
     
@@ -1,42 +1,92 @@
 """API v3 routes."""
+import base64
+import binascii
+import hashlib
 import logging
+import os
 import uuid
-from typing import List, Optional
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 import asyncio
 
-from fastapi import APIRouter, Query, HTTPException, BackgroundTasks, File, UploadFile
+from fastapi import APIRouter, Query, HTTPException, File, Form, Header, Response, UploadFile
 
 from app.models.plan import Plan, PlanResponse, ProcessRequestInput, ProcessRequestResponse, Step
+from app.models.batch import BatchRequestInput, BatchResponse, BatchSummary
 from app.models.message import AgentMessage
 from app.models.team import TeamConfiguration
-from app.models.approval import PlanApprovalRequest, PlanApprovalResponse
-from app.db.repositories import PlanRepository, MessageRepository
+from app.models.approval import (
+    PlanApprovalRequest, PlanApprovalResponse, PendingApproval, BulkApprovalRequest, BulkApprovalResponse
+)
+from app.db.indexes import IDEMPOTENCY_WINDOW_SECONDS
+from app.db.plan_cache import plan_cache
+from app.db.repositories import (
+    PlanRepository, MessageRepository, BatchRepository, ApprovalAuditRepository, IdempotencyRepository
+)
 from app.services.agent_service import AgentService
 from app.services.file_parser_service import FileParserService
+from app.services.job_queue import job_queue, PLAN_JOB, APPROVAL_JOB, BATCH_JOB, QueueFullError, QueueClosedError
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v3", tags=["v3"])
 
+# Seconds clients are asked to wait before retrying when the job queue is full
+QUEUE_RETRY_AFTER = "5"
 
-@router.post("/process_request", response_model=ProcessRequestResponse)
-async def process_request(request: ProcessRequestInput, background_tasks: BackgroundTasks):
-    """
-    Process a new task request and create a plan.
-    Phase 3: Integrates with LangGraph agent execution.
-    """
-    logger.info(f"Processing request: {request.description[:50]}...")
-    
-    # Generate IDs
-    plan_id = str(uuid.uuid4())
-    session_id = request.session_id or str(uuid.uuid4())
-    
-    # Create plan with steps
-    plan = Plan(
+# Pending plan status -> kind of human decision it waits on
+APPROVAL_TYPES = {
+    "pending_approval": "plan",
+    "pending_extraction_approval": "extraction",
+    "pending_clarification": "clarification"
+}
+
+# Maximum plans accepted in one process_batch call
+BATCH_MAX_PLANS = int(os.getenv("BATCH_MAX_PLANS", "500"))
+
+# Finished plans a repeat of the same session and description starts over
+# instead of returning as a duplicate
+RESTARTABLE_STATUSES = ("failed", "rejected", "cancelled")
+
+# Page size for GET /plans: default and upper bound
+PLANS_PAGE_SIZE = int(os.getenv("PLANS_PAGE_SIZE", "50"))
+PLANS_MAX_PAGE_SIZE = int(os.getenv("PLANS_MAX_PAGE_SIZE", "200"))
+
+# Longest GET /plan?wait= long-poll, in seconds
+PLAN_LONG_POLL_MAX_SECONDS = float(os.getenv("PLAN_LONG_POLL_MAX_SECONDS", "30"))
+
+# Plan reads are revalidated with If-None-Match rather than served from browser caches
+REVALIDATE_HEADERS = {"Cache-Control": "no-cache"}
+
+# process_request calls in progress on this worker, by idempotency key
+_inflight_requests: Dict[str, asyncio.Future] = {}
+
+
+def _queue_unavailable(job_type: str) -> HTTPException:
+    """Build the error returned when a job can't be queued."""
+    if not job_queue.accepting:
+        return HTTPException(status_code=503, detail="Server is shutting down, retry shortly",
+                             headers={"Retry-After": QUEUE_RETRY_AFTER})
+    return HTTPException(status_code=429, detail=f"Too many queued {job_type} jobs, retry shortly",
+                         headers={"Retry-After": QUEUE_RETRY_AFTER})
+
+
+def _submit_job(job_type: str, func, *args, description: str = "", key: Optional[str] = None):
+    """Queue agent work, translating backpressure into 429/503 responses."""
+    try:
+        return job_queue.submit(job_type, func, *args, description=description, key=key)
+    except (QueueFullError, QueueClosedError):
+        raise _queue_unavailable(job_type)
+
+
+def _build_plan(plan_id: str, session_id: str, description: str, batch_id: Optional[str] = None) -> Plan:
+    """Build a new plan with its initial steps."""
+    return Plan(
         id=plan_id,
         session_id=session_id,
-        description=request.description,
+        description=description,
         status="pending",
+        batch_id=batch_id,
         steps=[
             Step(
                 id=f"{plan_id}-step-1",
@@ -52,17 +102,157 @@ async def process_request(request: ProcessRequestInput, background_tasks: Backgr
             )
         ]
     )
+
+
+async def _create_batch(descriptions: List[str], session_id: Optional[str]) -> BatchResponse:
+    """
+    Create a batch of plans with one bulk insert and queue them as batch jobs.
     
-    # Save to database
-    await PlanRepository.create(plan)
+    Batch jobs run at the lowest priority with their own concurrency limit,
+    so a large batch doesn't starve interactive plans and approvals. Each
+    plan still pauses for its own approval.
+    """
+    if not descriptions:
+        raise HTTPException(status_code=400, detail="At least one task is required")
+    if len(descriptions) > BATCH_MAX_PLANS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_PLANS} tasks")
+    for index, description in enumerate(descriptions):
+        if not description or not description.strip():
+            raise HTTPException(status_code=400, detail=f"Task {index} is empty")
     
-    # Execute agent workflow in background
-    background_tasks.add_task(
-        AgentService.execute_task,
-        plan_id,
-        session_id,
-        request.description
+    # Reject before creating plans so a full queue leaves nothing behind
+    if job_queue.remaining_capacity(BATCH_JOB) < len(descriptions):
+        raise _queue_unavailable(BATCH_JOB)
+    
+    batch_id = str(uuid.uuid4())
+    session_id = session_id or str(uuid.uuid4())
+    plans = [_build_plan(str(uuid.uuid4()), session_id, description, batch_id) for description in descriptions]
+    plan_ids = [plan.id for plan in plans]
+    
+    await PlanRepository.create_many(plans)
+    await BatchRepository.create(batch_id, session_id, plan_ids)
+    
+    queued = 0
+    for plan in plans:
+        try:
+            job_queue.submit(
+                BATCH_JOB,
+                AgentService.execute_task,
+                plan.id,
+                session_id,
+                plan.description,
+                description=f"execute_task plan={plan.id} batch={batch_id}",
+                key=plan.id
+            )
+        except (QueueFullError, QueueClosedError):
+            break
+        queued += 1
+    
+    if queued < len(plans):
+        logger.warning(f"Batch {batch_id}: only {queued}/{len(plans)} plans queued, failing the rest")
+        await PlanRepository.update_status_many(plan_ids[queued:], "failed")
+        if queued == 0:
+            raise _queue_unavailable(BATCH_JOB)
+    
+    logger.info(f"Batch {batch_id} created with {len(plans)} plans")
+    return BatchResponse(
+        batch_id=batch_id,
+        status="created" if queued == len(plans) else "partially_created",
+        session_id=session_id,
+        plan_ids=plan_ids
     )
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert a timezone-aware query value to naive UTC, matching stored times."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _idempotency_key(request: ProcessRequestInput, header_key: Optional[str]) -> Optional[str]:
+    """
+    Dedupe key for a process_request call: the client's Idempotency-Key
+    header, else a hash of the session and description. Requests without
+    either are never deduplicated.
+    """
+    if header_key:
+        return f"key:{header_key}"
+    if request.session_id:
+        content = f"{request.session_id}\n{request.description.strip()}"
+        return "hash:" + hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return None
+
+
+async def _restartable(idempotency_key: str, existing: dict) -> bool:
+    """Whether a content-hash key's plan already failed, was rejected or was cancelled."""
+    if not idempotency_key.startswith("hash:"):
+        return False
+    previous = await PlanRepository.get_by_id(existing["plan_id"])
+    return previous is not None and previous.status in RESTARTABLE_STATUSES
+
+
+async def _create_plan(request: ProcessRequestInput, idempotency_key: Optional[str]) -> ProcessRequestResponse:
+    """Create a plan and queue its execution, unless the key already belongs to a plan."""
+    # Generate IDs
+    plan_id = str(uuid.uuid4())
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    if idempotency_key:
+        existing = await IdempotencyRepository.claim(idempotency_key, plan_id, session_id, IDEMPOTENCY_WINDOW_SECONDS)
+        if existing and await _restartable(idempotency_key, existing):
+            # Resubmitting a plan that ended unsuccessfully starts fresh work
+            if await IdempotencyRepository.take_over(idempotency_key, existing["plan_id"], plan_id, session_id):
+                logger.info(f"Repeat of finished plan {existing['plan_id']}, starting a new plan")
+                existing = None
+            else:
+                # Another repeat took it over first; that plan is the one to return
+                existing = await IdempotencyRepository.claim(
+                    idempotency_key, plan_id, session_id, IDEMPOTENCY_WINDOW_SECONDS
+                )
+        if existing:
+            logger.info(f"Duplicate request, returning existing plan {existing['plan_id']}")
+            return ProcessRequestResponse(
+                plan_id=existing["plan_id"],
+                status="duplicate",
+                session_id=existing["session_id"]
+            )
+    
+    # Reject before creating the plan so a full queue leaves nothing behind
+    if job_queue.is_full(PLAN_JOB):
+        if idempotency_key:
+            await IdempotencyRepository.release(idempotency_key, plan_id)
+        raise _queue_unavailable(PLAN_JOB)
+    
+    # Create plan with steps
+    plan = _build_plan(plan_id, session_id, request.description)
+    
+    try:
+        # Save to database
+        await PlanRepository.create(plan)
+        
+        # Execute agent workflow on the job queue
+        try:
+            job_queue.submit(
+                PLAN_JOB,
+                AgentService.execute_task,
+                plan_id,
+                session_id,
+                request.description,
+                description=f"execute_task plan={plan_id}",
+                key=plan_id
+            )
+        except (QueueFullError, QueueClosedError):
+            await PlanRepository.update_status(plan_id, "failed")
+            raise _queue_unavailable(PLAN_JOB)
+    except Exception:
+        if idempotency_key:
+            # Let the client's retry start a fresh plan
+            try:
+                await IdempotencyRepository.release(idempotency_key, plan_id)
+            except Exception as e:
+                logger.error(f"Could not release idempotency key for plan {plan_id}: {e}")
+        raise
     
     return ProcessRequestResponse(
         plan_id=plan_id,
@@ -71,29 +261,217 @@ async def process_request(request: ProcessRequestInput, background_tasks: Backgr
     )
 
 
+@router.post("/process_request", response_model=ProcessRequestResponse)
+async def process_request(
+    request: ProcessRequestInput,
+    idempotency_key: Optional[str] = Header(None, description="Client key making retries of this request safe")
+):
+    """
+    Process a new task request and create a plan.
+    Phase 3: Integrates with LangGraph agent execution.
+    
+    Repeats of a request (same Idempotency-Key, or same session and
+    description) within IDEMPOTENCY_WINDOW_SECONDS return the original
+    plan_id with status "duplicate" instead of starting new work.
+    Concurrent repeats on this worker wait for the first one to finish.
+    A same session and description repeat of a plan that failed, was
+    rejected or was cancelled starts a new plan.
+    """
+    logger.info(f"Processing request: {request.description[:50]}...")
+    
+    key = _idempotency_key(request, idempotency_key)
+    if key is None:
+        return await _create_plan(request, None)
+    
+    inflight = _inflight_requests.get(key)
+    if inflight is not None:
+        response = await asyncio.shield(inflight)
+        return response.model_copy(update={"status": "duplicate"})
+    
+    future = asyncio.get_running_loop().create_future()
+    # Waiters re-raise the first request's error; don't warn when there are none
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight_requests[key] = future
+    try:
+        response = await _create_plan(request, key)
+        future.set_result(response)
+        return response
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        if not future.done():
+            future.cancel()
+        _inflight_requests.pop(key, None)
+
+
+@router.post("/process_batch", response_model=BatchResponse)
+async def process_batch(request: BatchRequestInput):
+    """
+    Create one plan per task description and process them as a batch.
+    Progress: GET /api/v3/batch/{batch_id} and /api/v3/batch/{batch_id}/stream.
+    """
+    logger.info(f"Processing batch of {len(request.descriptions)} tasks")
+    return await _create_batch(request.descriptions, request.session_id)
+
+
+@router.post("/process_batch/files", response_model=BatchResponse)
+async def process_batch_files(
+    files: List[UploadFile] = File(...),
+    session_id: Optional[str] = Form(None),
+    instruction: Optional[str] = Form(None)
+):
+    """
+    Create one plan per uploaded file (.txt, .docx) and process them as a batch.
+    
+    Args:
+        files: Uploaded invoice files (multipart/form-data)
+        session_id: Session shared by the batch's plans
+        instruction: Optional text prepended to each file's content
+    """
+    logger.info(f"Processing batch of {len(files)} files")
+    if len(files) > BATCH_MAX_PLANS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_PLANS} tasks")
+    
+    # Parse every file before creating anything so one bad file rejects the batch
+    descriptions = []
+    for file in files:
+        try:
+            content = await FileParserService.extract_text(file)
+        except ValueError as e:
+            logger.warning(f"File validation error for {file.filename}: {e}")
+            raise HTTPException(status_code=400, detail=f"{file.filename}: {e}")
+        except Exception as e:
+            logger.error(f"File processing error for {file.filename}: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to process file {file.filename}: {str(e)}")
+        descriptions.append(f"{instruction}\n\n{content}" if instruction else content)
+    
+    return await _create_batch(descriptions, session_id)
+
+
+@router.get("/batch/{batch_id}", response_model=BatchSummary)
+async def get_batch(batch_id: str):
+    """
+    Get aggregate progress for a batch: plan counts per status.
+    """
+    summary = await BatchRepository.get_summary(batch_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return summary
+
+
+def _encode_plans_cursor(position: Tuple[datetime, str]) -> str:
+    """Opaque cursor for the plan after which the next page starts."""
+    created_at, plan_id = position
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{plan_id}".encode()).decode()
+
+
+def _decode_plans_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, plan_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), plan_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers the ETag (weak comparison, as for GET)."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def _not_modified(etag: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **REVALIDATE_HEADERS, **(headers or {})})
+
+
+def _plan_etag(plan: Plan, message_count: int) -> str:
+    """ETag for GET /plan: plan version and last update, plus the message count (messages are append-only)."""
+    return f'"{plan.version}-{int(plan.updated_at.timestamp() * 1000)}-{message_count}"'
+
+
 @router.get("/plans", response_model=List[PlanResponse])
-async def get_plans(session_id: Optional[str] = Query(None)):
+async def get_plans(
+    response: Response,
+    session_id: Optional[str] = Query(None),
+    limit: int = Query(PLANS_PAGE_SIZE, ge=1, le=PLANS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    view: str = Query("summary", pattern="^(summary|full)$"),
+    if_none_match: Optional[str] = Header(None)
+):
     """
-    Get all plans, optionally filtered by session_id.
+    Get plans newest first, optionally filtered by session_id, one page at a time.
+    
+    The summary view (default) leaves out steps, agent progress and
+    extraction data; use view=full or GET /plan for those. When more plans
+    follow, the X-Next-Cursor header holds the cursor for the next page.
+    The page's ETag covers each plan's version; a matching If-None-Match
+    gets 304 Not Modified.
     """
     logger.info(f"Getting plans for session: {session_id}")
-    plans = await PlanRepository.get_all(session_id=session_id)
+    plans, next_position = await PlanRepository.get_page(
+        session_id=session_id,
+        limit=limit,
+        after=_decode_plans_cursor(cursor) if cursor else None,
+        summary=view == "summary"
+    )
+    
+    page_headers = {"X-Next-Cursor": _encode_plans_cursor(next_position)} if next_position else {}
+    fingerprint = "|".join(f"{plan.id}:{plan.version}:{plan.updated_at.isoformat()}" for plan in plans)
+    etag = '"' + hashlib.sha256(f"{view}|{fingerprint}".encode()).hexdigest()[:32] + '"'
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, page_headers)
+    
+    response.headers.update({"ETag": etag, **REVALIDATE_HEADERS, **page_headers})
     return [PlanResponse.from_plan(plan) for plan in plans]
 
 
 @router.get("/plan")
-async def get_plan(plan_id: str = Query(...)):
+async def get_plan(
+    response: Response,
+    plan_id: str = Query(...),
+    wait: float = Query(0, ge=0, description="Seconds to hold the request until the plan changes from If-None-Match"),
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Get a single plan by ID with messages.
+    
+    The ETag changes whenever the plan or its messages do. A request whose
+    If-None-Match still matches gets 304 Not Modified, after waiting up to
+    `wait` seconds (capped by PLAN_LONG_POLL_MAX_SECONDS) for a change;
+    if the plan changes meanwhile, the new plan is returned at once.
     """
     logger.info(f"Getting plan: {plan_id}")
     
-    plan = await PlanRepository.get_by_id(plan_id)
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
-    
-    messages = await MessageRepository.get_by_plan_id(plan_id)
+    deadline = asyncio.get_running_loop().time() + min(wait, PLAN_LONG_POLL_MAX_SECONDS)
+    while True:
+        # Watch before reading so a change during the read still wakes the wait
+        changed = plan_cache.watch(plan_id)
+        try:
+            # Plan and messages are independent reads, so run them concurrently
+            plan, messages = await asyncio.gather(
+                PlanRepository.get_by_id(plan_id),
+                MessageRepository.get_documents(plan_id)
+            )
+            if not plan:
+                raise HTTPException(status_code=404, detail="Plan not found")
+            
+            etag = _plan_etag(plan, len(messages))
+            if not _etag_matches(if_none_match, etag):
+                break
+            
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return _not_modified(etag)
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return _not_modified(etag)
+        finally:
+            plan_cache.unwatch(plan_id, changed)
     
+    response.headers.update({"ETag": etag, **REVALIDATE_HEADERS})
     return {
         "plan": PlanResponse.from_plan(plan),
         "messages": messages,
@@ -104,7 +482,7 @@ async def get_plan(plan_id: str = Query(...)):
 
 
 @router.post("/plan_approval", response_model=PlanApprovalResponse)
-async def plan_approval(request: PlanApprovalRequest, background_tasks: BackgroundTasks):
+async def plan_approval(request: PlanApprovalRequest):
     """
     Handle plan approval/rejection.
     Phase 6: Resumes or stops execution based on approval.
@@ -112,11 +490,14 @@ async def plan_approval(request: PlanApprovalRequest, background_tasks: Backgrou
     logger.info(f"Plan approval request for {request.m_plan_id}: approved={request.approved}")
     
     # Resume execution with approval decision
-    background_tasks.add_task(
+    _submit_job(
+        APPROVAL_JOB,
         AgentService.resume_after_approval,
         request.m_plan_id,
         request.approved,
-        request.feedback
+        request.feedback,
+        description=f"resume_after_approval plan={request.m_plan_id}",
+        key=request.m_plan_id
     )
     
     return PlanApprovalResponse(
@@ -126,7 +507,7 @@ async def plan_approval(request: PlanApprovalRequest, background_tasks: Backgrou
 
 
 @router.post("/user_clarification")
-async def user_clarification(request: dict, background_tasks: BackgroundTasks):
+async def user_clarification(request: dict):
     """
     Handle user clarification responses.
     Phase 7: Processes approval vs revision and loops back if needed.
@@ -140,12 +521,15 @@ async def user_clarification(request: dict, background_tasks: BackgroundTasks):
     if not plan_id:
         raise HTTPException(status_code=400, detail="plan_id is required")
     
-    # Process clarification in background
-    background_tasks.add_task(
+    # Process clarification on the job queue
+    _submit_job(
+        APPROVAL_JOB,
         AgentService.handle_user_clarification,
         plan_id,
         request_id,
-        answer
+        answer,
+        description=f"handle_user_clarification plan={plan_id}",
+        key=plan_id
     )
     
     return {
@@ -155,7 +539,7 @@ async def user_clarification(request: dict, background_tasks: BackgroundTasks):
 
 
 @router.post("/extraction_approval")
-async def extraction_approval(request: dict, background_tasks: BackgroundTasks):
+async def extraction_approval(request: dict):
     """
     Handle invoice extraction approval/rejection.
     Phase 4: Processes extraction approval and continues or stops workflow.
@@ -170,13 +554,16 @@ async def extraction_approval(request: dict, background_tasks: BackgroundTasks):
     if not plan_id:
         raise HTTPException(status_code=400, detail="plan_id is required")
     
-    # Process extraction approval in background
-    background_tasks.add_task(
+    # Process extraction approval on the job queue
+    _submit_job(
+        APPROVAL_JOB,
         AgentService.handle_extraction_approval,
         plan_id,
         approved,
         feedback,
-        edited_data
+        edited_data,
+        description=f"handle_extraction_approval plan={plan_id}",
+        key=plan_id
     )
     
     return {
@@ -185,6 +572,137 @@ async def extraction_approval(request: dict, background_tasks: BackgroundTasks):
     }
 
 
+@router.post("/cancel_plan")
+async def cancel_plan(request: dict):
+    """
+    Cancel a plan: queued work is dropped and running work is interrupted.
+    Plans that already finished are left as they are.
+    """
+    plan_id = request.get("plan_id")
+    if not plan_id:
+        raise HTTPException(status_code=400, detail="plan_id is required")
+
+    logger.info(f"Cancel requested for plan {plan_id}")
+    result = await AgentService.cancel_plan(plan_id, request.get("reason"))
+    if result["status"] == "not_found":
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return result
+
+
+@router.get("/approvals", response_model=List[PendingApproval])
+async def get_pending_approvals(
+    status: Optional[str] = Query(None, description="pending_approval, pending_extraction_approval or pending_clarification"),
+    agent: Optional[str] = Query(None, description="Agent name, e.g. invoice"),
+    severity: Optional[str] = Query(None, description="Highest validation severity: error, warning, info or none"),
+    session_id: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """
+    List plans waiting on a human decision across plans, oldest first.
+    """
+    if status and status not in APPROVAL_TYPES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(APPROVAL_TYPES)}")
+    
+    agent_name = None
+    if agent:
+        agent_name = agent if agent.endswith(" Agent") else f"{agent.capitalize()} Agent"
+    
+    plans = await PlanRepository.list_pending_approvals(
+        [status] if status else list(APPROVAL_TYPES),
+        agent_name=agent_name,
+        severity=severity,
+        session_id=session_id,
+        limit=limit
+    )
+    
+    approvals = []
+    for plan in plans:
+        extraction = plan.get("extraction_data") or {}
+        invoice = extraction.get("invoice_data") or {}
+        updated_at = plan.get("updated_at")
+        approvals.append(PendingApproval(
+            plan_id=plan["plan_id"],
+            session_id=plan["session_id"],
+            batch_id=plan.get("batch_id"),
+            description=plan["description"].split("\n")[0][:100],
+            status=plan["status"],
+            approval_type=APPROVAL_TYPES[plan["status"]],
+            agents=[progress["agent_name"] for progress in plan.get("agent_progress", [])],
+            validation_severity=extraction.get("validation_severity"),
+            validation_issue_count=len(extraction.get("validation_errors") or []),
+            vendor_name=invoice.get("vendor_name"),
+            invoice_number=invoice.get("invoice_number"),
+            total_amount=str(invoice["total_amount"]) if invoice.get("total_amount") is not None else None,
+            currency=invoice.get("currency"),
+            updated_at=updated_at.isoformat() if hasattr(updated_at, "isoformat") else str(updated_at)
+        ))
+    return approvals
+
+
+@router.post("/approvals/bulk", response_model=BulkApprovalResponse)
+async def bulk_approval(request: BulkApprovalRequest):
+    """
+    Approve or reject several pending plans at once.
+    
+    Each plan is resumed the same way as its single-plan endpoint (plan
+    approval, extraction approval or clarification), but all of them are
+    queued together as approval jobs: either every selected plan is queued
+    or the request gets a 429.
+    """
+    plan_ids = list(dict.fromkeys(request.plan_ids))
+    logger.info(f"Bulk approval for {len(plan_ids)} plans: approved={request.approved}")
+    if not plan_ids:
+        raise HTTPException(status_code=400, detail="plan_ids is required")
+    
+    statuses = await PlanRepository.get_statuses(plan_ids)
+    
+    calls = []
+    queued = []
+    skipped = []
+    for plan_id in plan_ids:
+        status = statuses.get(plan_id)
+        if status == "pending_approval":
+            call = (AgentService.resume_after_approval, (plan_id, request.approved, request.feedback))
+        elif status == "pending_extraction_approval":
+            call = (AgentService.handle_extraction_approval, (plan_id, request.approved, request.feedback or "", None))
+        elif status == "pending_clarification":
+            # Rejecting a result means sending it back for revision, which needs instructions
+            if not request.approved and not request.feedback:
+                skipped.append({"plan_id": plan_id, "reason": "Revision feedback required to reject a result"})
+                continue
+            answer = "APPROVE" if request.approved else request.feedback
+            call = (AgentService.handle_user_clarification, (plan_id, "", answer))
+        else:
+            reason = "Plan not found" if status is None else f"Plan is not awaiting approval (status: {status})"
+            skipped.append({"plan_id": plan_id, "reason": reason})
+            continue
+        
+        func, args = call
+        calls.append((func, args, f"{func.__name__} plan={plan_id}", plan_id))
+        queued.append(plan_id)
+    
+    if calls:
+        try:
+            job_queue.submit_many(APPROVAL_JOB, calls)
+        except (QueueFullError, QueueClosedError):
+            raise _queue_unavailable(APPROVAL_JOB)
+    
+    return BulkApprovalResponse(
+        status="processing" if queued else "nothing_to_process",
+        queued=queued,
+        skipped=skipped
+    )
+
+
+@router.get("/approvals/{plan_id}/audit")
+async def get_approval_audit(plan_id: str):
+    """
+    Get the approval audit trail for a plan: human decisions and approval
+    policy evaluations (with each check's outcome), oldest first.
+    """
+    return await ApprovalAuditRepository.get_by_plan_id(plan_id)
+
+
 @router.post("/agent_message")
 async def agent_message(request: dict):
     """
@@ -203,6 +721,90 @@ async def agent_message(request: dict):
     return message.dict()
 
 
+@router.get("/socket_stats")
+async def get_socket_stats():
+    """
+    Get WebSocket connection gauges.
+    Returns per-plan connection counts, buffered messages and reaping counters.
+    """
+    from app.services.websocket_service import websocket_manager
+    
+    return websocket_manager.get_stats()
+
+
+@router.get("/checkpoint_stats")
+async def get_checkpoint_stats():
+    """
+    Get execution checkpoint gauges.
+    Returns backend type, stored and cached checkpoint counts and cache hit rates.
+    """
+    from app.services.checkpoint_store import checkpoint_store
+    
+    return await checkpoint_store.get_stats()
+
+
+@router.get("/index_drift")
+async def get_index_drift():
+    """
+    Compare MongoDB indexes with the index registry.
+    Returns missing, mismatched and unregistered indexes (all empty when in sync).
+    """
+    from app.db.indexes import index_drift
+    
+    return await index_drift()
+
+
+@router.get("/db_pool_stats")
+async def get_db_pool_stats():
+    """
+    Get MongoDB connection pool gauges.
+    Returns pool settings plus open and in-use connections, checkouts, waits and checkout times.
+    """
+    from app.db.mongodb import MongoDB
+    
+    return MongoDB.get_pool_stats()
+
+
+@router.get("/message_buffer_stats")
+async def get_message_buffer_stats():
+    """
+    Get agent message write buffer gauges.
+    Returns buffered, pending and in-flight messages, batches written and average batch size.
+    """
+    from app.db.message_buffer import message_buffer
+    
+    return message_buffer.get_stats()
+
+
+@router.get("/plan_cache_stats")
+async def get_plan_cache_stats():
+    """
+    Get plan cache gauges.
+    Returns cached entries, hit rate, local and remote invalidations and event channel counters.
+    """
+    from app.db.plan_cache import plan_cache
+    
+    return plan_cache.get_stats()
+
+
+@router.get("/plan_write_stats")
+async def get_plan_write_stats():
+    """
+    Get plan transition gauges.
+    Returns requested transitions, update round trips and transitions per write.
+    """
+    return PlanRepository.get_write_stats()
+
+
+@router.get("/job_stats")
+async def get_job_stats():
+    """
+    Get job queue gauges.
+    Returns per job type queue depth, running jobs, limits and wait/run times.
+    """
+    return job_queue.get_stats()
+
+
 @router.get("/teams")
 async def get_teams():
     """
@@ -339,6 +941,80 @@ async def get_all_extractions(limit: int = Query(100, le=1000)):
     }
 
 
+@router.get("/extractions/export")
+async def export_extractions(
+    export_format: str = Query("ndjson", alias="format", description="ndjson, csv, parquet or arrow"),
+    start: Optional[datetime] = Query(None, description="Approved at or after (ISO date or datetime, UTC)"),
+    end: Optional[datetime] = Query(None, description="Approved before (ISO date or datetime, UTC)"),
+    vendor: Optional[str] = Query(None, description="Vendor name as extracted"),
+    approved_by: Optional[str] = Query(None, description="Approver, e.g. user or policy"),
+    table: str = Query("invoices", description="invoices or line_items (parquet and arrow only)")
+):
+    """
+    Stream every matching invoice extraction as one file.
+
+    NDJSON has one extraction per line, shaped like /extraction/{plan_id}/json;
+    CSV has one row per line item with the invoice columns repeated. Parquet
+    and Arrow IPC carry one typed table (decimal amounts, date columns):
+    the invoices or their flattened line items. Rows are written as they
+    are read from the database, oldest first.
+    """
+    from fastapi.responses import StreamingResponse
+    from app.services.extraction_columnar import TABLES, is_pyarrow_available
+    from app.services.extraction_export import EXPORT_FORMATS, export_extractions as stream_export
+
+    start, end = _naive_utc(start), _naive_utc(end)
+    export = EXPORT_FORMATS.get(export_format)
+    if export is None:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if export.columnar:
+        if table not in TABLES:
+            raise HTTPException(status_code=400, detail=f"table must be one of: {', '.join(TABLES)}")
+        if not is_pyarrow_available():
+            raise HTTPException(status_code=501, detail=f"{export_format} export needs pyarrow (pip install pyarrow)")
+    filename = f"invoice_{table}" if export.columnar else "invoice_extractions"
+
+    logger.info(f"Exporting extractions as {export_format} (start={start}, end={end}, vendor={vendor})")
+
+    return StreamingResponse(
+        stream_export(export_format, start=start, end=end, vendor_name=vendor, approved_by=approved_by, table=table),
+        media_type=export.media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{export.extension}"
+        }
+    )
+
+
+@router.post("/extractions/snapshot")
+async def append_extraction_snapshot():
+    """
+    Append the extractions approved since the last run to the Parquet snapshot.
+
+    The snapshot (EXPORT_SNAPSHOT_DIR) has an invoices and a line_items
+    directory of part files for analytics; call this periodically, e.g.
+    from cron. Returns the exported window and the new watermark.
+    """
+    from app.services.extraction_columnar import extraction_snapshot, is_pyarrow_available
+
+    if not is_pyarrow_available():
+        raise HTTPException(status_code=501, detail="The extraction snapshot needs pyarrow (pip install pyarrow)")
+
+    return await extraction_snapshot.append()
+
+
+@router.get("/extractions/snapshot")
+async def get_extraction_snapshot():
+    """
+    Get the Parquet snapshot's watermark.
+    Returns the creation time exported up to and the part and row counts.
+    """
+    from app.services.extraction_columnar import extraction_snapshot
+
+    return {"directory": str(extraction_snapshot.directory), **extraction_snapshot.watermark()}
+
+
 @router.get("/extraction/{plan_id}/visualize")
 async def get_extraction_visualization(plan_id: str):
     """
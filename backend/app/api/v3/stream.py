@@ -0,0 +1,135 @@
+"""Server-Sent Events endpoint for read-only real-time updates."""
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+from fastapi import Request, Header, Query, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.db.repositories import BatchRepository
+from app.services.websocket_service import websocket_manager
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments so proxies don't close idle streams
+SSE_KEEPALIVE_INTERVAL = float(os.getenv("SSE_KEEPALIVE_INTERVAL", "15"))
+# Reconnect delay (ms) suggested to EventSource clients
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+# Seconds between batch progress checks
+BATCH_PROGRESS_INTERVAL = float(os.getenv("BATCH_PROGRESS_INTERVAL", "2"))
+
+SSE_HEADERS = {
+    # No hop-by-hop headers (e.g. Connection) so the response is valid over HTTP/2
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+
+def _format_event(event_id: int, message: dict) -> str:
+    """Format one message as an SSE event (no event name, so onmessage receives it)."""
+    data = json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str)
+    return f"id: {event_id}\ndata: {data}\n\n"
+
+
+def _parse_event_id(value: Optional[str]) -> Optional[int]:
+    """Parse a Last-Event-ID value, ignoring anything that isn't one of our IDs."""
+    if value is None or value.strip() == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid Last-Event-ID: {value}")
+        return None
+
+
+async def stream_endpoint(
+    request: Request,
+    plan_id: str,
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Server-Sent Events stream of agent updates for a plan.
+
+    Path: /api/v3/stream/{plan_id}
+
+    Carries the same messages as /api/v3/socket/{plan_id}, one JSON object
+    per event. Reconnecting clients resume from the Last-Event-ID header
+    (sent automatically by EventSource) or the last_event_id query parameter.
+    """
+    resume_from = _parse_event_id(last_event_id_header or last_event_id)
+    subscriber, backlog = websocket_manager.subscribe_stream(plan_id, resume_from)
+
+    async def event_generator():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+
+            for event_id, message in backlog:
+                yield _format_event(event_id, message)
+
+            while not subscriber.overflowed:
+                try:
+                    event_id, message = await asyncio.wait_for(
+                        subscriber.queue.get(),
+                        timeout=SSE_KEEPALIVE_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield _format_event(event_id, message)
+        finally:
+            websocket_manager.unsubscribe_stream(subscriber)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def batch_stream_endpoint(request: Request, batch_id: str):
+    """
+    Server-Sent Events stream of aggregate progress for a batch.
+
+    Path: /api/v3/batch/{batch_id}/stream
+
+    Sends a batch_progress event with per-status plan counts whenever they
+    change, and a final batch_completed event once every plan has reached a
+    terminal status. Counts come from MongoDB, so the stream is correct no
+    matter which worker runs the batch's plans.
+    """
+    summary = await BatchRepository.get_summary(batch_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    async def event_generator():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+
+        current = summary
+        last_sent = None
+        event_id = 0
+        idle_seconds = 0.0
+        while True:
+            if current != last_sent:
+                event_id += 1
+                finished = current["status"] == "completed"
+                yield _format_event(event_id, {
+                    "type": "batch_completed" if finished else "batch_progress",
+                    "data": current
+                })
+                if finished:
+                    break
+                last_sent = current
+                idle_seconds = 0.0
+            elif idle_seconds >= SSE_KEEPALIVE_INTERVAL:
+                yield ": keep-alive\n\n"
+                idle_seconds = 0.0
+
+            await asyncio.sleep(BATCH_PROGRESS_INTERVAL)
+            idle_seconds += BATCH_PROGRESS_INTERVAL
+            if await request.is_disconnected():
+                break
+            current = await BatchRepository.get_summary(batch_id) or last_sent
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -4,18 +4,47 @@ from datetime import datetime
 
 from fastapi import WebSocket, WebSocketDisconnect, Query
 
+from app.services.message_codec import DEFAULT_ENCODING, resolve_encoding, decode_message
 from app.services.websocket_service import websocket_manager
 
 logger = logging.getLogger(__name__)
 
 
-async def websocket_endpoint(websocket: WebSocket, plan_id: str, user_id: str = Query("default_user")):
+async def _receive_message(websocket: WebSocket) -> dict:
+    """Receive one client frame (JSON text or MessagePack binary) and decode it."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    
+    payload = message.get("bytes") if message.get("bytes") is not None else message.get("text")
+    return decode_message(payload)
+
+
+async def websocket_endpoint(
+    websocket: WebSocket,
+    plan_id: str,
+    user_id: str = Query("default_user"),
+    encoding: str = Query(DEFAULT_ENCODING),
+    ack: bool = Query(False)
+):
     """
     WebSocket endpoint for real-time agent updates.
     
-    Path: /api/v3/socket/{plan_id}?user_id={user_id}
+    Path: /api/v3/socket/{plan_id}?user_id={user_id}&encoding={json|msgpack}&ack={true|false}
+    
+    JSON text frames are the default. Clients that pass encoding=msgpack
+    receive MessagePack binary frames instead (falls back to JSON when
+    msgpack is not installed).
+    
+    The server sends {"type": "heartbeat"} every WS_HEARTBEAT_INTERVAL
+    seconds. Clients that answer with {"type": "heartbeat_ack"} (or ping
+    on their own) are reaped after WS_HEARTBEAT_TIMEOUT seconds of silence.
+    
+    Clients that pass ack=true must answer messages flagged requires_ack
+    with {"type": "ack", "message_id": ...}.
     """
-    await websocket_manager.connect(websocket, plan_id, user_id)
+    encoding = resolve_encoding(encoding)
+    await websocket_manager.connect(websocket, plan_id, user_id, encoding, ack)
     
     try:
         # Don't send initial connection message - it's not useful for users
@@ -33,14 +62,26 @@ async def websocket_endpoint(websocket: WebSocket, plan_id: str, user_id: str =
         # Keep connection alive and listen for messages
         while True:
             # Receive messages from client
-            data = await websocket.receive_json()
+            data = await _receive_message(websocket)
             
             # Handle different message types
             message_type = data.get("type")
+            websocket_manager.mark_alive(
+                websocket,
+                heartbeat=message_type in ("ping", "pong", "heartbeat_ack")
+            )
+            
+            if message_type in ("pong", "heartbeat_ack"):
+                # Reply to a server heartbeat - liveness already recorded
+                continue
+            
+            elif message_type == "ack":
+                # Client confirmed delivery of a critical message
+                websocket_manager.acknowledge(data.get("message_id", ""))
             
-            if message_type == "ping":
+            elif message_type == "ping":
                 # Respond to ping with pong
-                await websocket.send_json({
+                await websocket_manager.send_personal_message(websocket, {
                     "type": "pong",
                     "timestamp": datetime.utcnow().isoformat() + "Z"  # Ensure UTC timezone marker
                 })
@@ -5,10 +5,13 @@ from app.config.validation_rules import (
     ValidationRulesConfig,
     InvoiceValidator
 )
+from app.config.logging_config import configure_logging, shutdown_logging
 
 __all__ = [
     "ValidationSeverity",
     "ValidationRule",
     "ValidationRulesConfig",
-    "InvoiceValidator"
+    "InvoiceValidator",
+    "configure_logging",
+    "shutdown_logging"
 ]
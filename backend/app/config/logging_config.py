@@ -0,0 +1,153 @@
+"""Logging configuration: structured output, sampling and a queue-based handler."""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None)).keys()
+) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting and output to the listener thread.
+
+    `msg % args` is still rendered on the calling thread, so mutable
+    arguments (state dicts, lists) are logged as they were at the call;
+    the formatter (timestamps, JSON, tracebacks) and handler I/O run on
+    the thread. Unlike the stock handler, the record isn't copied or
+    stripped for pickling, since our queue is in-process.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep 1 in N records per category for high-frequency events.
+
+    Records opt in with ``extra={"category": "<name>"}``; records without a
+    category, and WARNING or above, always pass.
+    """
+
+    def __init__(self, sample_every: Dict[str, int]):
+        super().__init__()
+        self.sample_every = sample_every
+        self._counters: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, "category", None)
+        if category is None or record.levelno >= logging.WARNING:
+            return True
+
+        every = self.sample_every.get(category, 1)
+        if every <= 1:
+            return True
+
+        count = self._counters.get(category, 0)
+        self._counters[category] = count + 1
+        if count % every:
+            return False
+        record.sample_rate = every
+        return True
+
+
+def parse_sample_rates(value: str) -> Dict[str, int]:
+    """
+    Parse LOG_SAMPLE_RATES, e.g. "ws.send=100,llm.token=1000".
+
+    Each number N keeps one of every N records in that category.
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        try:
+            category, every = item.split("=", 1)
+            rates[category.strip()] = max(1, int(every))
+        except ValueError:
+            print(f"Ignoring invalid LOG_SAMPLE_RATES entry: {item}", file=sys.stderr)
+    return rates
+
+
+def configure_logging() -> None:
+    """
+    Configure root logging from environment variables.
+
+    LOG_LEVEL: root level (default INFO)
+    LOG_FORMAT: text | json (default text)
+    LOG_ASYNC: when true (default), records are handed to a QueueHandler and
+        formatted/written by a background QueueListener thread instead of on
+        the event loop
+    LOG_SAMPLE_RATES: per-category sampling, e.g. "ws.send=100,llm.token=1000"
+    """
+    global _listener
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_format = os.getenv("LOG_FORMAT", "text").lower()
+    use_async = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "ws.send=100,llm.token=1000"))
+
+    stream_handler = logging.StreamHandler()
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+
+    if use_async:
+        log_queue: queue.Queue = queue.Queue(-1)
+        handler: logging.Handler = DeferredQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    else:
+        handler = stream_handler
+
+    # Sample before the record is enqueued so dropped records cost nothing further
+    handler.addFilter(SamplingFilter(sample_rates))
+    root.addHandler(handler)
+
+
+def shutdown_logging() -> None:
+    """Flush and stop the background log listener, if running."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -3,7 +3,7 @@ import logging
 import os
 import json
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from decimal import Decimal
 from datetime import date as date_class
 from enum import Enum
@@ -113,6 +113,27 @@ class ValidationRulesConfig:
         """Get list of enabled validation rules."""
         return [rule for rule in cls.RULES.values() if rule.enabled]
     
+    @classmethod
+    def get_message_severity(cls, message: str) -> ValidationSeverity:
+        """
+        Get the severity of a validation message from its "[Rule Name]" prefix.
+        
+        Messages that don't name a known rule (e.g. a rule that crashed) are errors.
+        """
+        for rule in cls.RULES.values():
+            if message.startswith(f"[{rule.name}]"):
+                return ValidationSeverity(rule.severity)
+        return ValidationSeverity.ERROR
+    
+    @classmethod
+    def get_highest_severity(cls, messages: List[str]) -> Optional[str]:
+        """Get the most severe level among validation messages (None when there are none)."""
+        severities = {cls.get_message_severity(message) for message in messages}
+        for severity in (ValidationSeverity.ERROR, ValidationSeverity.WARNING, ValidationSeverity.INFO):
+            if severity in severities:
+                return severity.value
+        return None
+    
     @classmethod
     def is_rule_enabled(cls, rule_id: str) -> bool:
         """Check if a specific rule is enabled."""
@@ -0,0 +1,180 @@
+"""
+Declarative MongoDB index registry.
+
+Every index the backend relies on is declared here and applied at startup;
+repositories only assume the indexes exist. `ensure_indexes` creates
+missing indexes and migrates TTL changes in place, and `index_drift`
+compares the live database against the registry without changing it.
+"""
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import OperationFailure
+
+from app.db.mongodb import MongoDB
+
+logger = logging.getLogger(__name__)
+
+# TTLs for the expiring collections (also used by the services that own them)
+CHECKPOINT_TTL_SECONDS = int(float(os.getenv("CHECKPOINT_TTL_HOURS", "168")) * 3600)
+IDEMPOTENCY_WINDOW_SECONDS = int(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "300"))
+
+# Index options compared for drift (others, like the index version, are ignored)
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds")
+
+
+class IndexSpec:
+    """One index: its collection, key pattern and options."""
+
+    def __init__(self, collection: str, keys: List[Tuple[str, int]], **options: Any):
+        self.collection = collection
+        self.keys = keys
+        self.options = options
+        # Same name MongoDB generates by default, so existing indexes match
+        self.name = "_".join(f"{field}_{direction}" for field, direction in keys)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"collection": self.collection, "name": self.name, "keys": self.keys, **self.options}
+
+
+INDEX_REGISTRY: List[IndexSpec] = [
+    # Plan lookups by id, the keyset-paginated plans list (all or by session,
+    # newest first), pending approvals and batch progress
+    IndexSpec("plans", [("plan_id", 1)], unique=True),
+    IndexSpec("plans", [("session_id", 1), ("created_at", -1), ("plan_id", -1)]),
+    IndexSpec("plans", [("created_at", -1), ("plan_id", -1)]),
+    IndexSpec("plans", [("status", 1), ("updated_at", 1)]),
+    IndexSpec("plans", [("agent_progress.agent_name", 1)]),
+    IndexSpec("plans", [("batch_id", 1)], sparse=True),
+    # Plan message history in order
+    IndexSpec("messages", [("plan_id", 1), ("timestamp", 1)]),
+    # Extraction by plan, newest extractions, the approval policy's known-vendor check
+    # and the period export (all vendors or one) by approval time
+    IndexSpec("invoice_extractions", [("plan_id", 1)]),
+    IndexSpec("invoice_extractions", [("created_at", -1)]),
+    IndexSpec("invoice_extractions", [("invoice_data.vendor_name", 1), ("approved_by", 1)]),
+    IndexSpec("invoice_extractions", [("approved_at", 1)]),
+    IndexSpec("invoice_extractions", [("invoice_data.vendor_name", 1), ("approved_at", 1)]),
+    IndexSpec("approval_audit", [("plan_id", 1), ("created_at", 1)]),
+    # Expiring collections
+    IndexSpec("execution_checkpoints", [("updated_at", 1)], expireAfterSeconds=CHECKPOINT_TTL_SECONDS),
+    IndexSpec("graph_checkpoints", [("thread_id", 1)]),
+    IndexSpec("graph_checkpoints", [("updated_at", 1)], expireAfterSeconds=CHECKPOINT_TTL_SECONDS),
+    IndexSpec("idempotency_keys", [("created_at", 1)], expireAfterSeconds=IDEMPOTENCY_WINDOW_SECONDS),
+]
+
+
+def _differences(spec: IndexSpec, existing: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Options where the live index differs from the spec: {option: {"expected", "actual"}}."""
+    differences = {}
+    for option in COMPARED_OPTIONS:
+        expected = spec.options.get(option)
+        actual = existing.get(option)
+        if option != "expireAfterSeconds":
+            expected, actual = bool(expected), bool(actual)
+        if expected != actual:
+            differences[option] = {"expected": expected, "actual": actual}
+    return differences
+
+
+def _find_existing(spec: IndexSpec, live: Dict[str, Dict[str, Any]]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Live index with the spec's key pattern, as (name, info)."""
+    for name, info in live.items():
+        if [(field, int(direction)) for field, direction in info["key"]] == spec.keys:
+            return name, info
+    return None
+
+
+def _specs_by_collection(collections: Optional[List[str]]) -> Dict[str, List[IndexSpec]]:
+    grouped: Dict[str, List[IndexSpec]] = {}
+    for spec in INDEX_REGISTRY:
+        if collections is None or spec.collection in collections:
+            grouped.setdefault(spec.collection, []).append(spec)
+    return grouped
+
+
+async def index_drift(collections: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Compare live indexes with the registry without changing anything.
+
+    Returns:
+        {"missing": [...], "mismatched": [...], "unregistered": [...]}; all
+        empty when the database matches
+    """
+    db = MongoDB.get_database()
+    report: Dict[str, List[Dict[str, Any]]] = {"missing": [], "mismatched": [], "unregistered": []}
+
+    for collection, specs in _specs_by_collection(collections).items():
+        live = await db[collection].index_information()
+        matched = {"_id_"}
+        for spec in specs:
+            existing = _find_existing(spec, live)
+            if existing is None:
+                report["missing"].append(spec.describe())
+                continue
+            name, info = existing
+            matched.add(name)
+            differences = _differences(spec, info)
+            if differences:
+                report["mismatched"].append({**spec.describe(), "live_name": name, "differences": differences})
+
+        for name in live:
+            if name not in matched:
+                report["unregistered"].append({"collection": collection, "name": name, "keys": live[name]["key"]})
+
+    return report
+
+
+async def ensure_indexes(collections: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Apply the registry: create missing indexes and update changed TTLs in place.
+
+    Other mismatches (e.g. an existing non-unique plan_id index) and
+    unregistered indexes are only reported; they need a manual migration,
+    such as removing duplicate plans before the unique index can be built.
+
+    Args:
+        collections: Limit to these collections (default: all in the registry)
+
+    Returns:
+        {"created": [...], "migrated": [...], "failed": [...], "drift": index_drift()}
+    """
+    db = MongoDB.get_database()
+    created, migrated, failed = [], [], []
+
+    for collection, specs in _specs_by_collection(collections).items():
+        live = await db[collection].index_information()
+        for spec in specs:
+            existing = _find_existing(spec, live)
+            try:
+                if existing is None:
+                    await db[collection].create_index(spec.keys, name=spec.name, **spec.options)
+                    created.append(spec.describe())
+                    logger.info(f"🗂️ Created index {collection}.{spec.name}")
+                    continue
+
+                name, info = existing
+                differences = _differences(spec, info)
+                if set(differences) == {"expireAfterSeconds"} and info.get("expireAfterSeconds") is not None:
+                    await db.command(
+                        "collMod", collection,
+                        index={"name": name, "expireAfterSeconds": spec.options["expireAfterSeconds"]}
+                    )
+                    migrated.append({**spec.describe(), "differences": differences})
+                    logger.info(f"🗂️ Updated TTL of index {collection}.{name}")
+            except OperationFailure as e:
+                failed.append({**spec.describe(), "error": str(e)})
+                logger.error(f"❌ Could not apply index {collection}.{spec.name}: {e}")
+
+    drift = await index_drift(collections)
+    if drift["missing"] or drift["mismatched"]:
+        logger.warning(
+            f"⚠️  Index drift: {len(drift['missing'])} missing, {len(drift['mismatched'])} mismatched "
+            f"(see GET /api/v3/index_drift)"
+        )
+    if drift["unregistered"]:
+        names = ", ".join(f"{index['collection']}.{index['name']}" for index in drift["unregistered"])
+        logger.info(f"🗂️ Indexes not in the registry: {names}")
+
+    return {"created": created, "migrated": migrated, "failed": failed, "drift": drift}
@@ -0,0 +1,253 @@
+"""Write-behind buffer that persists agent messages in insert_many batches."""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, PyMongoError, WTimeoutError
+
+from app.db.mongodb import MongoDB
+from app.db.plan_cache import MESSAGES_PART, plan_cache
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "messages"
+DUPLICATE_KEY_ERROR = 11000
+RETRY_DELAY = 1.0  # Seconds before the first retry of a failed batch, doubling per attempt
+MAX_RETRY_DELAY = 30.0
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a write error may succeed on retry (network, failover, timeouts)."""
+    if isinstance(error, (ConnectionFailure, ExecutionTimeout, WTimeoutError, asyncio.TimeoutError, OSError)):
+        return True
+    if isinstance(error, BulkWriteError):
+        # Only write concern errors: the documents are in, a retry sees duplicates
+        return not error.details.get("writeErrors")
+    return isinstance(error, PyMongoError) and error.has_error_label("RetryableWriteError")
+
+
+class MessageWriteBuffer:
+    """
+    Groups message inserts into insert_many batches, by size or time.
+
+    Each message gets its `_id` when it is buffered, so retries are
+    idempotent and readers can merge buffered messages with stored ones
+    without duplicates. A single flusher writes batches in arrival order
+    (ordered inserts), which keeps every plan's messages in order.
+
+    Transient errors retry the batch with exponential backoff, up to
+    max_retries attempts; a batch still failing after that is dropped (and
+    logged) so producers waiting in add() aren't blocked forever. A message
+    the database rejects (validation, invalid BSON) is logged and skipped,
+    and the rest of its batch is retried straight away.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        max_pending: int = 10000,
+        max_retries: int = 5
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._pending: List[Dict[str, Any]] = []
+        self._inflight: List[Dict[str, Any]] = []
+        self._attempts = 0  # Consecutive failed attempts at the oldest batch
+        self._isolate = 0  # Messages to write one at a time, to find one the database rejects
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = {"buffered": 0, "written": 0, "batches": 0, "retries": 0, "waits": 0, "skipped": 0, "dropped": 0}
+
+    def _ensure_started(self) -> None:
+        """Start the flusher on first use (in the running event loop)."""
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._stopping = False
+            self._flusher = asyncio.create_task(self._run())
+
+    async def add(self, document: Dict[str, Any]) -> ObjectId:
+        """
+        Buffer a message document for writing.
+
+        Waits for room when max_pending messages are already buffered.
+
+        Returns:
+            The message's `_id`
+        """
+        self._ensure_started()
+        if len(self._pending) >= self.max_pending:
+            self._stats["waits"] += 1
+            self._wakeup.set()
+            async with self._space:
+                await self._space.wait_for(lambda: len(self._pending) < self.max_pending)
+
+        document.setdefault("_id", ObjectId())
+        self._pending.append(document)
+        self._stats["buffered"] += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return document["_id"]
+
+    def buffered_for(self, plan_id: str) -> List[Dict[str, Any]]:
+        """Messages for the plan that may not be stored yet (in flight first, then pending)."""
+        return [doc for doc in self._inflight + self._pending if doc.get("plan_id") == plan_id]
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if len(self._pending) < self.batch_size and not self._stopping and not self._isolate:
+                # Collect more messages until the batch fills or the interval ends
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if not await self._flush_batch():
+                await asyncio.sleep(min(RETRY_DELAY * 2 ** (self._attempts - 1), MAX_RETRY_DELAY))
+
+    async def _flush_batch(self) -> bool:
+        """
+        Write the oldest batch; on failure put the unwritten messages back in front.
+
+        Returns:
+            False if the batch hit a transient error and should be retried after a backoff
+        """
+        size = 1 if self._isolate else self.batch_size
+        self._inflight = self._pending[:size]
+        del self._pending[:size]
+        batch = self._inflight
+        self._isolate = max(self._isolate - len(batch), 0)
+        stored = batch
+        backoff = False
+
+        try:
+            await MongoDB.get_database()[COLLECTION].insert_many(batch, ordered=True)
+            self._attempts = 0
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if not errors:
+                stored, backoff = [], self._retry(batch, e)
+            else:
+                # Ordered insert stops at the first error. A duplicate _id there is
+                # a message an earlier, ambiguous attempt already stored; any other
+                # error rejects that message, which is skipped
+                index = errors[0].get("index", e.details.get("nInserted", 0))
+                stored = batch[:index]
+                if errors[0].get("code") == DUPLICATE_KEY_ERROR:
+                    stored = batch[:index + 1]
+                else:
+                    self._skip(batch[index], errors[0].get("errmsg", e))
+                self._requeue(batch[index + 1:])
+                self._attempts = 0
+        except Exception as e:
+            stored = []
+            if is_transient(e):
+                backoff = self._retry(batch, e)
+            elif len(batch) > 1:
+                # Rejected without saying which message: write the batch one
+                # message at a time to find it
+                logger.warning(f"⚠️ Message batch rejected, writing its {len(batch)} messages one by one: {e}")
+                self._isolate = len(batch)
+                self._requeue(batch)
+            else:
+                self._skip(batch[0], e)
+
+        self._inflight = []
+        if stored:
+            plan_cache.invalidate({doc["plan_id"] for doc in stored}, MESSAGES_PART)
+        self._stats["written"] += len(stored)
+        self._stats["batches"] += 1
+        async with self._space:
+            self._space.notify_all()
+        return not backoff
+
+    def _retry(self, batch: List[Dict[str, Any]], error: Exception) -> bool:
+        """Requeue a batch that hit a transient error, or drop it once max_retries is used up."""
+        self._attempts += 1
+        if self._attempts > self.max_retries:
+            plan_ids = sorted({doc.get("plan_id") for doc in batch})
+            logger.error(
+                f"❌ Dropping {len(batch)} message(s) for plans {plan_ids} "
+                f"after {self.max_retries} failed retries: {error}"
+            )
+            self._stats["dropped"] += len(batch)
+            self._attempts = 0
+            return False
+        logger.error(
+            f"❌ Message batch write failed (attempt {self._attempts}/{self.max_retries + 1}), "
+            f"retrying {len(batch)} message(s): {error}"
+        )
+        self._stats["retries"] += 1
+        self._requeue(batch)
+        return True
+
+    def _requeue(self, documents: List[Dict[str, Any]]) -> None:
+        self._pending[:0] = documents
+
+    def _skip(self, document: Dict[str, Any], error: Any) -> None:
+        """Log a message the database rejected and leave it out (the log keeps it recoverable)."""
+        logger.error(
+            f"❌ Skipping message {document.get('_id')} for plan {document.get('plan_id')} "
+            f"rejected by the database: {error}; document: {document!r}"
+        )
+        self._stats["skipped"] += 1
+
+    async def flush(self) -> None:
+        """Write every buffered message and wait until they are stored."""
+        while self._pending or self._inflight:
+            self._ensure_started()
+            self._wakeup.set()
+            async with self._space:
+                await self._space.wait_for(lambda: not self._pending and not self._inflight)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Flush remaining messages and stop the flusher (on shutdown)."""
+        if self._flusher is None or self._flusher.done():
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._flusher), timeout=timeout)
+            logger.info("✅ Message buffer flushed")
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Message buffer flush timed out with {len(self._pending)} message(s) unwritten")
+            self._flusher.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Buffer gauges: pending and in-flight messages, batches written."""
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "inflight": len(self._inflight),
+            "avg_batch_size": round(self._stats["written"] / batches, 1) if batches else None,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000
+        }
+
+
+def create_message_buffer() -> MessageWriteBuffer:
+    """Build the buffer from MESSAGE_* environment variables."""
+    return MessageWriteBuffer(
+        batch_size=int(os.getenv("MESSAGE_BATCH_SIZE", "100")),
+        flush_interval=float(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "50")) / 1000,
+        max_pending=int(os.getenv("MESSAGE_BUFFER_LIMIT", "10000")),
+        max_retries=int(os.getenv("MESSAGE_MAX_RETRIES", "5"))
+    )
+
+
+# Global message write buffer
+message_buffer = create_message_buffer()
@@ -1,23 +1,150 @@
 """
 MongoDB connection and database management.
 """
+import asyncio
 import logging
 import os
-from typing import Optional
+import threading
+import warnings
+from typing import Any, Dict, List, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from pymongo.compression_support import validate_compressors
 from dotenv import load_dotenv
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+def _available_compressors(requested: str) -> List[str]:
+    """
+    Requested wire compressors (zstd, snappy, zlib) in preference order,
+    minus those the driver can't use because their package isn't installed.
+    """
+    if not requested.strip():
+        return []
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        compressors = validate_compressors("compressors", requested)
+    for warning in caught:
+        logger.warning(f"MongoDB compression: {warning.message}")
+    return compressors
+
+
+def _pool_settings() -> Dict[str, Any]:
+    """Connection pool and client options from MONGODB_* environment variables."""
+    return {
+        "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE", "10")),
+        "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE", "100")),
+        "waitQueueTimeoutMS": int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "compressors": _available_compressors(os.getenv("MONGODB_COMPRESSORS", "")),
+        "readPreference": os.getenv("MONGODB_READ_PREFERENCE", "primary")
+    }
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Connection pool counters, fed by PyMongo's pool events.
+    
+    Events arrive on the driver's threads, so counters are updated under
+    a lock. `waiting` is checkouts started but not yet served; checkouts
+    that start while every connection up to maxPoolSize is in use are
+    counted as `saturated` since they queue for a check-in.
+    """
+    
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self._stats = {
+            "open": 0,
+            "created": 0,
+            "closed": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "waiting": 0,
+            "peak_waiting": 0,
+            "checkouts": 0,
+            "saturated": 0,
+            "checkout_failures": {},
+            "pool_clears": 0
+        }
+        self._checkout_seconds_total = 0.0
+        self._checkout_seconds_max = 0.0
+    
+    def connection_created(self, event):
+        with self._lock:
+            self._stats["open"] += 1
+            self._stats["created"] += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self._stats["open"] -= 1
+            self._stats["closed"] += 1
+    
+    def connection_check_out_started(self, event):
+        with self._lock:
+            if self._stats["in_use"] >= self.max_pool_size:
+                self._stats["saturated"] += 1
+            self._stats["waiting"] += 1
+            self._stats["peak_waiting"] = max(self._stats["peak_waiting"], self._stats["waiting"])
+    
+    def connection_checked_out(self, event):
+        duration = getattr(event, "duration", None) or 0.0  # Only reported by PyMongo 4.7+
+        with self._lock:
+            self._stats["waiting"] -= 1
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+            self._checkout_seconds_total += duration
+            self._checkout_seconds_max = max(self._checkout_seconds_max, duration)
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._stats["waiting"] -= 1
+            failures = self._stats["checkout_failures"]
+            failures[event.reason] = failures.get(event.reason, 0) + 1
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._stats["in_use"] -= 1
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self._stats["pool_clears"] += 1
+    
+    # Remaining pool events aren't counted
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            checkouts = self._stats["checkouts"]
+            return {
+                **self._stats,
+                "checkout_failures": dict(self._stats["checkout_failures"]),
+                "avg_checkout_ms": round(self._checkout_seconds_total / checkouts * 1000, 3) if checkouts else None,
+                "max_checkout_ms": round(self._checkout_seconds_max * 1000, 3)
+            }
+
 
 class MongoDB:
     """MongoDB connection manager."""
     
     client: Optional[AsyncIOMotorClient] = None
     database: Optional[AsyncIOMotorDatabase] = None
+    settings: Dict[str, Any] = {}
+    pool_listener: Optional[PoolStatsListener] = None
     
     @classmethod
     def connect(cls):
@@ -26,13 +153,45 @@ class MongoDB:
         database_name = os.getenv("MONGODB_DATABASE", "macae_db")
         
         try:
-            cls.client = AsyncIOMotorClient(mongodb_url)
+            cls.settings = _pool_settings()
+            cls.pool_listener = PoolStatsListener(cls.settings["maxPoolSize"])
+            options = {key: value for key, value in cls.settings.items() if value != []}
+            cls.client = AsyncIOMotorClient(mongodb_url, event_listeners=[cls.pool_listener], **options)
             cls.database = cls.client[database_name]
-            logger.info(f"Connected to MongoDB: {database_name}")
+            logger.info(
+                f"Connected to MongoDB: {database_name} (pool {cls.settings['minPoolSize']}-"
+                f"{cls.settings['maxPoolSize']}, compressors: {', '.join(cls.settings['compressors']) or 'none'}, "
+                f"read preference: {cls.settings['readPreference']})"
+            )
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
             raise
     
+    @classmethod
+    async def warm_up(cls) -> int:
+        """
+        Open minPoolSize connections before the first request needs them.
+        
+        Runs that many pings at once, so each checks out its own
+        connection; the driver keeps the pool at that size afterwards.
+        
+        Returns:
+            Open connections after warming up
+        """
+        min_pool_size = cls.settings.get("minPoolSize", 0)
+        if cls.client is None or min_pool_size <= 0:
+            return 0
+        await asyncio.gather(*(cls.client.admin.command("ping") for _ in range(min_pool_size)))
+        return cls.pool_listener.get_stats()["open"] if cls.pool_listener else 0
+    
+    @classmethod
+    def get_pool_stats(cls) -> Dict[str, Any]:
+        """Pool settings and counters (checkouts, waits, connections in use)."""
+        return {
+            "settings": cls.settings,
+            "pool": cls.pool_listener.get_stats() if cls.pool_listener else None
+        }
+    
     @classmethod
     def close(cls):
         """Close MongoDB connection."""
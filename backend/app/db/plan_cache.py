@@ -0,0 +1,273 @@
+"""Per-process read-through cache for plans and their stored messages."""
+import asyncio
+import copy
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from app.db.mongodb import MongoDB
+
+logger = logging.getLogger(__name__)
+
+# Cached parts of a plan, invalidated separately
+PLAN_PART = "plan"
+MESSAGES_PART = "messages"
+
+# Plan events that aren't cache invalidations
+PLAN_CANCELLED_EVENT = "cancelled"
+
+LOCAL_CHANNEL = "local"
+MONGO_CHANNEL = "mongo"
+
+
+class PlanCache:
+    """
+    LRU cache of plans (by plan_id, carrying their `version`) and of each
+    plan's stored message list.
+
+    Repository writes invalidate entries; a read only fills the cache when
+    no invalidation for that plan happened since the read started, so a
+    read racing a write never caches the older document. Entries also
+    expire after `ttl` seconds as a safety net for missed events.
+
+    Long-polling readers watch a plan and are woken by any change to it,
+    local or from another worker.
+    """
+
+    def __init__(self, size: int = 1000, ttl: float = 60.0):
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        # (plan_id, part) -> sequence number of its last invalidation
+        self._invalidated: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._invalidated_floor = 0  # Highest sequence number forgotten from _invalidated
+        self._sequence = 0
+        self._watchers: Dict[str, Set[asyncio.Event]] = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "remote_invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def token(self) -> int:
+        """Taken before a database read and passed to put()."""
+        return self._sequence
+
+    def get(self, plan_id: str, part: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        key = (plan_id, part)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, plan_id: str, part: str, value: Any, token: int) -> None:
+        """Cache a value read from the database, unless it was invalidated since `token`."""
+        if not self.enabled:
+            return
+        key = (plan_id, part)
+        if self._invalidated.get(key, self._invalidated_floor) > token:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, plan_ids: Iterable[str], part: str, publish: bool = True) -> None:
+        """Drop cached entries after a write (and tell the other workers)."""
+        plan_ids = list(plan_ids)
+        for plan_id in plan_ids:
+            key = (plan_id, part)
+            self._sequence += 1
+            self._entries.pop(key, None)
+            self._invalidated[key] = self._sequence
+            self._invalidated.move_to_end(key)
+        # Keep invalidation marks for a few times as many plans as are cached
+        while len(self._invalidated) > max(self.size * 4, 1024):
+            _, sequence = self._invalidated.popitem(last=False)
+            self._invalidated_floor = max(self._invalidated_floor, sequence)
+
+        if publish:
+            self._stats["invalidations"] += len(plan_ids)
+            plan_event_channel.publish(plan_ids, part)
+        else:
+            self._stats["remote_invalidations"] += len(plan_ids)
+        self.notify(plan_ids)
+
+    def watch(self, plan_id: str) -> asyncio.Event:
+        """Event set on the plan's next change; register before reading, then unwatch()."""
+        event = asyncio.Event()
+        self._watchers.setdefault(plan_id, set()).add(event)
+        return event
+
+    def unwatch(self, plan_id: str, event: asyncio.Event) -> None:
+        watchers = self._watchers.get(plan_id)
+        if watchers is not None:
+            watchers.discard(event)
+            if not watchers:
+                del self._watchers[plan_id]
+
+    def notify(self, plan_ids: Iterable[str]) -> None:
+        """Wake readers watching these plans."""
+        for plan_id in plan_ids:
+            for event in self._watchers.get(plan_id, ()):
+                event.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "cached": len(self._entries),
+            "watched_plans": len(self._watchers),
+            "size": self.size,
+            "ttl_seconds": self.ttl,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else None,
+            "channel": plan_event_channel.get_stats()
+        }
+
+
+class PlanEventChannel:
+    """
+    Cross-worker plan change events over a capped MongoDB collection.
+
+    Each worker appends the plans it changed (in small write-behind
+    batches) and tails the collection for other workers' events, which
+    invalidate its own cache. Other event kinds (e.g. a cancellation) go
+    to the handler registered with on(). Where the collection can't be
+    tailed, the tail falls back to polling every `poll_interval` seconds.
+    """
+
+    COLLECTION = "plan_events"
+
+    def __init__(self, mode: str = MONGO_CHANNEL, capped_bytes: int = 1_048_576, poll_interval: float = 1.0):
+        self.mode = mode
+        self.capped_bytes = capped_bytes
+        self.poll_interval = poll_interval
+        self.worker_id = uuid.uuid4().hex
+        self._outbox: List[Dict[str, Any]] = []
+        self._outbox_ready: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._handlers: Dict[str, Callable[[str], Any]] = {}
+        self._stats = {"published": 0, "received": 0, "errors": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Create the capped collection and start publishing and tailing (mongo mode only)."""
+        if self.mode != MONGO_CHANNEL or self.running:
+            return
+        db = MongoDB.get_database()
+        try:
+            await db.create_collection(self.COLLECTION, capped=True, size=self.capped_bytes)
+        except CollectionInvalid:
+            pass  # Already exists
+        except Exception as e:
+            logger.warning(f"⚠️  Could not create capped {self.COLLECTION} collection, polling instead: {e}")
+
+        self._outbox_ready = asyncio.Event()
+        newest = await db[self.COLLECTION].find_one({}, sort=[("_id", -1)])
+        last_id = newest["_id"] if newest else ObjectId()
+        self._tasks = [asyncio.create_task(self._publish_loop()), asyncio.create_task(self._tail_loop(last_id))]
+        logger.info(f"📡 Plan event channel started (worker {self.worker_id[:8]})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def on(self, part: str, handler: Callable[[str], Any]) -> None:
+        """Call handler(plan_id) for other workers' events of this kind instead of invalidating the cache."""
+        self._handlers[part] = handler
+
+    def publish(self, plan_ids: List[str], part: str) -> None:
+        """Queue change events for the other workers (no-op when the channel isn't running)."""
+        if not self.running or not plan_ids:
+            return
+        self._outbox.extend({"plan_id": plan_id, "part": part, "source": self.worker_id} for plan_id in plan_ids)
+        self._outbox_ready.set()
+
+    async def _publish_loop(self) -> None:
+        collection = MongoDB.get_database()[self.COLLECTION]
+        while True:
+            await self._outbox_ready.wait()
+            self._outbox_ready.clear()
+            events, self._outbox = self._outbox, []
+            try:
+                await collection.insert_many(events, ordered=False)
+                self._stats["published"] += len(events)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"❌ Could not publish {len(events)} plan event(s): {e}")
+
+    async def _tail_loop(self, last_id: ObjectId) -> None:
+        collection = MongoDB.get_database()[self.COLLECTION]
+        cursor = None
+        while True:
+            try:
+                if cursor is None or not getattr(cursor, "alive", False):
+                    if cursor is not None:
+                        await asyncio.sleep(self.poll_interval)
+                    cursor = collection.find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                async for event in cursor:
+                    last_id = event["_id"]
+                    self._stats["received"] += 1
+                    if event.get("source") != self.worker_id:
+                        self._dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"❌ Plan event tail failed, reopening: {e}")
+                cursor = None
+                await asyncio.sleep(self.poll_interval)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        handler = self._handlers.get(event["part"])
+        if handler is None:
+            plan_cache.invalidate([event["plan_id"]], event["part"], publish=False)
+            return
+        try:
+            handler(event["plan_id"])
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"❌ Plan event handler for {event['part']} failed [plan={event['plan_id']}]: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "running": self.running, "pending": len(self._outbox), **self._stats}
+
+
+def create_plan_cache() -> PlanCache:
+    """Build the cache from PLAN_CACHE_SIZE and PLAN_CACHE_TTL_SECONDS (size 0 disables it)."""
+    return PlanCache(
+        size=int(os.getenv("PLAN_CACHE_SIZE", "1000")),
+        ttl=float(os.getenv("PLAN_CACHE_TTL_SECONDS", "60"))
+    )
+
+
+def create_plan_event_channel() -> PlanEventChannel:
+    """Build the channel from PLAN_CACHE_CHANNEL (mongo | local) and PLAN_EVENTS_POLL_INTERVAL."""
+    mode = os.getenv("PLAN_CACHE_CHANNEL", MONGO_CHANNEL).lower()
+    if mode not in (MONGO_CHANNEL, LOCAL_CHANNEL):
+        logger.warning(f"Unknown PLAN_CACHE_CHANNEL '{mode}', using {MONGO_CHANNEL}")
+        mode = MONGO_CHANNEL
+    return PlanEventChannel(mode=mode, poll_interval=float(os.getenv("PLAN_EVENTS_POLL_INTERVAL", "1")))
+
+
+# Global plan cache and its cross-worker invalidation channel
+plan_event_channel = create_plan_event_channel()
+plan_cache = create_plan_cache()
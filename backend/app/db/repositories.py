@@ -1,18 +1,56 @@
 """Database repositories for data access."""
+import asyncio
 import logging
-from typing import List, Optional
-from datetime import datetime
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
 
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.db.message_buffer import message_buffer
 from app.db.mongodb import MongoDB
+from app.db.plan_cache import MESSAGES_PART, PLAN_PART, plan_cache
 from app.models.plan import Plan
 from app.models.message import AgentMessage
 
 logger = logging.getLogger(__name__)
 
+# Plan transitions for the same plan within this window are merged into one update
+PLAN_WRITE_COALESCE_MS = float(os.getenv("PLAN_WRITE_COALESCE_MS", "5"))
+
+
+class _PendingTransition:
+    """Changes queued for one plan until the coalescing window closes."""
+    
+    def __init__(self, previous: Optional[asyncio.Future]):
+        self.status: Optional[str] = None
+        self.extraction_data: Optional[dict] = None
+        self.agent_progress: Dict[str, dict] = {}  # agent name -> progress entry
+        self.requests = 0
+        # Flush of the previous batch for this plan, written first to keep order
+        self.previous = previous
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
 
 class PlanRepository:
     """Repository for plan operations."""
     
+    # Statuses of plans paused on a human decision
+    PENDING_APPROVAL_STATUSES = ("pending_approval", "pending_extraction_approval", "pending_clarification")
+    
+    # A cancelled plan keeps its status: transitions from jobs still running
+    # (possibly on another worker) no longer apply to it
+    CANCELLED_STATUS = "cancelled"
+    
+    # Heavy fields left out of plan listings
+    LIST_EXCLUDED_FIELDS = ("steps", "agent_progress", "extraction_data")
+    
+    # Coalescing state: queued changes per plan, the last flush per plan and counters
+    _pending_transitions: Dict[str, _PendingTransition] = {}
+    _last_flush: Dict[str, asyncio.Future] = {}
+    _write_stats = {"transitions": 0, "writes": 0, "failed": 0}
+    
     @staticmethod
     async def create(plan: Plan) -> str:
         """Create a new plan."""
@@ -27,115 +65,342 @@ class PlanRepository:
         return plan.id
     
     @staticmethod
-    async def get_by_id(plan_id: str) -> Optional[Plan]:
-        """Get plan by ID."""
+    async def create_many(plans: List[Plan]) -> List[str]:
+        """Create several plans with a single bulk insert."""
         db = MongoDB.get_database()
         collection = db["plans"]
         
-        plan_dict = await collection.find_one({"plan_id": plan_id})
+        plan_dicts = []
+        for plan in plans:
+            plan_dict = plan.model_dump(by_alias=True)
+            plan_dict["plan_id"] = plan.id
+            plan_dicts.append(plan_dict)
+        
+        if plan_dicts:
+            await collection.insert_many(plan_dicts)
+        logger.info(f"Created {len(plan_dicts)} plans")
+        return [plan.id for plan in plans]
+    
+    @staticmethod
+    async def get_by_id(plan_id: str) -> Optional[Plan]:
+        """Get plan by ID (read through the plan cache)."""
+        plan_dict = plan_cache.get(plan_id, PLAN_PART)
+        if plan_dict is None:
+            db = MongoDB.get_database()
+            collection = db["plans"]
+            
+            token = plan_cache.token()
+            plan_dict = await collection.find_one({"plan_id": plan_id})
+            if plan_dict:
+                plan_cache.put(plan_id, PLAN_PART, plan_dict, token)
         if plan_dict:
             plan_dict["id"] = plan_dict["plan_id"]
             return Plan(**plan_dict)
         return None
     
     @staticmethod
-    async def get_all(session_id: Optional[str] = None) -> List[Plan]:
-        """Get all plans, optionally filtered by session_id, sorted by created_at descending (newest first)."""
+    async def get_page(
+        session_id: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[Tuple[datetime, str]] = None,
+        summary: bool = True
+    ) -> Tuple[List[Plan], Optional[Tuple[datetime, str]]]:
+        """
+        Get one page of plans, newest first, optionally filtered by session_id.
+        
+        Keyset pagination on (created_at, plan_id): each page continues
+        after the last plan of the previous one, so every page costs the
+        same however much history there is.
+        
+        Args:
+            session_id: Only plans from this session
+            limit: Page size
+            after: (created_at, plan_id) of the last plan on the previous page
+            summary: Leave out steps, agent progress and extraction data
+            
+        Returns:
+            (plans, position to pass as `after` for the next page, or None on the last page)
+        """
         db = MongoDB.get_database()
         collection = db["plans"]
         
         query = {"session_id": session_id} if session_id else {}
-        # Sort by created_at descending (newest first) for reverse chronological order
-        cursor = collection.find(query).sort("created_at", -1)
+        if after:
+            created_at, plan_id = after
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "plan_id": {"$lt": plan_id}}
+            ]
+        projection = {field: 0 for field in PlanRepository.LIST_EXCLUDED_FIELDS} if summary else None
+        
+        # One extra plan tells whether there is a next page
+        cursor = collection.find(query, projection).sort([("created_at", -1), ("plan_id", -1)]).limit(limit + 1)
         
         plans = []
         async for plan_dict in cursor:
             plan_dict["id"] = plan_dict["plan_id"]
             plans.append(Plan(**plan_dict))
         
-        return plans
+        if len(plans) <= limit:
+            return plans, None
+        plans = plans[:limit]
+        return plans, (plans[-1].created_at, plans[-1].id)
     
     @staticmethod
     async def update_status(plan_id: str, status: str) -> bool:
         """Update plan status."""
+        return await PlanRepository.transition(plan_id, status=status)
+    
+    @staticmethod
+    async def list_pending_approvals(
+        statuses: List[str],
+        agent_name: Optional[str] = None,
+        severity: Optional[str] = None,
+        session_id: Optional[str] = None,
+        limit: int = 100
+    ) -> List[dict]:
+        """
+        List plans waiting on a human decision, oldest first.
+        
+        Only the fields needed for the approval queue are loaded.
+        """
         db = MongoDB.get_database()
         collection = db["plans"]
         
-        result = await collection.update_one(
-            {"plan_id": plan_id},
-            {"$set": {"status": status, "updated_at": datetime.utcnow()}}
-        )
-        return result.modified_count > 0
+        query = {"status": {"$in": statuses}}
+        if agent_name:
+            query["agent_progress.agent_name"] = agent_name
+        if severity:
+            query["extraction_data.validation_severity"] = severity
+        if session_id:
+            query["session_id"] = session_id
+        
+        projection = {
+            "_id": 0,
+            "plan_id": 1,
+            "session_id": 1,
+            "batch_id": 1,
+            "description": 1,
+            "status": 1,
+            "agent_progress": 1,
+            "extraction_data.validation_severity": 1,
+            "extraction_data.validation_errors": 1,
+            "extraction_data.invoice_data.vendor_name": 1,
+            "extraction_data.invoice_data.invoice_number": 1,
+            "extraction_data.invoice_data.total_amount": 1,
+            "extraction_data.invoice_data.currency": 1,
+            "updated_at": 1
+        }
+        cursor = collection.find(query, projection).sort("updated_at", 1).limit(limit)
+        return [plan_dict async for plan_dict in cursor]
     
     @staticmethod
-    async def update_agent_progress(plan_id: str, agent_name: str, status: str) -> bool:
-        """Update or add agent progress entry."""
+    async def get_statuses(plan_ids: List[str]) -> Dict[str, str]:
+        """Get the status of several plans in one query."""
         db = MongoDB.get_database()
         collection = db["plans"]
         
-        progress_entry = {
-            "agent_name": agent_name,
-            "status": status,
-            "timestamp": datetime.utcnow()
-        }
-        
-        # First, remove existing entry for this agent (if any)
-        await collection.update_one(
-            {"plan_id": plan_id},
-            {"$pull": {"agent_progress": {"agent_name": agent_name}}}
-        )
+        cursor = collection.find({"plan_id": {"$in": plan_ids}}, {"_id": 0, "plan_id": 1, "status": 1})
+        return {plan_dict["plan_id"]: plan_dict["status"] async for plan_dict in cursor}
+    
+    @staticmethod
+    async def update_status_many(plan_ids: List[str], status: str) -> int:
+        """Update the status of several plans at once."""
+        db = MongoDB.get_database()
+        collection = db["plans"]
         
-        # Then add the new entry
-        result = await collection.update_one(
-            {"plan_id": plan_id},
-            {
-                "$push": {"agent_progress": progress_entry},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
+        result = await collection.update_many(
+            {"plan_id": {"$in": plan_ids}},
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
         )
+        plan_cache.invalidate(plan_ids, PLAN_PART)
+        return result.modified_count
+    
+    @staticmethod
+    async def count_by_status(batch_id: str) -> Dict[str, int]:
+        """Count a batch's plans per status."""
+        db = MongoDB.get_database()
+        collection = db["plans"]
         
-        return result.modified_count > 0
+        pipeline = [
+            {"$match": {"batch_id": batch_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]
+        counts = {}
+        async for row in collection.aggregate(pipeline):
+            counts[row["_id"]] = row["count"]
+        return counts
+    
+    @staticmethod
+    async def update_agent_progress(plan_id: str, agent_name: str, status: str) -> bool:
+        """Update or add agent progress entry."""
+        return await PlanRepository.transition(plan_id, agent_progress={agent_name: status})
     
     @staticmethod
     async def update_extraction_data(plan_id: str, extraction_data: dict) -> bool:
         """Store extraction data in plan."""
-        db = MongoDB.get_database()
-        collection = db["plans"]
+        return await PlanRepository.transition(plan_id, extraction_data=extraction_data)
+    
+    @staticmethod
+    async def transition(
+        plan_id: str,
+        status: Optional[str] = None,
+        agent_progress: Optional[Dict[str, str]] = None,
+        extraction_data: Optional[dict] = None
+    ) -> bool:
+        """
+        Apply a plan state change (status, agent progress, extraction data) in one update.
         
-        result = await collection.update_one(
-            {"plan_id": plan_id},
-            {"$set": {"extraction_data": extraction_data, "updated_at": datetime.utcnow()}}
-        )
-        return result.modified_count > 0
+        Agent progress is keyed by agent name: each named agent's entry is
+        replaced in the same atomic update. Transitions for the same plan
+        made within PLAN_WRITE_COALESCE_MS are merged (later values win)
+        into a single write; every caller waits for that write, so the
+        change is stored once this returns. Once a plan is cancelled, no
+        transition applies to it any more (including within the same
+        window), so late jobs can't overwrite the cancellation.
+        
+        Args:
+            plan_id: Plan identifier
+            status: New plan status
+            agent_progress: {agent name: progress status}
+            extraction_data: Extraction data for history display and approval filtering
+            
+        Returns:
+            True if the plan was modified (False once it is cancelled)
+        """
+        pending = PlanRepository._pending_transitions.get(plan_id)
+        if pending is None:
+            pending = _PendingTransition(PlanRepository._last_flush.get(plan_id))
+            PlanRepository._pending_transitions[plan_id] = pending
+            PlanRepository._last_flush[plan_id] = pending.future
+            asyncio.create_task(PlanRepository._flush_transition(plan_id, pending))
+        
+        if status is not None and pending.status != PlanRepository.CANCELLED_STATUS:
+            pending.status = status
+        if extraction_data is not None:
+            pending.extraction_data = extraction_data
+        now = datetime.utcnow()
+        for agent_name, agent_status in (agent_progress or {}).items():
+            pending.agent_progress[agent_name] = {"agent_name": agent_name, "status": agent_status, "timestamp": now}
+        pending.requests += 1
+        PlanRepository._write_stats["transitions"] += 1
+        
+        # Shielded so a cancelled caller doesn't abort the write for the others
+        return await asyncio.shield(pending.future)
+    
+    @staticmethod
+    async def _flush_transition(plan_id: str, pending: _PendingTransition) -> None:
+        """Close the coalescing window and write the merged changes."""
+        await asyncio.sleep(PLAN_WRITE_COALESCE_MS / 1000)
+        PlanRepository._pending_transitions.pop(plan_id, None)
+        if pending.previous is not None:
+            await asyncio.wait([pending.previous])
+        
+        # Pipeline update; payload values are $literal so strings like "$120.00" aren't read as field paths
+        fields: Dict[str, Any] = {
+            "updated_at": datetime.utcnow(),
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+        }
+        if pending.status is not None:
+            fields["status"] = {"$literal": pending.status}
+        if pending.extraction_data is not None:
+            fields["extraction_data"] = {"$literal": pending.extraction_data}
+        if pending.agent_progress:
+            fields["agent_progress"] = {"$concatArrays": [
+                {"$filter": {
+                    "input": {"$ifNull": ["$agent_progress", []]},
+                    "as": "entry",
+                    "cond": {"$not": {"$in": ["$$entry.agent_name", {"$literal": list(pending.agent_progress)}]}}
+                }},
+                {"$literal": list(pending.agent_progress.values())}
+            ]}
+        
+        try:
+            db = MongoDB.get_database()
+            query: Dict[str, Any] = {"plan_id": plan_id}
+            if pending.status != PlanRepository.CANCELLED_STATUS:
+                query["status"] = {"$ne": PlanRepository.CANCELLED_STATUS}
+            result = await db["plans"].update_one(query, [{"$set": fields}])
+            PlanRepository._write_stats["writes"] += 1
+            pending.future.set_result(result.modified_count > 0)
+        except Exception as e:
+            PlanRepository._write_stats["failed"] += 1
+            logger.error(f"Plan transition failed for plan {plan_id}: {e}")
+            pending.future.set_exception(e)
+            pending.future.exception()  # Retrieved here in case every caller was cancelled
+        finally:
+            plan_cache.invalidate([plan_id], PLAN_PART)
+            if PlanRepository._last_flush.get(plan_id) is pending.future:
+                del PlanRepository._last_flush[plan_id]
+        
+        if pending.requests > 1:
+            logger.debug(f"Coalesced {pending.requests} transitions for plan {plan_id} into one write")
+    
+    @staticmethod
+    def get_write_stats() -> Dict[str, Any]:
+        """Plan transition counters: requested transitions vs. update round trips."""
+        stats = PlanRepository._write_stats
+        return {
+            **stats,
+            "pending": len(PlanRepository._pending_transitions),
+            "coalesce_window_ms": PLAN_WRITE_COALESCE_MS,
+            "transitions_per_write": round(stats["transitions"] / stats["writes"], 2) if stats["writes"] else None
+        }
 
 
 class MessageRepository:
-    """Repository for message operations."""
+    """
+    Repository for message operations.
+    
+    Messages are written behind through `message_buffer` in insert_many
+    batches; reads merge in the plan's messages that are still buffered.
+    """
     
     @staticmethod
     async def create(message: AgentMessage) -> str:
-        """Create a new message."""
-        db = MongoDB.get_database()
-        collection = db["messages"]
-        
-        message_dict = message.model_dump()
-        result = await collection.insert_one(message_dict)
-        logger.info(f"Created message for plan: {message.plan_id}")
-        return str(result.inserted_id)
+        """Create a new message (stored with the next batch)."""
+        message_id = await message_buffer.add(message.model_dump())
+        # Buffered messages are readable at once, so wake long-polling readers now
+        plan_cache.notify([message.plan_id])
+        logger.debug(f"Buffered message for plan: {message.plan_id}")
+        return str(message_id)
     
     @staticmethod
     async def get_by_plan_id(plan_id: str) -> List[AgentMessage]:
-        """Get all messages for a plan."""
+        """Get all messages for a plan, including ones not yet flushed."""
+        return [AgentMessage(**message_dict) for message_dict in await MessageRepository.get_documents(plan_id)]
+    
+    @staticmethod
+    async def get_documents(plan_id: str) -> List[dict]:
+        """
+        Get all messages for a plan as plain documents, in order.
+        
+        Every stored message was written from an AgentMessage, so the
+        documents already have its fields and skip model validation; only
+        `_id` is dropped.
+        """
         db = MongoDB.get_database()
         collection = db["messages"]
         
-        cursor = collection.find({"plan_id": plan_id}).sort("timestamp", 1)
-        
-        messages = []
-        async for message_dict in cursor:
-            messages.append(AgentMessage(**message_dict))
-        
-        return messages
+        # Snapshot the buffer before querying: a batch flushed in between then
+        # shows up in both and is deduplicated by _id, rather than in neither
+        buffered = message_buffer.buffered_for(plan_id)
+        message_dicts = plan_cache.get(plan_id, MESSAGES_PART)
+        if message_dicts is None:
+            token = plan_cache.token()
+            cursor = collection.find({"plan_id": plan_id}).sort("timestamp", 1)
+            message_dicts = [message_dict async for message_dict in cursor]
+            plan_cache.put(plan_id, MESSAGES_PART, message_dicts, token)
+        
+        stored_ids = {message_dict["_id"] for message_dict in message_dicts}
+        message_dicts.extend(message_dict for message_dict in buffered if message_dict["_id"] not in stored_ids)
+        # Stable sort keeps arrival order for equal timestamps
+        message_dicts.sort(key=lambda message_dict: message_dict["timestamp"])
+        
+        return [
+            {key: value for key, value in message_dict.items() if key != "_id"}
+            for message_dict in message_dicts
+        ]
 
 
 class InvoiceExtractionRepository:
@@ -192,6 +457,26 @@ class InvoiceExtractionRepository:
         logger.info(f"📊 Stored invoice extraction for plan {plan_id}: {extraction_id}")
         return extraction_id
     
+    @staticmethod
+    async def count_by_vendor(vendor_name: str, approved_by: Optional[str] = None, limit: int = 0) -> int:
+        """
+        Count stored extractions for a vendor.
+        
+        Args:
+            vendor_name: Vendor name as extracted
+            approved_by: Only count extractions approved by this approver
+            limit: Stop counting after this many (0 = no limit)
+        """
+        db = MongoDB.get_database()
+        collection = db["invoice_extractions"]
+        
+        query = {"invoice_data.vendor_name": vendor_name}
+        if approved_by:
+            query["approved_by"] = approved_by
+        if limit:
+            return await collection.count_documents(query, limit=limit)
+        return await collection.count_documents(query)
+    
     @staticmethod
     async def get_extraction(plan_id: str) -> Optional[dict]:
         """
@@ -241,6 +526,46 @@ class InvoiceExtractionRepository:
         logger.info(f"📊 Retrieved {len(extractions)} invoice extractions")
         return extractions
     
+    @staticmethod
+    async def iter_extractions(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        vendor_name: Optional[str] = None,
+        approved_by: Optional[str] = None,
+        batch_size: int = 500
+    ) -> AsyncIterator[dict]:
+        """
+        Stream stored extractions in approval order, one cursor batch at a time.
+        
+        Args:
+            start: Approved at or after this time
+            end: Approved before this time
+            vendor_name: Vendor name as extracted
+            approved_by: Only extractions approved by this approver
+            batch_size: Documents fetched per round trip
+            
+        Yields:
+            Extraction dicts (without `_id`)
+        """
+        db = MongoDB.get_database()
+        collection = db["invoice_extractions"]
+        
+        query: Dict[str, Any] = {}
+        if start or end:
+            query["approved_at"] = {}
+            if start:
+                query["approved_at"]["$gte"] = start
+            if end:
+                query["approved_at"]["$lt"] = end
+        if vendor_name:
+            query["invoice_data.vendor_name"] = vendor_name
+        if approved_by:
+            query["approved_by"] = approved_by
+        
+        cursor = collection.find(query, {"_id": 0}).sort("approved_at", 1).batch_size(batch_size)
+        async for extraction in cursor:
+            yield extraction
+    
     @staticmethod
     def export_extraction_json(extraction: dict) -> dict:
         """
@@ -330,3 +655,304 @@ class InvoiceExtractionRepository:
                 ])
         
         return output.getvalue()
+
+
+class CheckpointRepository:
+    """Repository for durable agent execution checkpoints."""
+    
+    COLLECTION = "execution_checkpoints"
+    
+    @staticmethod
+    async def save(plan_id: str, checkpoint: dict) -> int:
+        """
+        Insert or replace the checkpoint for a plan.
+        
+        The version is incremented in the same update, so saves from
+        different workers never produce the same version.
+        
+        Returns:
+            The new version
+        """
+        db = MongoDB.get_database()
+        collection = db[CheckpointRepository.COLLECTION]
+        
+        document = await collection.find_one_and_update(
+            {"_id": plan_id},
+            {
+                "$set": {**checkpoint, "plan_id": plan_id, "updated_at": datetime.utcnow()},
+                "$inc": {"version": 1}
+            },
+            projection={"version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return document["version"]
+    
+    @staticmethod
+    async def get(plan_id: str) -> Optional[dict]:
+        """Get the checkpoint for a plan."""
+        db = MongoDB.get_database()
+        collection = db[CheckpointRepository.COLLECTION]
+        
+        return await collection.find_one({"_id": plan_id})
+    
+    @staticmethod
+    async def get_version(plan_id: str) -> Optional[int]:
+        """Get only the version of a plan's checkpoint (cheap cache validation)."""
+        db = MongoDB.get_database()
+        collection = db[CheckpointRepository.COLLECTION]
+        
+        document = await collection.find_one({"_id": plan_id}, {"version": 1})
+        return document["version"] if document else None
+    
+    @staticmethod
+    async def delete(plan_id: str) -> bool:
+        """Delete the checkpoint for a plan."""
+        db = MongoDB.get_database()
+        collection = db[CheckpointRepository.COLLECTION]
+        
+        result = await collection.delete_one({"_id": plan_id})
+        return result.deleted_count > 0
+    
+    @staticmethod
+    async def count() -> int:
+        """Count stored checkpoints."""
+        db = MongoDB.get_database()
+        collection = db[CheckpointRepository.COLLECTION]
+        
+        return await collection.count_documents({})
+
+
+class GraphCheckpointRepository:
+    """Repository for LangGraph checkpoints (latest checkpoint per thread)."""
+    
+    COLLECTION = "graph_checkpoints"
+    
+    @staticmethod
+    def _doc_id(thread_id: str, checkpoint_ns: str) -> str:
+        return f"{thread_id}:{checkpoint_ns}"
+    
+    @staticmethod
+    async def get(thread_id: str, checkpoint_ns: str) -> Optional[dict]:
+        """Get the latest checkpoint document for a thread."""
+        db = MongoDB.get_database()
+        collection = db[GraphCheckpointRepository.COLLECTION]
+        
+        return await collection.find_one({"_id": GraphCheckpointRepository._doc_id(thread_id, checkpoint_ns)})
+    
+    @staticmethod
+    async def put(
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_checkpoint_id: Optional[str],
+        checkpoint: dict,
+        metadata: dict,
+        blobs: dict,
+        removed_channels: List[str]
+    ) -> None:
+        """
+        Replace the thread's latest checkpoint.
+        
+        Only channels that changed are written; pending writes of the
+        previous checkpoint are discarded.
+        """
+        db = MongoDB.get_database()
+        collection = db[GraphCheckpointRepository.COLLECTION]
+        
+        update = {
+            "$set": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+                "parent_checkpoint_id": parent_checkpoint_id,
+                "checkpoint": checkpoint,
+                "metadata": metadata,
+                "writes": {},
+                "updated_at": datetime.utcnow(),
+                **{f"blobs.{channel}": blob for channel, blob in blobs.items()}
+            }
+        }
+        if removed_channels:
+            update["$unset"] = {f"blobs.{channel}": "" for channel in removed_channels}
+        
+        await collection.update_one(
+            {"_id": GraphCheckpointRepository._doc_id(thread_id, checkpoint_ns)},
+            update,
+            upsert=True
+        )
+    
+    @staticmethod
+    async def put_writes(thread_id: str, checkpoint_ns: str, checkpoint_id: str, writes: dict) -> None:
+        """Record pending writes against the thread's latest checkpoint."""
+        db = MongoDB.get_database()
+        collection = db[GraphCheckpointRepository.COLLECTION]
+        
+        await collection.update_one(
+            {"_id": GraphCheckpointRepository._doc_id(thread_id, checkpoint_ns), "checkpoint_id": checkpoint_id},
+            {"$set": {f"writes.{key}": write for key, write in writes.items()}}
+        )
+    
+    @staticmethod
+    async def delete_thread(thread_id: str) -> int:
+        """Delete every checkpoint namespace for a thread."""
+        db = MongoDB.get_database()
+        collection = db[GraphCheckpointRepository.COLLECTION]
+        
+        result = await collection.delete_many({"thread_id": thread_id})
+        return result.deleted_count
+
+
+class BatchRepository:
+    """Repository for batch submissions (groups of plans created together)."""
+    
+    COLLECTION = "batches"
+    
+    # Plan statuses that end a plan's workflow
+    TERMINAL_STATUSES = ("completed", "failed", "rejected", "cancelled")
+    
+    @staticmethod
+    async def create(batch_id: str, session_id: str, plan_ids: List[str]) -> str:
+        """Create a batch record."""
+        db = MongoDB.get_database()
+        collection = db[BatchRepository.COLLECTION]
+        
+        await collection.insert_one({
+            "_id": batch_id,
+            "batch_id": batch_id,
+            "session_id": session_id,
+            "plan_ids": plan_ids,
+            "total": len(plan_ids),
+            "created_at": datetime.utcnow()
+        })
+        logger.info(f"Created batch {batch_id} with {len(plan_ids)} plans")
+        return batch_id
+    
+    @staticmethod
+    async def get(batch_id: str) -> Optional[dict]:
+        """Get a batch record."""
+        db = MongoDB.get_database()
+        collection = db[BatchRepository.COLLECTION]
+        
+        return await collection.find_one({"_id": batch_id})
+    
+    @staticmethod
+    async def get_summary(batch_id: str) -> Optional[dict]:
+        """
+        Get aggregate progress for a batch.
+        
+        Returns:
+            BatchSummary fields, or None if the batch doesn't exist
+        """
+        batch = await BatchRepository.get(batch_id)
+        if not batch:
+            return None
+        
+        status_counts = await PlanRepository.count_by_status(batch_id)
+        finished = sum(status_counts.get(status, 0) for status in BatchRepository.TERMINAL_STATUSES)
+        created_at = batch["created_at"]
+        
+        return {
+            "batch_id": batch_id,
+            "session_id": batch["session_id"],
+            "status": "completed" if finished >= batch["total"] else "in_progress",
+            "total": batch["total"],
+            "finished": finished,
+            "status_counts": status_counts,
+            "created_at": created_at.isoformat() if isinstance(created_at, datetime) else str(created_at)
+        }
+
+
+class ApprovalAuditRepository:
+    """Repository for the approval audit trail (human and policy decisions)."""
+    
+    COLLECTION = "approval_audit"
+    
+    @staticmethod
+    async def record(entry: dict) -> str:
+        """Append an audit entry."""
+        db = MongoDB.get_database()
+        collection = db[ApprovalAuditRepository.COLLECTION]
+        
+        result = await collection.insert_one({**entry, "created_at": datetime.utcnow()})
+        return str(result.inserted_id)
+    
+    @staticmethod
+    async def get_by_plan_id(plan_id: str) -> List[dict]:
+        """Get a plan's audit entries, oldest first."""
+        db = MongoDB.get_database()
+        collection = db[ApprovalAuditRepository.COLLECTION]
+        
+        cursor = collection.find({"plan_id": plan_id}).sort("created_at", 1)
+        entries = []
+        async for entry in cursor:
+            entry["_id"] = str(entry["_id"])
+            entries.append(entry)
+        return entries
+
+
+class IdempotencyRepository:
+    """Repository for process_request idempotency keys (short-lived dedupe records)."""
+    
+    COLLECTION = "idempotency_keys"
+    
+    @staticmethod
+    async def claim(key: str, plan_id: str, session_id: str, window_seconds: int) -> Optional[dict]:
+        """
+        Claim a key for a new plan.
+        
+        The key is the document _id, so concurrent claims from any worker
+        are settled by the unique index.
+        
+        Returns:
+            None if the key was claimed, else the record (plan_id, session_id) holding it
+        """
+        db = MongoDB.get_database()
+        collection = db[IdempotencyRepository.COLLECTION]
+        
+        now = datetime.utcnow()
+        record = {"plan_id": plan_id, "session_id": session_id, "created_at": now}
+        try:
+            await collection.insert_one({"_id": key, **record})
+            return None
+        except DuplicateKeyError:
+            pass
+        
+        # The TTL monitor only runs once a minute; take over a key past its window
+        expired = await collection.find_one_and_update(
+            {"_id": key, "created_at": {"$lt": now - timedelta(seconds=window_seconds)}},
+            {"$set": record}
+        )
+        if expired:
+            return None
+        
+        existing = await collection.find_one({"_id": key})
+        if existing is None:
+            # Removed between the two calls; nothing holds it any more
+            await collection.replace_one({"_id": key}, record, upsert=True)
+        return existing
+    
+    @staticmethod
+    async def take_over(key: str, previous_plan_id: str, plan_id: str, session_id: str) -> bool:
+        """
+        Move a key from a finished plan to a new one, restarting its window.
+        
+        Returns:
+            False if another request moved the key first
+        """
+        db = MongoDB.get_database()
+        collection = db[IdempotencyRepository.COLLECTION]
+        
+        result = await collection.update_one(
+            {"_id": key, "plan_id": previous_plan_id},
+            {"$set": {"plan_id": plan_id, "session_id": session_id, "created_at": datetime.utcnow()}}
+        )
+        return result.modified_count == 1
+    
+    @staticmethod
+    async def release(key: str, plan_id: str) -> None:
+        """Release a key claimed for a plan that could not be started."""
+        db = MongoDB.get_database()
+        collection = db[IdempotencyRepository.COLLECTION]
+        
+        await collection.delete_one({"_id": key, "plan_id": plan_id})
@@ -7,15 +7,15 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.config.logging_config import configure_logging
 from app.db.mongodb import MongoDB
 from app.api.v3.routes import router as v3_router
 from app.api.v3.websocket import websocket_endpoint
+from app.api.v3.stream import stream_endpoint, batch_stream_endpoint
+from app.services.websocket_service import websocket_manager
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Configure logging (queue-based handler so log I/O stays off the event loop)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +29,38 @@ async def lifespan(app: FastAPI):
     MongoDB.connect()
     logger.info("✅ MongoDB connected")
     
+    # Open the pool's minimum connections before the first request needs them
+    try:
+        open_connections = await MongoDB.warm_up()
+        logger.info(f"✅ MongoDB pool warmed up ({open_connections} connections open)")
+    except Exception as e:
+        logger.warning(f"⚠️  MongoDB pool warmup failed: {e}")
+    
+    # Create the indexes declared in the registry (app/db/indexes.py), including
+    # the checkpoint TTL indexes, and report drift from it
+    from app.db.indexes import ensure_indexes
+    try:
+        result = await ensure_indexes()
+        logger.info(
+            f"✅ Indexes ready ({len(result['created'])} created, {len(result['migrated'])} migrated, "
+            f"{len(result['failed'])} failed)"
+        )
+    except Exception as e:
+        logger.warning(f"⚠️  Index creation failed: {e}")
+    
+    # Plan change events from other workers invalidate this worker's plan cache;
+    # their cancellations stop this worker's jobs for the plan
+    from app.db.plan_cache import PLAN_CANCELLED_EVENT, plan_event_channel
+    from app.services.agent_service import AgentService
+    plan_event_channel.on(PLAN_CANCELLED_EVENT, AgentService.stop_plan_jobs)
+    try:
+        await plan_event_channel.start()
+    except Exception as e:
+        logger.warning(f"⚠️  Plan event channel failed to start, cached plans expire by TTL only: {e}")
+    
+    # Start WebSocket heartbeat / dead connection reaper
+    websocket_manager.start_heartbeat()
+    
     # Initialize validation rules configuration
     logger.info("📋 Loading validation rules configuration...")
     from app.config.validation_rules import ValidationRulesConfig
@@ -73,16 +105,31 @@ async def lifespan(app: FastAPI):
     logger.info(f"LLM Provider: {os.getenv('LLM_PROVIDER', 'openai')}")
     logger.info(f"Mock LLM: {os.getenv('USE_MOCK_LLM', 'false')}")
     logger.info(f"Structured Extraction: {enable_extraction}")
+    logger.info(f"WebSocket permessage-deflate: {os.getenv('WS_PER_MESSAGE_DEFLATE', 'true')}")
+    logger.info(
+        f"WebSocket heartbeat: interval={websocket_manager.heartbeat_interval}s, "
+        f"timeout={websocket_manager.heartbeat_timeout}s"
+    )
     if enable_extraction:
         logger.info(f"Gemini Model: {os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')}")
         logger.info(f"Extraction Validation: {os.getenv('EXTRACTION_VALIDATION', 'true')}")
         logger.info(f"Requires Approval: {os.getenv('EXTRACTION_REQUIRES_APPROVAL', 'true')}")
+        logger.info(f"Approval Policy: {os.getenv('APPROVAL_POLICY_ENABLED', 'false')}")
     logger.info("="*60 + "\n")
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down MACAE backend...")
+    # Let queued and running agent jobs finish before closing connections
+    from app.services.job_queue import job_queue
+    await job_queue.drain()
+    # Then write out buffered agent messages
+    from app.db.message_buffer import message_buffer
+    await message_buffer.stop()
+    from app.db.plan_cache import plan_event_channel
+    await plan_event_channel.stop()
+    await websocket_manager.stop_heartbeat()
     MongoDB.close()
     logger.info("👋 Shutdown complete")
 
@@ -102,6 +149,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],  # GET /api/v3/plans pagination, conditional plan reads
 )
 
 
@@ -142,13 +190,23 @@ app.include_router(v3_router)
 # WebSocket route
 app.add_api_websocket_route("/api/v3/socket/{plan_id}", websocket_endpoint)
 
+# Server-Sent Events route (read-only alternative to the WebSocket)
+app.add_api_route("/api/v3/stream/{plan_id}", stream_endpoint, methods=["GET"], tags=["v3"])
+app.add_api_route("/api/v3/batch/{batch_id}/stream", batch_stream_endpoint, methods=["GET"], tags=["v3"])
+
 
 if __name__ == "__main__":
+    import os
     import uvicorn
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
         reload=True,
-        log_level="info"
+        log_level="info",
+        # Negotiate permessage-deflate with clients that offer it
+        ws_per_message_deflate=os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true",
+        # Protocol-level pings (answered by browsers automatically) use the same settings
+        ws_ping_interval=float(os.getenv("WS_HEARTBEAT_INTERVAL", "20")),
+        ws_ping_timeout=float(os.getenv("WS_HEARTBEAT_TIMEOUT", "60"))
     )
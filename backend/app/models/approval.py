@@ -1,6 +1,6 @@
 """Plan approval models."""
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class PlanApprovalRequest(BaseModel):
@@ -14,3 +14,35 @@ class PlanApprovalResponse(BaseModel):
     """Response from plan approval."""
     status: str
     message: Optional[str] = None
+
+
+class PendingApproval(BaseModel):
+    """A plan waiting on a human decision."""
+    plan_id: str
+    session_id: str
+    batch_id: Optional[str] = None
+    description: str
+    status: str
+    approval_type: str  # "plan", "extraction" or "clarification"
+    agents: List[str] = []
+    validation_severity: Optional[str] = None  # "error", "warning", "info" or "none"
+    validation_issue_count: int = 0
+    vendor_name: Optional[str] = None
+    invoice_number: Optional[str] = None
+    total_amount: Optional[str] = None
+    currency: Optional[str] = None
+    updated_at: str
+
+
+class BulkApprovalRequest(BaseModel):
+    """Approve or reject several pending plans at once."""
+    plan_ids: List[str]
+    approved: bool
+    feedback: Optional[str] = None  # Rejection reason; required to send clarifications back for revision
+
+
+class BulkApprovalResponse(BaseModel):
+    """Response from bulk approval."""
+    status: str
+    queued: List[str]
+    skipped: List[Dict[str, str]]  # {"plan_id": ..., "reason": ...}
@@ -0,0 +1,29 @@
+"""Batch submission models."""
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+
+class BatchRequestInput(BaseModel):
+    """Input for process_batch endpoint."""
+    descriptions: List[str]
+    session_id: Optional[str] = None
+    team_id: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """Response from process_batch endpoints."""
+    batch_id: str
+    status: str
+    session_id: str
+    plan_ids: List[str]
+
+
+class BatchSummary(BaseModel):
+    """Aggregate progress of a batch."""
+    batch_id: str
+    session_id: str
+    status: str  # "in_progress" until every plan reaches a terminal status, then "completed"
+    total: int
+    finished: int  # Plans that are completed, failed or rejected
+    status_counts: Dict[str, int]
+    created_at: str
@@ -30,6 +30,8 @@ class Plan(BaseModel):
     steps: List[Step] = []
     agent_progress: List[AgentProgress] = []  # Track progress of each agent
     extraction_data: Optional[dict] = None  # Store extraction result if available
+    batch_id: Optional[str] = None  # Set when the plan was submitted via process_batch
+    version: int = 0  # Incremented on every repository write
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -53,6 +55,8 @@ class PlanResponse(BaseModel):
     steps: List[Step]
     agent_progress: List[AgentProgress] = []  # Latest status from each agent
     extraction_data: Optional[dict] = None  # Extraction result if available
+    batch_id: Optional[str] = None
+    version: int = 0
     created_at: str
     updated_at: str
     timestamp: str
@@ -76,6 +80,8 @@ class PlanResponse(BaseModel):
             steps=plan.steps,
             agent_progress=plan.agent_progress,
             extraction_data=plan.extraction_data,
+            batch_id=plan.batch_id,
+            version=plan.version,
             created_at=created_at_str,
             updated_at=updated_at_str,
             timestamp=created_at_str,
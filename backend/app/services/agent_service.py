@@ -1,28 +1,54 @@
 """Agent orchestration service."""
 import logging
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import uuid
 import asyncio
 
-from app.agents.graph import agent_graph
+from app.agents.graph import agent_graph, PLAN_APPROVAL_NODE, EXTRACTION_REVIEW_NODE, HITL_NODE
 from app.agents.state import AgentState
-from app.agents.nodes import planner_node, invoice_agent_node, closing_agent_node, audit_agent_node, hitl_agent_node
-from app.db.repositories import PlanRepository, MessageRepository
+from app.config.validation_rules import ValidationRulesConfig
+from app.db.plan_cache import PLAN_CANCELLED_EVENT, plan_event_channel
+from app.db.repositories import PlanRepository, MessageRepository, ApprovalAuditRepository
 from app.models.message import AgentMessage
+from app.services.approval_policy import approval_policy_engine
+from app.services.checkpoint_store import checkpoint_store
+from app.services.deadlines import AGENT_STAGE, PLANNER_STAGE, run_with_deadline
+from app.services.job_queue import job_queue
 from app.services.websocket_service import websocket_manager
 
 logger = logging.getLogger(__name__)
 
 
+# Revision prompt budget: recent history entries kept verbatim, older ones
+# folded into one-line summaries, all within an approximate token budget
+HISTORY_RECENT_ENTRIES = int(os.getenv("HISTORY_RECENT_ENTRIES", "4"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+HISTORY_SUMMARY_CHARS = 100
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about 4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
 class ExecutionContext:
-    """Context manager for maintaining execution state across loops."""
+    """Context manager for maintaining execution state across loops.
+    
+    History is bounded so long HITL loops keep a constant prompt size: the
+    last HISTORY_RECENT_ENTRIES entries are kept verbatim, older entries
+    are folded into one-line summaries, and the prompt built from them is
+    trimmed to CONTEXT_TOKEN_BUDGET.
+    """
     
     def __init__(self, original_task: str, plan_id: str):
         self.original_task = original_task
         self.plan_id = plan_id
         self.execution_history: List[Dict[str, Any]] = []
+        self.history_summary: List[str] = []  # One line per folded entry, oldest first
+        self.omitted_entries = 0  # Folded entries dropped from the summary to fit the budget
+        self.prompt_tokens: Dict[int, int] = {}  # Iteration -> revision prompt tokens
         self.iteration_count = 0
         self.current_specialized_agent = None  # Track which agent is processing
     
@@ -40,23 +66,306 @@ class ExecutionContext:
         if user_feedback:
             entry["user_feedback"] = user_feedback
         self.execution_history.append(entry)
+        self._compact()
+    
+    @staticmethod
+    def _summarize_entry(entry: Dict[str, Any]) -> str:
+        """One-line summary of a history entry."""
+        result = " ".join(str(entry["result"]).split())
+        if len(result) > HISTORY_SUMMARY_CHARS:
+            result = result[:HISTORY_SUMMARY_CHARS] + "..."
+        line = f"- Iteration {entry['iteration']}, {entry['agent']}: {result}"
+        if entry.get("user_feedback"):
+            feedback = " ".join(entry["user_feedback"].split())[:HISTORY_SUMMARY_CHARS]
+            line += f" (feedback: {feedback})"
+        return line
+    
+    def _compact(self) -> None:
+        """Fold entries beyond the recent window into the summary and keep the summary within half the budget."""
+        while len(self.execution_history) > HISTORY_RECENT_ENTRIES:
+            self.history_summary.append(self._summarize_entry(self.execution_history.pop(0)))
+        
+        summary_budget = CONTEXT_TOKEN_BUDGET // 2
+        while self.history_summary and estimate_tokens("\n".join(self.history_summary)) > summary_budget:
+            self.history_summary.pop(0)
+            self.omitted_entries += 1
     
     def get_context_for_planner(self) -> str:
-        """Get formatted context for planner when looping back."""
-        context = f"Original task: {self.original_task}\n\n"
-        context += "Execution history:\n"
-        for entry in self.execution_history:
-            context += f"- Iteration {entry['iteration']}, {entry['agent']}: {entry['result'][:100]}...\n"
+        """Get formatted context for planner when looping back, within the token budget."""
+        header = f"Original task: {self.original_task}\n\nExecution history:\n"
+        summary = ""
+        if self.omitted_entries:
+            summary += f"- ({self.omitted_entries} earlier history entries omitted)\n"
+        summary += "".join(line + "\n" for line in self.history_summary)
+        
+        # Newest entries first get what's left of the budget; older ones are
+        # shortened to their summary line when they don't fit verbatim
+        remaining = CONTEXT_TOKEN_BUDGET - estimate_tokens(header + summary)
+        recent = []
+        for entry in reversed(self.execution_history):
+            line = f"- Iteration {entry['iteration']}, {entry['agent']}: {entry['result']}"
+            if entry.get("user_feedback"):
+                line += f"\n  User feedback: {entry['user_feedback']}"
+            if estimate_tokens(line) > remaining:
+                line = self._summarize_entry(entry)
+            remaining -= estimate_tokens(line)
+            recent.append(line + "\n")
+        
+        return header + summary + "".join(reversed(recent))
+    
+    def build_revision_state(self, feedback: str) -> Dict[str, str]:
+        """
+        Build the graph state update for a revision run.
+        
+        The task stays the original task plus the requested revision, so the
+        agents' keyword and invoice detection only see what the user asked
+        for; the bounded history goes in execution_context.
+        """
+        task = f"{self.original_task}\n\nRevision requested: {feedback}"
+        execution_context = self.get_context_for_planner()
+        tokens = estimate_tokens(task) + estimate_tokens(execution_context)
+        self.prompt_tokens[self.iteration_count] = tokens
+        logger.info(
+            f"📏 Revision prompt for plan {self.plan_id}, iteration {self.iteration_count}: ~{tokens} tokens "
+            f"({len(self.execution_history)} recent, {len(self.history_summary)} summarized, "
+            f"{self.omitted_entries} omitted)"
+        )
+        return {"task_description": task, "execution_context": execution_context}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for the checkpoint store."""
+        return {
+            "original_task": self.original_task,
+            "plan_id": self.plan_id,
+            "execution_history": self.execution_history,
+            "history_summary": self.history_summary,
+            "omitted_entries": self.omitted_entries,
+            # Mongo document keys must be strings
+            "prompt_tokens": {str(iteration): tokens for iteration, tokens in self.prompt_tokens.items()},
+            "iteration_count": self.iteration_count,
+            "current_specialized_agent": self.current_specialized_agent
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExecutionContext":
+        """Rebuild a context loaded from the checkpoint store."""
+        context = cls(data["original_task"], data["plan_id"])
+        context.execution_history = data.get("execution_history", [])
+        context.history_summary = data.get("history_summary", [])
+        context.omitted_entries = data.get("omitted_entries", 0)
+        context.prompt_tokens = {int(iteration): tokens for iteration, tokens in data.get("prompt_tokens", {}).items()}
+        context.iteration_count = data.get("iteration_count", 0)
+        context.current_specialized_agent = data.get("current_specialized_agent")
+        # Contexts saved before history was bounded
+        context._compact()
         return context
 
 
 class AgentService:
     """Service for agent orchestration and execution."""
     
-    # Store execution state for resuming
-    _pending_executions: Dict[str, Dict[str, Any]] = {}
-    # Store execution contexts for loop handling
-    _execution_contexts: Dict[str, ExecutionContext] = {}
+    # The workflow runs as a LangGraph thread (thread_id = plan_id) that
+    # pauses before each human gate; the graph checkpointer holds agent state.
+    # Execution metadata and contexts live in the checkpoint store. Both are
+    # durable, so any worker can resume a plan and restarts don't lose it.
+    
+    @staticmethod
+    def _graph_config(plan_id: str) -> Dict[str, Any]:
+        """Graph run config; the WebSocket manager is passed here, not in checkpointed state."""
+        return {"configurable": {"thread_id": plan_id, "websocket_manager": websocket_manager}}
+    
+    @staticmethod
+    async def _get_paused_gate(plan_id: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Get the human gate the plan's graph is paused before (None if not paused) and its state."""
+        snapshot = await agent_graph.aget_state(AgentService._graph_config(plan_id))
+        paused_at = snapshot.next[0] if snapshot.next else None
+        return paused_at, snapshot.values or {}
+    
+    @staticmethod
+    async def _resume_graph(plan_id: str, decision: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str], List[str]]:
+        """
+        Apply a human decision to the paused graph and resume it.
+        
+        Runs until the next human gate or the end; nodes that already
+        completed are not re-run.
+        
+        Returns:
+            (state, gate paused at or None when finished, messages added by this run)
+        """
+        config = AgentService._graph_config(plan_id)
+        _, values = await AgentService._get_paused_gate(plan_id)
+        previous_count = len(values.get("messages", []))
+        
+        await agent_graph.aupdate_state(config, decision)
+        state = await run_with_deadline(AGENT_STAGE, agent_graph.ainvoke(None, config))
+        
+        paused_at, _ = await AgentService._get_paused_gate(plan_id)
+        return state, paused_at, list(state.get("messages", []))[previous_count:]
+    
+    @staticmethod
+    async def _load_checkpoint(plan_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[ExecutionContext]]:
+        """Load the pending execution state and execution context for a plan."""
+        checkpoint = await checkpoint_store.load(plan_id)
+        if not checkpoint:
+            return None, None
+        context_data = checkpoint.get("context")
+        context = ExecutionContext.from_dict(context_data) if context_data else None
+        return checkpoint.get("execution") or None, context
+    
+    @staticmethod
+    async def _save_checkpoint(plan_id: str, execution_state: Dict[str, Any], context: Optional[ExecutionContext]) -> None:
+        """Persist the pending execution state and execution context for a plan."""
+        await checkpoint_store.save(plan_id, execution_state, context.to_dict() if context else None)
+    
+    @staticmethod
+    async def _clear_checkpoint(plan_id: str) -> None:
+        """Drop a plan's checkpoint and graph thread once it reaches a terminal state."""
+        try:
+            await checkpoint_store.delete(plan_id)
+            await agent_graph.checkpointer.adelete_thread(plan_id)
+        except Exception as e:
+            logger.warning(f"Failed to delete checkpoint for plan {plan_id}: {e}")
+    
+    @staticmethod
+    def _planned_agents(execution_state: Optional[Dict[str, Any]]) -> List[str]:
+        """Agents the planner routed to (several when they run in parallel)."""
+        if not execution_state:
+            return []
+        if execution_state.get("next_agents"):
+            return list(execution_state["next_agents"])
+        return [execution_state["next_agent"]] if execution_state.get("next_agent") else []
+    
+    @staticmethod
+    def _agents_progress(agents: List[str], status: str) -> Dict[str, str]:
+        """Progress entries for each agent working on the plan, for PlanRepository.transition."""
+        return {f"{agent.capitalize()} Agent": status for agent in agents}
+    
+    @staticmethod
+    def _extraction_data(extraction_result: Any) -> Dict[str, Any]:
+        """Extraction data stored on the plan for history display and approval filtering."""
+        # Convert to JSON-serializable format
+        invoice_dict = None
+        if extraction_result.invoice_data:
+            invoice_dict = extraction_result.invoice_data.model_dump()
+            # Convert dates and decimals to strings for MongoDB
+            for key, value in invoice_dict.items():
+                if hasattr(value, 'isoformat'):  # date/datetime
+                    invoice_dict[key] = value.isoformat()
+                elif hasattr(value, '__str__') and key != 'line_items':  # Decimal
+                    invoice_dict[key] = str(value)
+            
+            # Handle line items
+            if invoice_dict.get('line_items'):
+                for item in invoice_dict['line_items']:
+                    for k, v in item.items():
+                        if hasattr(v, 'isoformat'):
+                            item[k] = v.isoformat()
+                        elif hasattr(v, '__str__') and k != 'description':
+                            item[k] = str(v)
+        
+        return {
+            "success": extraction_result.success,
+            "invoice_data": invoice_dict,
+            "validation_errors": extraction_result.validation_errors,
+            # Highest rule severity ("none" when clean), for filtering pending approvals
+            "validation_severity": ValidationRulesConfig.get_highest_severity(extraction_result.validation_errors) or "none",
+            "extraction_time": extraction_result.extraction_time,
+            "model_used": extraction_result.model_used
+        }
+    
+    @staticmethod
+    async def _request_extraction_review(plan_id: str, extraction_result: Any, agents: List[str]) -> None:
+        """Store extraction data on the plan and ask the user to review it."""
+        # Extraction data, agents waiting for extraction approval and the
+        # pending status in one write, before the user is asked
+        await PlanRepository.transition(
+            plan_id,
+            status="pending_extraction_approval",
+            agent_progress=AgentService._agents_progress(agents, "waiting for input"),
+            extraction_data=AgentService._extraction_data(extraction_result)
+        )
+        
+        await AgentService.send_extraction_approval_request(plan_id, extraction_result)
+    
+    @staticmethod
+    async def _record_approval(
+        plan_id: str,
+        outcome: str,
+        decided_by: str,
+        reason: Optional[str],
+        extraction_result: Any = None,
+        checks: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Append an extraction decision to the approval audit trail.
+        
+        Args:
+            outcome: "approved", "rejected" or "manual_review" (policy declined)
+            decided_by: "user" or "policy"
+        """
+        invoice = extraction_result.invoice_data if extraction_result is not None else None
+        entry = {
+            "plan_id": plan_id,
+            "gate": "extraction",
+            "outcome": outcome,
+            "decided_by": decided_by,
+            "reason": reason,
+            "checks": checks or [],
+            "policy": approval_policy_engine.describe() if decided_by == "policy" else None,
+            "vendor_name": invoice.vendor_name if invoice else None,
+            "invoice_number": invoice.invoice_number if invoice else None,
+            "total_amount": str(invoice.total_amount) if invoice else None,
+            "currency": invoice.currency if invoice else None,
+            "validation_errors": extraction_result.validation_errors if extraction_result is not None else []
+        }
+        try:
+            await ApprovalAuditRepository.record(entry)
+        except Exception as e:
+            logger.error(f"Failed to record approval audit for plan {plan_id}: {e}")
+    
+    @staticmethod
+    async def _review_extraction(
+        plan_id: str,
+        extraction_result: Any,
+        agents: List[str],
+        execution_state: Dict[str, Any],
+        context: Optional[ExecutionContext]
+    ) -> Dict[str, Any]:
+        """
+        Auto-approve the extraction when the approval policy allows it,
+        otherwise ask the user to review it.
+        """
+        decision = await approval_policy_engine.evaluate(extraction_result)
+        checks = [check.model_dump() for check in decision.checks] if decision else None
+        
+        if decision and decision.auto_approve:
+            logger.info(f"🤖 Extraction auto-approved by policy [plan={plan_id}]")
+            await PlanRepository.transition(plan_id, extraction_data=AgentService._extraction_data(extraction_result))
+            await websocket_manager.send_message(plan_id, {
+                "type": "agent_message",
+                "data": {
+                    "agent_name": "System",
+                    "content": f"🤖 {decision.summary}",
+                    "status": "in_progress",
+                    "timestamp": datetime.utcnow().isoformat() + "Z"
+                }
+            })
+            result = await AgentService.handle_extraction_approval(
+                plan_id, True, decision.summary, approved_by="policy", policy_checks=checks
+            )
+            return {**result, "auto_approved": True}
+        
+        if decision:
+            await AgentService._record_approval(
+                plan_id, "manual_review", "policy", decision.summary, extraction_result, checks
+            )
+        
+        await AgentService._request_extraction_review(plan_id, extraction_result, agents)
+        
+        # Store state for resuming after approval
+        execution_state["awaiting_extraction_approval"] = True
+        await AgentService._save_checkpoint(plan_id, execution_state, context)
+        return {"status": "pending_extraction_approval"}
     
     @staticmethod
     async def execute_task(plan_id: str, session_id: str, task_description: str, require_hitl: bool = True) -> Dict[str, Any]:
@@ -80,7 +389,6 @@ class AgentService:
         
         # Create execution context
         context = ExecutionContext(task_description, plan_id)
-        AgentService._execution_contexts[plan_id] = context
         context.iteration_count = 1
         
         # Initialize state
@@ -92,19 +400,19 @@ class AgentService:
             "current_agent": "",
             "next_agent": None,
             "final_result": "",
-            "approval_required": False,
+            "approval_required": True,
             "approved": None,
-            "websocket_manager": websocket_manager,
             "llm_provider": None,
-            "llm_temperature": None
+            "llm_temperature": None,
+            "require_hitl": require_hitl
         }
         
         try:
-            # Execute planner node
-            planner_result = planner_node(initial_state)
-            
-            # Track planner progress
-            await PlanRepository.update_agent_progress(plan_id, "Planner", "planning completed")
+            # Run the graph: planner, then pause before plan approval
+            planner_result = await run_with_deadline(
+                PLANNER_STAGE,
+                agent_graph.ainvoke(initial_state, AgentService._graph_config(plan_id))
+            )
             
             # Don't send planner message separately - it will be included in the approval request
             # This prevents duplicate messages in the UI
@@ -119,14 +427,15 @@ class AgentService:
             
             # Store execution state for resuming
             logger.info(f"🔍 DEBUG: Storing execution state with require_hitl={require_hitl} for plan {plan_id}")
-            AgentService._pending_executions[plan_id] = {
+            execution_state = {
                 "session_id": session_id,
                 "task_description": task_description,
                 "next_agent": planner_result.get("next_agent"),
-                "state": {**initial_state, **planner_result},
+                "next_agents": planner_result.get("next_agents"),
                 "require_hitl": require_hitl
             }
-            logger.info(f"🔍 DEBUG: Execution state stored: {list(AgentService._pending_executions[plan_id].keys())}")
+            await AgentService._save_checkpoint(plan_id, execution_state, context)
+            logger.info(f"🔍 DEBUG: Execution state stored: {list(execution_state.keys())}")
             
             # Build plan data for approval request
             plan_steps = []
@@ -139,6 +448,8 @@ class AgentService:
                         "status": "pending"
                     })
             
+            routed_agents = planner_result.get("next_agents") or [planner_result.get("next_agent") or "invoice"]
+            
             # Create brief task summary for display (first 100 chars or first line)
             task_summary = task_description.split('\n')[0][:100]
             if len(task_description) > 100:
@@ -154,7 +465,7 @@ class AgentService:
                     "user_request": task_summary,  # Use brief summary instead of full text
                     "status": "pending_approval",
                     "steps": plan_steps,
-                    "facts": f"Routing to: {planner_result.get('next_agent', 'Invoice').capitalize()} Agent",  # Simplified facts
+                    "facts": "Routing to: " + ", ".join(f"{agent.capitalize()} Agent" for agent in routed_agents),  # Simplified facts
                     "context": {
                         "participant_descriptions": {
                             planner_result.get("current_agent", "Planner"): "Analyzing task and creating execution plan"
@@ -164,11 +475,13 @@ class AgentService:
                 }
             }
             logger.info(f"🔔 SENDING APPROVAL REQUEST for plan {plan_id}")
-            await websocket_manager.send_message(plan_id, approval_msg)
+            await websocket_manager.send_message_with_ack(plan_id, approval_msg)
             logger.info(f"🔔 APPROVAL REQUEST SENT for plan {plan_id}")
             
-            # Update plan status
-            await PlanRepository.update_status(plan_id, "pending_approval")
+            # Update plan status and track planner progress
+            await PlanRepository.transition(
+                plan_id, status="pending_approval", agent_progress={"Planner": "planning completed"}
+            )
             
             logger.info(f"Approval requested for plan {plan_id}")
             return {
@@ -201,8 +514,9 @@ class AgentService:
         logger.info(f"Resuming plan {plan_id} with approval={approved}")
         
         # Get stored execution state
-        execution_state = AgentService._pending_executions.get(plan_id)
-        if not execution_state:
+        execution_state, context = await AgentService._load_checkpoint(plan_id)
+        paused_at, _ = await AgentService._get_paused_gate(plan_id)
+        if not execution_state or paused_at != PLAN_APPROVAL_NODE:
             logger.error(f"No execution state found for plan {plan_id}")
             return {"status": "error", "message": "Cannot resume - no state found"}
         
@@ -210,7 +524,7 @@ class AgentService:
             if not approved:
                 # Plan rejected
                 await PlanRepository.update_status(plan_id, "rejected")
-                await websocket_manager.send_message(plan_id, {
+                await websocket_manager.send_message_with_ack(plan_id, {
                     "type": "final_result_message",
                     "data": {
                         "content": f"Plan rejected. {feedback or ''}",
@@ -220,93 +534,37 @@ class AgentService:
                 })
                 
                 # Clean up
-                AgentService._pending_executions.pop(plan_id, None)
-                AgentService._execution_contexts.pop(plan_id, None)
+                await AgentService._clear_checkpoint(plan_id)
                 return {"status": "rejected"}
             
             # Plan approved - execute specialized agent
-            await PlanRepository.update_status(plan_id, "in_progress")
-            
             next_agent = execution_state.get("next_agent")
-            state = execution_state.get("state")
-            require_hitl = execution_state.get("require_hitl", True)
-            
-            # Track agent progress - agent is now processing
-            agent_display_name = next_agent.capitalize() if next_agent else "Unknown"
-            await PlanRepository.update_agent_progress(plan_id, f"{agent_display_name} Agent", "processing")
-            
-            # Execute the appropriate specialized agent
-            if next_agent == "invoice":
-                result = await invoice_agent_node(state)
-            elif next_agent == "closing":
-                result = closing_agent_node(state)
-            elif next_agent == "audit":
-                result = audit_agent_node(state)
-            elif next_agent == "salesforce":
-                from app.agents.salesforce_node import salesforce_agent_node
-                result = await salesforce_agent_node(state)
-            elif next_agent == "zoho":
-                from app.agents.zoho_agent_node import zoho_agent_node
-                result = await zoho_agent_node(state)
-            else:
-                result = {"messages": ["No specialized agent selected"], "final_result": "Task completed"}
+            agents = AgentService._planned_agents(execution_state) or ["unknown"]
+            
+            # Track agent progress - agents are now processing (in parallel when several)
+            await PlanRepository.transition(
+                plan_id, status="in_progress", agent_progress=AgentService._agents_progress(agents, "processing")
+            )
+            
+            # Resume the graph: the supervisor routes to the specialized agent,
+            # which then pauses before extraction review or HITL (or finishes)
+            result, paused_at, messages = await AgentService._resume_graph(plan_id, {"approved": True})
             
             # Check if extraction approval is required
-            if result.get("requires_extraction_approval"):
+            if paused_at == EXTRACTION_REVIEW_NODE:
                 logger.info(f"📊 ===== EXTRACTION APPROVAL REQUIRED ===== [plan={plan_id}]")
                 logger.info(f"📊 This will SKIP regular HITL approval [plan={plan_id}]")
                 
-                # Send extraction approval request
-                extraction_result = result.get("extraction_result")
-                if extraction_result:
-                    # Store extraction data in plan for history display
-                    # Convert to JSON-serializable format
-                    invoice_dict = None
-                    if extraction_result.invoice_data:
-                        invoice_dict = extraction_result.invoice_data.model_dump()
-                        # Convert dates and decimals to strings for MongoDB
-                        for key, value in invoice_dict.items():
-                            if hasattr(value, 'isoformat'):  # date/datetime
-                                invoice_dict[key] = value.isoformat()
-                            elif hasattr(value, '__str__') and key != 'line_items':  # Decimal
-                                invoice_dict[key] = str(value)
-                        
-                        # Handle line items
-                        if invoice_dict.get('line_items'):
-                            for item in invoice_dict['line_items']:
-                                for k, v in item.items():
-                                    if hasattr(v, 'isoformat'):
-                                        item[k] = v.isoformat()
-                                    elif hasattr(v, '__str__') and k != 'description':
-                                        item[k] = str(v)
-                    
-                    extraction_dict = {
-                        "success": extraction_result.success,
-                        "invoice_data": invoice_dict,
-                        "validation_errors": extraction_result.validation_errors,
-                        "extraction_time": extraction_result.extraction_time,
-                        "model_used": extraction_result.model_used
-                    }
-                    await PlanRepository.update_extraction_data(plan_id, extraction_dict)
-                    
-                    # Track agent progress - waiting for extraction approval
-                    await PlanRepository.update_agent_progress(plan_id, f"{agent_display_name} Agent", "waiting for input")
-                    
-                    await AgentService.send_extraction_approval_request(plan_id, extraction_result)
-                    
-                    # Update plan status to pending extraction approval
-                    await PlanRepository.update_status(plan_id, "pending_extraction_approval")
-                    
-                    # Store state for resuming after approval
-                    execution_state["state"] = {**state, **result}
-                    execution_state["awaiting_extraction_approval"] = True
-                    
-                    logger.info(f"📊 Extraction approval requested, returning early [plan={plan_id}]")
-                    return {"status": "pending_extraction_approval"}
+                # Auto-approve by policy, or send extraction approval request
+                review = await AgentService._review_extraction(
+                    plan_id, result.get("extraction_result"), agents, execution_state, context
+                )
+                
+                logger.info(f"📊 Extraction review handled ({review['status']}), returning early [plan={plan_id}]")
+                return review
             
             # Stream specialized agent messages via WebSocket
             agent_name = result.get("current_agent", next_agent.capitalize() if next_agent else "Unknown")
-            messages = result.get("messages", [])
             
             for message_text in messages:
                 await websocket_manager.send_message(plan_id, {
@@ -320,7 +578,6 @@ class AgentService:
                 })
             
             # Add specialized agent to history and track it
-            context = AgentService._execution_contexts.get(plan_id)
             if context:
                 context.add_history_entry(
                     context.iteration_count,
@@ -330,20 +587,19 @@ class AgentService:
                 # Store the current specialized agent for direct routing on revisions
                 context.current_specialized_agent = next_agent
             
-            # Check if HITL is required
+            # Check if HITL is required (the graph pauses before HITL when it is)
             logger.info(f"🔍 ===== CHECKING HITL REQUIREMENT ===== [plan={plan_id}]")
-            logger.info(f"🔍 require_hitl={require_hitl} [plan={plan_id}]")
-            logger.info(f"🔍 execution_state keys: {list(execution_state.keys())}")
+            logger.info(f"🔍 paused_at={paused_at} [plan={plan_id}]")
             
-            if not require_hitl:
+            if paused_at != HITL_NODE:
                 # Skip HITL and complete task
                 logger.info(f"🔍 HITL is disabled, completing task [plan={plan_id}]")
                 
                 # Track agent progress - completed
-                await PlanRepository.update_agent_progress(plan_id, f"{agent_display_name} Agent", "completed")
-                
-                await PlanRepository.update_status(plan_id, "completed")
-                await websocket_manager.send_message(plan_id, {
+                await PlanRepository.transition(
+                    plan_id, status="completed", agent_progress=AgentService._agents_progress(agents, "completed")
+                )
+                await websocket_manager.send_message_with_ack(plan_id, {
                     "type": "final_result_message",
                     "data": {
                         "content": result.get("final_result", "Task completed"),
@@ -353,20 +609,13 @@ class AgentService:
                 })
                 
                 # Clean up
-                AgentService._pending_executions.pop(plan_id, None)
-                AgentService._execution_contexts.pop(plan_id, None)
+                await AgentService._clear_checkpoint(plan_id)
                 logger.info(f"Plan {plan_id} completed (HITL skipped)")
                 return {"status": "completed"}
             
             # Route to HITL agent
             logger.info(f"🔍 ===== ROUTING TO HITL AGENT ===== [plan={plan_id}]")
             
-            # Track agent progress - waiting for user input
-            await PlanRepository.update_agent_progress(plan_id, f"{agent_display_name} Agent", "waiting for input")
-            
-            hitl_state = {**state, **result}
-            hitl_result = hitl_agent_node(hitl_state)
-            
             # Send HITL clarification request
             request_id = str(uuid.uuid4())
             agent_result = result.get("final_result", "")
@@ -383,14 +632,19 @@ class AgentService:
             
             logger.info(f"🔔 ===== SENDING HITL CLARIFICATION REQUEST ===== [plan={plan_id}]")
             logger.info(f"🔔 Message type: user_clarification_request [plan={plan_id}]")
-            await websocket_manager.send_message(plan_id, clarification_msg)
+            await websocket_manager.send_message_with_ack(plan_id, clarification_msg)
             logger.info(f"🔔 ===== HITL CLARIFICATION REQUEST SENT ===== [plan={plan_id}]")
             
-            # Update plan status to pending clarification
-            await PlanRepository.update_status(plan_id, "pending_clarification")
+            # Update plan status to pending clarification, agents waiting for user input
+            await PlanRepository.transition(
+                plan_id,
+                status="pending_clarification",
+                agent_progress=AgentService._agents_progress(agents, "waiting for input")
+            )
             
             # Store clarification request ID for tracking
             execution_state["clarification_request_id"] = request_id
+            await AgentService._save_checkpoint(plan_id, execution_state, context)
             
             logger.info(f"Clarification requested for plan {plan_id}")
             return {"status": "pending_clarification"}
@@ -398,8 +652,7 @@ class AgentService:
         except Exception as e:
             logger.error(f"Resume execution failed for plan {plan_id}: {e}")
             await PlanRepository.update_status(plan_id, "failed")
-            AgentService._pending_executions.pop(plan_id, None)
-            AgentService._execution_contexts.pop(plan_id, None)
+            await AgentService._clear_checkpoint(plan_id)
             raise
     
     @staticmethod
@@ -422,7 +675,8 @@ class AgentService:
         logger.info(f"Processing clarification for plan {plan_id}: {answer[:50]}...")
         
         # Get execution context
-        context = AgentService._execution_contexts.get(plan_id)
+        execution_state, context = await AgentService._load_checkpoint(plan_id)
+        paused_at, _ = await AgentService._get_paused_gate(plan_id)
         if not context:
             logger.error(f"No execution context found for plan {plan_id}")
             return {"status": "error", "message": "Cannot process clarification - no context found"}
@@ -435,13 +689,18 @@ class AgentService:
                 # User approved - complete task
                 logger.info(f"User approved plan {plan_id}")
                 
-                # Track agent progress - completed
-                if context.current_specialized_agent:
-                    agent_display_name = context.current_specialized_agent.capitalize()
-                    await PlanRepository.update_agent_progress(plan_id, f"{agent_display_name} Agent", "completed")
+                # Let the graph finish past the HITL gate
+                if paused_at == HITL_NODE:
+                    await AgentService._resume_graph(plan_id, {"hitl_approved": True})
                 
-                await PlanRepository.update_status(plan_id, "completed")
-                await websocket_manager.send_message(plan_id, {
+                # Track agent progress - completed
+                agents = AgentService._planned_agents(execution_state)
+                if not agents and context.current_specialized_agent:
+                    agents = [context.current_specialized_agent]
+                await PlanRepository.transition(
+                    plan_id, status="completed", agent_progress=AgentService._agents_progress(agents, "completed")
+                )
+                await websocket_manager.send_message_with_ack(plan_id, {
                     "type": "final_result_message",
                     "data": {
                         "content": "Task approved and completed successfully.",
@@ -451,8 +710,7 @@ class AgentService:
                 })
                 
                 # Clean up
-                AgentService._pending_executions.pop(plan_id, None)
-                AgentService._execution_contexts.pop(plan_id, None)
+                await AgentService._clear_checkpoint(plan_id)
                 
                 return {"status": "completed"}
             
@@ -471,9 +729,8 @@ class AgentService:
                 # Increment iteration count
                 context.iteration_count += 1
                 
-                # Get execution state
-                execution_state = AgentService._pending_executions.get(plan_id)
-                if not execution_state:
+                # Check execution state
+                if not execution_state or paused_at != HITL_NODE:
                     logger.error(f"No execution state found for plan {plan_id}")
                     return {"status": "error", "message": "Cannot resume - no state found"}
                 
@@ -491,10 +748,6 @@ class AgentService:
                     }
                 })
                 
-                # Route directly to the specialized agent with the revision
-                state = execution_state.get("state", {})
-                state["task_description"] = answer  # Use the revision as the new task
-                
                 # Get the current specialized agent
                 current_agent = context.current_specialized_agent
                 logger.info(f"🔍 DEBUG: current_specialized_agent = {current_agent}")
@@ -511,22 +764,32 @@ class AgentService:
                             "timestamp": datetime.utcnow().isoformat() + "Z"  # Ensure UTC timezone marker
                         }
                     })
+                    await AgentService._save_checkpoint(plan_id, execution_state, context)
                     return {"status": "error", "message": "No specialized agent found"}
                 
-                # Execute the specialized agent with the revision
-                if current_agent == "invoice":
-                    result = await invoice_agent_node(state)
-                elif current_agent == "closing":
-                    result = closing_agent_node(state)
-                elif current_agent == "audit":
-                    result = audit_agent_node(state)
-                else:
-                    logger.error(f"❌ ERROR: Unknown agent type: {current_agent}")
-                    result = {"messages": [f"Unknown agent type: {current_agent}"], "final_result": "Task failed"}
+                # Resume the graph past HITL: the original task plus the revision
+                # becomes the new task (with the bounded history alongside it) and
+                # routes straight back to the specialized agent, skipping Planner
+                result, paused_at, messages = await AgentService._resume_graph(
+                    plan_id,
+                    {"hitl_approved": False, **context.build_revision_state(answer)}
+                )
+                
+                # Invoice revisions may produce a new extraction to review
+                if paused_at == EXTRACTION_REVIEW_NODE:
+                    review = await AgentService._review_extraction(
+                        plan_id, result.get("extraction_result"),
+                        AgentService._planned_agents(execution_state) or [current_agent],
+                        execution_state, context
+                    )
+                    return {
+                        **review,
+                        "iteration": context.iteration_count,
+                        "prompt_tokens": context.prompt_tokens[context.iteration_count]
+                    }
                 
                 # Stream specialized agent messages via WebSocket
                 agent_name = result.get("current_agent", current_agent.capitalize() if current_agent else "Unknown")
-                messages = result.get("messages", [])
                 
                 for message_text in messages:
                     await websocket_manager.send_message(plan_id, {
@@ -546,9 +809,6 @@ class AgentService:
                     result.get("final_result", "Task completed")
                 )
                 
-                # Update execution state
-                execution_state["state"] = {**state, **result}
-                
                 # Route back to HITL agent
                 request_id = str(uuid.uuid4())
                 agent_result = result.get("final_result", "")
@@ -566,10 +826,7 @@ class AgentService:
                 logger.info(f"🔔 SENDING CLARIFICATION REQUEST for plan {plan_id}")
                 logger.info(f"🔔 Agent result length: {len(agent_result)} chars")
                 
-                # Small delay to ensure all messages are sent before clarification request
-                await asyncio.sleep(0.1)
-                
-                await websocket_manager.send_message(plan_id, clarification_msg)
+                await websocket_manager.send_message_with_ack(plan_id, clarification_msg)
                 logger.info(f"🔔 CLARIFICATION REQUEST SENT for plan {plan_id}")
                 
                 # Update plan status to pending clarification
@@ -577,8 +834,13 @@ class AgentService:
                 
                 # Store clarification request ID for tracking
                 execution_state["clarification_request_id"] = request_id
+                await AgentService._save_checkpoint(plan_id, execution_state, context)
                 
-                return {"status": "pending_clarification", "iteration": context.iteration_count}
+                return {
+                    "status": "pending_clarification",
+                    "iteration": context.iteration_count,
+                    "prompt_tokens": context.prompt_tokens[context.iteration_count]
+                }
                 
         except Exception as e:
             logger.error(f"Clarification handling failed for plan {plan_id}: {e}")
@@ -642,7 +904,7 @@ class AgentService:
             
             logger.info(f"📊 ===== SENDING EXTRACTION APPROVAL REQUEST ===== [plan={plan_id}]")
             logger.info(f"📊 Message type: extraction_approval_request [plan={plan_id}]")
-            await websocket_manager.send_message(plan_id, approval_msg)
+            await websocket_manager.send_message_with_ack(plan_id, approval_msg)
             logger.info(f"📊 ===== EXTRACTION APPROVAL REQUEST SENT ===== [plan={plan_id}]")
             
         except Exception as e:
@@ -650,7 +912,14 @@ class AgentService:
             raise
     
     @staticmethod
-    async def handle_extraction_approval(plan_id: str, approved: bool, feedback: str = None, edited_data: dict = None) -> Dict[str, Any]:
+    async def handle_extraction_approval(
+        plan_id: str,
+        approved: bool,
+        feedback: str = None,
+        edited_data: dict = None,
+        approved_by: str = "user",
+        policy_checks: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
         """
         Handle extraction approval/rejection.
         
@@ -659,6 +928,8 @@ class AgentService:
             approved: Whether extraction was approved
             feedback: Optional feedback from user
             edited_data: Optional edited invoice data from user
+            approved_by: "user", or "policy" for automatic approvals
+            policy_checks: Policy check results recorded in the audit trail
             
         Returns:
             Status dict
@@ -669,8 +940,9 @@ class AgentService:
         
         try:
             # Get stored execution state
-            execution_state = AgentService._pending_executions.get(plan_id)
-            if not execution_state:
+            execution_state, _ = await AgentService._load_checkpoint(plan_id)
+            paused_at, state = await AgentService._get_paused_gate(plan_id)
+            if not execution_state or paused_at != EXTRACTION_REVIEW_NODE:
                 logger.error(f"No execution state found for plan {plan_id}")
                 return {"status": "error", "message": "Cannot process approval - no state found"}
             
@@ -678,8 +950,7 @@ class AgentService:
                 # Extraction approved - store to database
                 logger.info(f"✅ Extraction approved for plan {plan_id}")
                 
-                # Get extraction result from state
-                state = execution_state.get("state", {})
+                # Get extraction result from the paused graph state
                 extraction_result = state.get("extraction_result")
                 
                 if extraction_result:
@@ -711,7 +982,7 @@ class AgentService:
                         extraction_id = await InvoiceExtractionRepository.store_extraction(
                             plan_id=plan_id,
                             extraction_result=extraction_result,
-                            approved_by="user"
+                            approved_by=approved_by
                         )
                         logger.info(f"📊 Stored extraction {extraction_id} for plan {plan_id}")
                         
@@ -748,11 +1019,15 @@ class AgentService:
                         }
                     })
                 
-                # Mark extraction as approved in state
-                state["extraction_approved"] = True
+                await AgentService._record_approval(
+                    plan_id, "approved", approved_by, feedback, extraction_result, policy_checks
+                )
                 
-                # Track agent progress - completed
-                await PlanRepository.update_agent_progress(plan_id, "Invoice Agent", "completed")
+                # Mark extraction as approved and let the graph finish
+                await AgentService._resume_graph(
+                    plan_id,
+                    {"extraction_approved": True, "extraction_result": extraction_result}
+                )
                 
                 # Send final agent message with complete extraction results
                 if extraction_result:
@@ -774,9 +1049,12 @@ class AgentService:
                     
                     logger.info(f"📊 Sent final extraction results as Invoice Agent message for plan {plan_id}")
                 
-                # Complete the task
-                await PlanRepository.update_status(plan_id, "completed")
-                await websocket_manager.send_message(plan_id, {
+                # Complete the task and track agent progress - every planned agent completed
+                agents = AgentService._planned_agents(execution_state) or ["invoice"]
+                await PlanRepository.transition(
+                    plan_id, status="completed", agent_progress=AgentService._agents_progress(agents, "completed")
+                )
+                await websocket_manager.send_message_with_ack(plan_id, {
                     "type": "final_result_message",
                     "data": {
                         "content": "Invoice extraction completed and approved.",
@@ -786,14 +1064,17 @@ class AgentService:
                 })
                 
                 # Clean up
-                AgentService._pending_executions.pop(plan_id, None)
-                AgentService._execution_contexts.pop(plan_id, None)
+                await AgentService._clear_checkpoint(plan_id)
                 
                 return {"status": "completed"}
             
             else:
                 # Extraction rejected
                 logger.info(f"❌ Extraction rejected for plan {plan_id}")
+                await AgentService._record_approval(
+                    plan_id, "rejected", approved_by, feedback, state.get("extraction_result")
+                )
+                await AgentService._resume_graph(plan_id, {"extraction_approved": False})
                 
                 # Send rejection message
                 rejection_msg = f"Invoice extraction rejected. {feedback or ''}"
@@ -809,7 +1090,7 @@ class AgentService:
                 
                 # Update plan status
                 await PlanRepository.update_status(plan_id, "rejected")
-                await websocket_manager.send_message(plan_id, {
+                await websocket_manager.send_message_with_ack(plan_id, {
                     "type": "final_result_message",
                     "data": {
                         "content": rejection_msg,
@@ -819,11 +1100,61 @@ class AgentService:
                 })
                 
                 # Clean up
-                AgentService._pending_executions.pop(plan_id, None)
-                AgentService._execution_contexts.pop(plan_id, None)
+                await AgentService._clear_checkpoint(plan_id)
                 
                 return {"status": "rejected"}
                 
         except Exception as e:
             logger.error(f"Extraction approval handling failed for plan {plan_id}: {e}")
             raise
+    
+    @staticmethod
+    def stop_plan_jobs(plan_id: str) -> None:
+        """Stop this worker's jobs for a plan another worker cancelled."""
+        tasks = job_queue.cancel(plan_id)
+        if tasks:
+            logger.info(f"🛑 Stopped {len(tasks)} running job(s) for plan {plan_id} cancelled on another worker")
+    
+    @staticmethod
+    async def cancel_plan(plan_id: str, reason: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Cancel a plan: drop its queued jobs, stop its running job and mark it cancelled.
+        
+        Cancelling the running job interrupts whatever it is awaiting (LLM
+        call, graph step, external API), which frees its queue slot at once.
+        Other workers get the cancellation on the plan event channel and stop
+        their jobs for the plan too; until then, the cancelled status blocks
+        any transition those jobs attempt.
+        
+        Args:
+            plan_id: Plan identifier
+            reason: Optional reason shown to the user
+            
+        Returns:
+            Cancellation result
+        """
+        plan = await PlanRepository.get_by_id(plan_id)
+        if not plan:
+            return {"status": "not_found"}
+        if plan.status in ("completed", "failed", "rejected", "cancelled"):
+            return {"status": plan.status, "message": "Plan already finished"}
+        
+        tasks = job_queue.cancel(plan_id)
+        if tasks:
+            # Let the jobs unwind before the plan is marked cancelled
+            await asyncio.wait(tasks, timeout=5)
+        
+        await PlanRepository.update_status(plan_id, PlanRepository.CANCELLED_STATUS)
+        plan_event_channel.publish([plan_id], PLAN_CANCELLED_EVENT)
+        await websocket_manager.send_message_with_ack(plan_id, {
+            "type": "final_result_message",
+            "data": {
+                "content": f"Plan cancelled. {reason or ''}".strip(),
+                "status": "cancelled",
+                "timestamp": datetime.utcnow().isoformat() + "Z"  # Ensure UTC timezone marker
+            }
+        })
+        await AgentService._clear_checkpoint(plan_id)
+        
+        logger.info(f"🛑 Plan {plan_id} cancelled ({len(tasks)} running job(s) stopped)")
+        return {"status": "cancelled", "stopped_jobs": len(tasks)}
@@ -0,0 +1,156 @@
+"""Policy-based auto-approval for invoice extractions."""
+import logging
+import os
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from app.config.validation_rules import ValidationRulesConfig
+from app.db.repositories import InvoiceExtractionRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ApprovalPolicy(BaseModel):
+    """Conditions an extraction must meet to skip human review."""
+    enabled: bool = False
+    # Highest validation severity allowed ("none" = every rule passed)
+    allowed_severities: List[str] = ["none"]
+    # Largest invoice total approved automatically (None = no limit)
+    max_total: Optional[Decimal] = None
+    require_known_vendor: bool = True
+    # Vendors always treated as known (case-insensitive)
+    known_vendors: List[str] = []
+    # Human-approved extractions from a vendor that make it known (0 = list only)
+    vendor_min_approvals: int = 1
+
+
+class PolicyCheck(BaseModel):
+    """Outcome of one policy condition."""
+    check: str
+    passed: bool
+    detail: str
+
+
+class PolicyDecision(BaseModel):
+    """Result of evaluating the policy against an extraction."""
+    auto_approve: bool
+    checks: List[PolicyCheck] = []
+
+    @property
+    def summary(self) -> str:
+        """One-line explanation for messages and the audit trail."""
+        if self.auto_approve:
+            return "Auto-approved by policy: " + "; ".join(check.detail for check in self.checks)
+        failed = [check.detail for check in self.checks if not check.passed]
+        return "Manual review required: " + "; ".join(failed)
+
+
+class ApprovalPolicyEngine:
+    """
+    Decides whether an extraction can be approved without a human.
+
+    Every condition is evaluated (not short-circuited) so the audit trail
+    shows all the reasons an invoice did or did not qualify.
+    """
+
+    def __init__(self, policy: ApprovalPolicy):
+        self.policy = policy
+
+    async def evaluate(self, extraction_result: Any) -> Optional[PolicyDecision]:
+        """
+        Evaluate the policy.
+
+        Returns:
+            PolicyDecision, or None when the policy is disabled
+        """
+        if not self.policy.enabled:
+            return None
+
+        # Validation errors also clear `success`; those are reported by the validation check
+        invoice = extraction_result.invoice_data if extraction_result else None
+        if invoice is None:
+            return PolicyDecision(auto_approve=False, checks=[
+                PolicyCheck(check="extraction", passed=False, detail="No invoice data was extracted")
+            ])
+
+        checks = [
+            self._check_validation(extraction_result.validation_errors),
+            self._check_total(invoice.total_amount, invoice.currency),
+            await self._check_vendor(invoice.vendor_name)
+        ]
+        return PolicyDecision(auto_approve=all(check.passed for check in checks), checks=checks)
+
+    def _check_validation(self, validation_errors: List[str]) -> PolicyCheck:
+        severity = ValidationRulesConfig.get_highest_severity(validation_errors) or "none"
+        passed = severity in self.policy.allowed_severities
+        if severity == "none":
+            detail = "All validation rules passed"
+        else:
+            detail = f"Highest validation severity is {severity} ({len(validation_errors)} issue(s))"
+        return PolicyCheck(check="validation", passed=passed, detail=detail)
+
+    def _check_total(self, total_amount: Decimal, currency: str) -> PolicyCheck:
+        if self.policy.max_total is None:
+            return PolicyCheck(check="total", passed=True, detail="No total limit")
+        passed = total_amount <= self.policy.max_total
+        comparison = "within" if passed else "over"
+        return PolicyCheck(
+            check="total",
+            passed=passed,
+            detail=f"Total {currency} {total_amount} is {comparison} the {self.policy.max_total} limit"
+        )
+
+    async def _check_vendor(self, vendor_name: str) -> PolicyCheck:
+        if not self.policy.require_known_vendor:
+            return PolicyCheck(check="vendor", passed=True, detail="Vendor check disabled")
+
+        if vendor_name.casefold() in {vendor.casefold() for vendor in self.policy.known_vendors}:
+            return PolicyCheck(check="vendor", passed=True, detail=f"Vendor '{vendor_name}' is on the known vendor list")
+
+        if self.policy.vendor_min_approvals > 0:
+            approvals = await InvoiceExtractionRepository.count_by_vendor(
+                vendor_name, approved_by="user", limit=self.policy.vendor_min_approvals
+            )
+            if approvals >= self.policy.vendor_min_approvals:
+                return PolicyCheck(
+                    check="vendor",
+                    passed=True,
+                    detail=f"Vendor '{vendor_name}' has {approvals} human-approved invoice(s)"
+                )
+
+        return PolicyCheck(check="vendor", passed=False, detail=f"Vendor '{vendor_name}' is not known")
+
+    def describe(self) -> Dict[str, Any]:
+        """Policy settings, recorded with each audit entry."""
+        return self.policy.model_dump(mode="json")
+
+
+def _parse_list(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def create_approval_policy_engine() -> ApprovalPolicyEngine:
+    """Build the engine from APPROVAL_POLICY_* environment variables."""
+    max_total = None
+    max_total_value = os.getenv("APPROVAL_POLICY_MAX_TOTAL", "1000").strip()
+    if max_total_value:
+        try:
+            max_total = Decimal(max_total_value)
+        except InvalidOperation:
+            logger.warning(f"Ignoring invalid APPROVAL_POLICY_MAX_TOTAL: {max_total_value}")
+
+    policy = ApprovalPolicy(
+        enabled=os.getenv("APPROVAL_POLICY_ENABLED", "false").lower() == "true",
+        allowed_severities=_parse_list(os.getenv("APPROVAL_POLICY_ALLOWED_SEVERITIES", "none")),
+        max_total=max_total,
+        require_known_vendor=os.getenv("APPROVAL_POLICY_REQUIRE_KNOWN_VENDOR", "true").lower() == "true",
+        known_vendors=_parse_list(os.getenv("APPROVAL_POLICY_KNOWN_VENDORS")),
+        vendor_min_approvals=int(os.getenv("APPROVAL_POLICY_VENDOR_MIN_APPROVALS", "1"))
+    )
+    return ApprovalPolicyEngine(policy)
+
+
+# Global approval policy engine
+approval_policy_engine = create_approval_policy_engine()
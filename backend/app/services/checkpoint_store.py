@@ -0,0 +1,240 @@
+"""Durable checkpoints for paused agent executions (approval, clarification, extraction review)."""
+import copy
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from app.db.indexes import CHECKPOINT_TTL_SECONDS, ensure_indexes
+from app.db.repositories import CheckpointRepository
+from app.models.invoice_schema import ExtractionResult
+from app.services.websocket_service import websocket_manager
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BACKEND = "memory"
+MONGO_BACKEND = "mongo"
+
+
+def _default(value: Any) -> Any:
+    """Convert values JSON (and BSON) can't store natively."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def serialize_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert agent state into a plain document.
+
+    The WebSocket manager is process-local and is dropped (re-attached on
+    load); the ExtractionResult model is stored as JSON-safe data.
+    """
+    state = {key: value for key, value in state.items() if key != "websocket_manager"}
+    extraction_result = state.get("extraction_result")
+    if isinstance(extraction_result, ExtractionResult):
+        state["extraction_result"] = extraction_result.model_dump(mode="json")
+    return json.loads(json.dumps(state, default=_default))
+
+
+def deserialize_state(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild agent state from a stored document."""
+    state = dict(document)
+    if isinstance(state.get("extraction_result"), dict):
+        state["extraction_result"] = ExtractionResult.model_validate(state["extraction_result"])
+    state["websocket_manager"] = websocket_manager
+    return state
+
+
+class InMemoryCheckpointBackend:
+    """Process-local backend for development and tests (not shared across workers)."""
+
+    shared = False
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._documents: Dict[str, Dict[str, Any]] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for plan_id in [p for p, doc in self._documents.items() if doc["_saved_at"] < cutoff]:
+            del self._documents[plan_id]
+
+    async def save(self, plan_id: str, checkpoint: dict) -> int:
+        self._expire()
+        version = (await self.get_version(plan_id) or 0) + 1
+        self._documents[plan_id] = {**checkpoint, "version": version, "_saved_at": time.monotonic()}
+        return version
+
+    async def get(self, plan_id: str) -> Optional[dict]:
+        self._expire()
+        return self._documents.get(plan_id)
+
+    async def get_version(self, plan_id: str) -> Optional[int]:
+        document = await self.get(plan_id)
+        return document["version"] if document else None
+
+    async def delete(self, plan_id: str) -> None:
+        self._documents.pop(plan_id, None)
+
+    async def count(self) -> int:
+        self._expire()
+        return len(self._documents)
+
+
+class MongoCheckpointBackend:
+    """MongoDB backend; checkpoints survive restarts and are visible to every worker."""
+
+    shared = True
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    async def initialize(self) -> None:
+        # TTL index from the registry (expires after CHECKPOINT_TTL_HOURS)
+        await ensure_indexes([CheckpointRepository.COLLECTION])
+
+    async def save(self, plan_id: str, checkpoint: dict) -> int:
+        return await CheckpointRepository.save(plan_id, checkpoint)
+
+    async def get(self, plan_id: str) -> Optional[dict]:
+        return await CheckpointRepository.get(plan_id)
+
+    async def get_version(self, plan_id: str) -> Optional[int]:
+        return await CheckpointRepository.get_version(plan_id)
+
+    async def delete(self, plan_id: str) -> None:
+        await CheckpointRepository.delete(plan_id)
+
+    async def count(self) -> int:
+        return await CheckpointRepository.count()
+
+
+class CheckpointStore:
+    """
+    Checkpoint store with an LRU hot cache in front of a durable backend.
+
+    A checkpoint holds the paused execution state and the execution context
+    for one plan. The cache keeps serialized documents, so callers always get
+    fresh copies; with a shared backend a cached entry is only used when its
+    version still matches the stored one, so a plan resumed on another worker
+    is never served stale.
+    """
+
+    def __init__(self, backend, cache_size: int = 256):
+        self.backend = backend
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def initialize(self) -> None:
+        """Prepare the backend (e.g. TTL index)."""
+        await self.backend.initialize()
+
+    def _cache_put(self, plan_id: str, document: Dict[str, Any]) -> None:
+        self._cache[plan_id] = document
+        self._cache.move_to_end(plan_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def save(self, plan_id: str, execution: Dict[str, Any], context: Optional[Dict[str, Any]]) -> None:
+        """
+        Persist the checkpoint for a plan.
+
+        Args:
+            plan_id: Plan identifier
+            execution: Pending execution dict (its "state" is agent state)
+            context: Serialized ExecutionContext
+        """
+        execution_doc = dict(execution)
+        if execution_doc.get("state") is not None:
+            execution_doc["state"] = serialize_state(execution_doc["state"])
+        document = {"execution": execution_doc, "context": context}
+
+        # The backend assigns the version (atomically for a shared backend), so a
+        # save on another worker always moves it past any version cached here
+        version = await self.backend.save(plan_id, document)
+        self._cache_put(plan_id, {**document, "version": version})
+        logger.debug("💾 Saved checkpoint v%d for plan %s", version, plan_id)
+
+    async def load(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the checkpoint for a plan.
+
+        Returns:
+            {"execution": dict with live agent state, "context": dict or None},
+            or None if the plan has no checkpoint
+        """
+        document = self._cache.get(plan_id)
+        if document is not None and self.backend.shared:
+            if await self.backend.get_version(plan_id) != document["version"]:
+                document = None
+
+        if document is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(plan_id)
+        else:
+            self.cache_misses += 1
+            document = await self.backend.get(plan_id)
+            if document is None:
+                self._cache.pop(plan_id, None)
+                return None
+            document = {
+                "execution": document.get("execution") or {},
+                "context": document.get("context"),
+                "version": document["version"]
+            }
+            self._cache_put(plan_id, document)
+
+        execution = copy.deepcopy(document["execution"])
+        if execution.get("state") is not None:
+            execution["state"] = deserialize_state(execution["state"])
+        return {"execution": execution, "context": copy.deepcopy(document["context"])}
+
+    async def delete(self, plan_id: str) -> None:
+        """Remove a plan's checkpoint once it reaches a terminal state."""
+        self._cache.pop(plan_id, None)
+        await self.backend.delete(plan_id)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Cache and backend gauges for monitoring."""
+        return {
+            "backend": MONGO_BACKEND if self.backend.shared else MEMORY_BACKEND,
+            "stored": await self.backend.count(),
+            "cached": len(self._cache),
+            "cache_size": self.cache_size,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses
+        }
+
+
+def create_checkpoint_store() -> CheckpointStore:
+    """Build the store from CHECKPOINT_BACKEND, CHECKPOINT_CACHE_SIZE and CHECKPOINT_TTL_HOURS."""
+    backend_name = os.getenv("CHECKPOINT_BACKEND", MONGO_BACKEND).lower()
+    cache_size = int(os.getenv("CHECKPOINT_CACHE_SIZE", "256"))
+    ttl_seconds = CHECKPOINT_TTL_SECONDS
+
+    if backend_name == MEMORY_BACKEND:
+        backend = InMemoryCheckpointBackend(ttl_seconds)
+    else:
+        if backend_name != MONGO_BACKEND:
+            logger.warning(f"Unknown CHECKPOINT_BACKEND '{backend_name}', using {MONGO_BACKEND}")
+        backend = MongoCheckpointBackend(ttl_seconds)
+
+    return CheckpointStore(backend, cache_size=cache_size)
+
+
+# Global checkpoint store instance
+checkpoint_store = create_checkpoint_store()
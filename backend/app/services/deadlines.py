@@ -0,0 +1,112 @@
+"""Per-stage deadlines for the agent pipeline (planner, agent, extraction, external API)."""
+import asyncio
+import contextvars
+import logging
+import os
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages with their own deadline
+PLANNER_STAGE = "planner"
+AGENT_STAGE = "agent"
+EXTRACTION_STAGE = "extraction"
+EXTERNAL_API_STAGE = "external_api"
+
+DEFAULT_STAGE_TIMEOUTS = {
+    PLANNER_STAGE: 60.0,
+    AGENT_STAGE: 300.0,
+    EXTRACTION_STAGE: 120.0,
+    EXTERNAL_API_STAGE: 30.0
+}
+
+
+def _load_stage_timeouts() -> dict:
+    """Read STAGE_TIMEOUT_<STAGE> overrides (seconds, 0 disables the stage's deadline)."""
+    timeouts = dict(DEFAULT_STAGE_TIMEOUTS)
+    for stage in timeouts:
+        value = os.getenv(f"STAGE_TIMEOUT_{stage.upper()}")
+        if value:
+            try:
+                timeouts[stage] = float(value)
+            except ValueError:
+                logger.warning(f"Ignoring invalid STAGE_TIMEOUT_{stage.upper()}: {value}")
+    return timeouts
+
+
+STAGE_TIMEOUTS = _load_stage_timeouts()
+
+# Absolute event loop time the current operation must finish by. Context
+# variables follow tasks, graph nodes and asyncio.to_thread calls, so a
+# nested stage never outlives the one that started it.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("stage_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """A pipeline stage ran past its deadline."""
+
+    def __init__(self, stage: str, timeout: float):
+        self.stage = stage
+        self.timeout = timeout
+        super().__init__(f"{stage} stage exceeded its {timeout:.0f}s deadline")
+
+
+def remaining(stage: Optional[str] = None, default: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds an operation may take: the tightest of the stage's timeout,
+    the caller's default and whatever is left of the enclosing deadline.
+
+    Returns:
+        Seconds (0 when the enclosing deadline already passed), or None for no limit
+    """
+    limits = []
+    if stage and STAGE_TIMEOUTS.get(stage):
+        limits.append(STAGE_TIMEOUTS[stage])
+    if default:
+        limits.append(default)
+    deadline = _deadline.get()
+    if deadline is not None:
+        limits.append(max(deadline - asyncio.get_running_loop().time(), 0.0))
+    return min(limits) if limits else None
+
+
+def require_remaining(stage: str, default: Optional[float] = None) -> Optional[float]:
+    """
+    remaining() for a call about to be sent, which must not start once the
+    enclosing deadline has passed (requests rejects a timeout of 0).
+
+    Raises:
+        DeadlineExceededError: If no time is left
+    """
+    timeout = remaining(stage, default)
+    if timeout is not None and timeout <= 0:
+        logger.warning("⏰ %s call skipped: the enclosing deadline already passed", stage)
+        raise DeadlineExceededError(stage, STAGE_TIMEOUTS.get(stage) or default or 0.0)
+    return timeout
+
+
+async def run_with_deadline(stage: str, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await within the stage's deadline (bounded by any enclosing deadline).
+
+    On expiry the awaitable is cancelled, which releases the caller right
+    away; work already handed to a thread keeps running there until it
+    returns, but nothing waits for it.
+
+    Raises:
+        DeadlineExceededError: If the stage runs out of time
+    """
+    timeout = remaining(stage)
+    if timeout is None:
+        return await awaitable
+
+    async def run():
+        # Runs in its own task, so the deadline only applies inside this stage
+        _deadline.set(asyncio.get_running_loop().time() + timeout)
+        return await awaitable
+
+    try:
+        return await asyncio.wait_for(run(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("⏰ %s stage exceeded its %.1fs deadline", stage, timeout)
+        raise DeadlineExceededError(stage, timeout)
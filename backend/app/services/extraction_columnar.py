@@ -0,0 +1,360 @@
+"""Typed columnar (Parquet / Arrow IPC) export and snapshot of invoice extractions."""
+import asyncio
+import contextlib
+import fcntl
+import io
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.db.repositories import InvoiceExtractionRepository
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+INVOICES_TABLE = "invoices"
+LINE_ITEMS_TABLE = "line_items"
+TABLES = (INVOICES_TABLE, LINE_ITEMS_TABLE)
+
+# Amounts are stored as strings; exported as decimal(18, 4), which Parquet keeps as int64
+DECIMAL_PRECISION = 18
+DECIMAL_SCALE = 4
+DECIMAL_QUANTUM = Decimal(1).scaleb(-DECIMAL_SCALE)
+
+# Rows per Parquet row group / Arrow record batch
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "10000"))
+PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+EXPORT_SNAPSHOT_DIR = os.getenv("EXPORT_SNAPSHOT_DIR", "./data/extraction_snapshot")
+# Extractions newer than this are left for the next snapshot, so inserts still in flight aren't skipped
+EXPORT_SNAPSHOT_LAG_SECONDS = float(os.getenv("EXPORT_SNAPSHOT_LAG_SECONDS", "60"))
+
+WATERMARK_FILE = "_watermark.json"
+LOCK_FILE = "_lock"
+LOCK_POLL_INTERVAL = 0.5  # Seconds between attempts while another worker holds the snapshot lock
+
+
+def is_pyarrow_available() -> bool:
+    """Check if the optional pyarrow package is installed."""
+    return pa is not None
+
+
+@lru_cache(maxsize=None)
+def table_schema(table: str) -> "pa.Schema":
+    """Arrow schema of an export table."""
+    amount = pa.decimal128(DECIMAL_PRECISION, DECIMAL_SCALE)
+    timestamp = pa.timestamp("ms", tz="UTC")
+    if table == INVOICES_TABLE:
+        return pa.schema([
+            ("plan_id", pa.string()),
+            ("vendor_name", pa.string()),
+            ("vendor_address", pa.string()),
+            ("invoice_number", pa.string()),
+            ("invoice_date", pa.date32()),
+            ("due_date", pa.date32()),
+            ("currency", pa.string()),
+            ("subtotal", amount),
+            ("tax_amount", amount),
+            ("discount_amount", amount),
+            ("total_amount", amount),
+            ("payment_terms", pa.string()),
+            ("notes", pa.string()),
+            ("line_item_count", pa.int32()),
+            ("validation_error_count", pa.int32()),
+            ("model_used", pa.string()),
+            ("extraction_time", pa.float64()),
+            ("approved_by", pa.string()),
+            ("approved_at", timestamp),
+            ("created_at", timestamp)
+        ])
+    return pa.schema([
+        ("plan_id", pa.string()),
+        ("invoice_number", pa.string()),
+        ("line_number", pa.int32()),
+        ("description", pa.string()),
+        ("quantity", amount),
+        ("unit_price", amount),
+        ("total", amount),
+        ("created_at", timestamp)
+    ])
+
+
+def _decimal(value: Any) -> Optional[Decimal]:
+    """Parse a stored amount; missing ("None"), unparsable or out-of-range values become null."""
+    if value is None or value in ("", "None"):
+        return None
+    try:
+        amount = Decimal(str(value))
+        if not amount.is_finite():
+            return None
+        amount = amount.quantize(DECIMAL_QUANTUM)
+    except (InvalidOperation, ValueError):
+        return None
+    if amount.adjusted() >= DECIMAL_PRECISION - DECIMAL_SCALE:
+        return None
+    return amount
+
+
+def _date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _rows(table: str, extraction: dict) -> List[Dict[str, Any]]:
+    """Rows an extraction contributes to a table (one invoice row, or one row per line item)."""
+    invoice_data = extraction.get("invoice_data") or {}
+    line_items = invoice_data.get("line_items") or []
+
+    if table == LINE_ITEMS_TABLE:
+        return [
+            {
+                "plan_id": extraction.get("plan_id"),
+                "invoice_number": _text(invoice_data.get("invoice_number")),
+                "line_number": number,
+                "description": _text(item.get("description")),
+                "quantity": _decimal(item.get("quantity")),
+                "unit_price": _decimal(item.get("unit_price")),
+                "total": _decimal(item.get("total")),
+                "created_at": extraction.get("created_at")
+            }
+            for number, item in enumerate(line_items, start=1)
+        ]
+
+    return [{
+        "plan_id": extraction.get("plan_id"),
+        "vendor_name": _text(invoice_data.get("vendor_name")),
+        "vendor_address": _text(invoice_data.get("vendor_address")),
+        "invoice_number": _text(invoice_data.get("invoice_number")),
+        "invoice_date": _date(invoice_data.get("invoice_date")),
+        "due_date": _date(invoice_data.get("due_date")),
+        "currency": _text(invoice_data.get("currency")),
+        "subtotal": _decimal(invoice_data.get("subtotal")),
+        "tax_amount": _decimal(invoice_data.get("tax_amount")),
+        "discount_amount": _decimal(invoice_data.get("discount_amount")),
+        "total_amount": _decimal(invoice_data.get("total_amount")),
+        "payment_terms": _text(invoice_data.get("payment_terms")),
+        "notes": _text(invoice_data.get("notes")),
+        "line_item_count": len(line_items),
+        "validation_error_count": len(extraction.get("validation_errors") or []),
+        "model_used": extraction.get("model_used"),
+        "extraction_time": extraction.get("extraction_time"),
+        "approved_by": extraction.get("approved_by"),
+        "approved_at": extraction.get("approved_at"),
+        "created_at": extraction.get("created_at")
+    }]
+
+
+async def _record_batches(extractions: AsyncIterator[dict], table: str) -> AsyncIterator["pa.RecordBatch"]:
+    """Group the table's rows into record batches of EXPORT_ROW_GROUP_SIZE (converted off the event loop)."""
+    schema = table_schema(table)
+    rows: List[Dict[str, Any]] = []
+    async for extraction in extractions:
+        rows.extend(_rows(table, extraction))
+        if len(rows) >= EXPORT_ROW_GROUP_SIZE:
+            yield await asyncio.to_thread(pa.RecordBatch.from_pylist, rows, schema=schema)
+            rows = []
+    if rows:
+        yield await asyncio.to_thread(pa.RecordBatch.from_pylist, rows, schema=schema)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what was written until drained into the response."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def encode_parquet(extractions: AsyncIterator[dict], table: str) -> AsyncIterator[bytes]:
+    """A Parquet file of the table, one row group per record batch, streamed as it is written."""
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, table_schema(table), compression=PARQUET_COMPRESSION)
+    try:
+        async for batch in _record_batches(extractions, table):
+            # Encoding and compressing a row group is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(writer.write_batch, batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+async def encode_arrow(extractions: AsyncIterator[dict], table: str) -> AsyncIterator[bytes]:
+    """An Arrow IPC stream of the table (readable with pyarrow.ipc.open_stream)."""
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, table_schema(table))
+    try:
+        async for batch in _record_batches(extractions, table):
+            await asyncio.to_thread(writer.write_batch, batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+class ExtractionSnapshot:
+    """
+    Append-only Parquet copy of the extractions for analytics.
+
+    Each run exports the extractions approved since the previous run's
+    watermark, up to EXPORT_SNAPSHOT_LAG_SECONDS ago, as one new part file
+    per table (`invoices/part-<end>.parquet`, `line_items/...`). Windows
+    are [previous end, end), so parts never overlap and scans never touch
+    the OLTP collection. Read a table with pyarrow.dataset or
+    pandas.read_parquet on its directory.
+
+    Runs are serialized by an flock on the directory's lock file, so
+    workers sharing the directory never export the same window twice. That
+    covers workers on one host; a directory shared between hosts needs a
+    filesystem with working flock (not every NFS setup has one).
+    """
+
+    def __init__(self, directory: str, lag_seconds: float = 60.0):
+        self.directory = Path(directory)
+        self.lag_seconds = lag_seconds
+        self._lock = asyncio.Lock()
+
+    def watermark(self) -> Dict[str, Any]:
+        """The last run's state: {"approved_at": ISO end of the window, "parts": n, ...}."""
+        path = self.directory / WATERMARK_FILE
+        if not path.exists():
+            return {"approved_at": None, "parts": 0, "invoices": 0, "line_items": 0}
+        return json.loads(path.read_text())
+
+    @contextlib.asynccontextmanager
+    async def _exclusive(self) -> AsyncIterator[None]:
+        """Hold the snapshot lock: the asyncio lock within this worker, the file lock across workers."""
+        async with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / LOCK_FILE, "w") as lock_file:
+                # Poll rather than block in a thread, so a cancelled run never
+                # leaves a thread behind that takes the lock later
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        await asyncio.sleep(LOCK_POLL_INTERVAL)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_watermark(self, state: Dict[str, Any]) -> None:
+        path = self.directory / WATERMARK_FILE
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(state, indent=2))
+        os.replace(temporary, path)
+
+    async def append(self) -> Dict[str, Any]:
+        """
+        Export the extractions approved since the last run as new part files.
+
+        Returns:
+            The window, rows written per table and the new watermark
+        """
+        async with self._exclusive():
+            state = self.watermark()
+            start = datetime.fromisoformat(state["approved_at"]) if state["approved_at"] else None
+            end = datetime.utcnow() - timedelta(seconds=self.lag_seconds)
+            if start and start >= end:
+                return {"start": state["approved_at"], "end": state["approved_at"], "appended": {}, "watermark": state}
+
+            part = f"part-{end:%Y%m%dT%H%M%S%f}.parquet"
+            paths = {table: self.directory / table / part for table in TABLES}
+            writers = {}
+            counts = {table: 0 for table in TABLES}
+            rows: Dict[str, List[Dict[str, Any]]] = {table: [] for table in TABLES}
+
+            async def write(table: str) -> None:
+                if not rows[table]:
+                    return
+                batch = await asyncio.to_thread(pa.RecordBatch.from_pylist, rows[table], schema=table_schema(table))
+                if table not in writers:
+                    paths[table].parent.mkdir(parents=True, exist_ok=True)
+                    temporary = paths[table].with_suffix(".tmp")
+                    writers[table] = await asyncio.to_thread(
+                        pq.ParquetWriter, temporary, table_schema(table), compression=PARQUET_COMPRESSION
+                    )
+                await asyncio.to_thread(writers[table].write_batch, batch)
+                counts[table] += len(rows[table])
+                rows[table] = []
+
+            try:
+                async for extraction in InvoiceExtractionRepository.iter_extractions(start=start, end=end):
+                    for table in TABLES:
+                        rows[table].extend(_rows(table, extraction))
+                        if len(rows[table]) >= EXPORT_ROW_GROUP_SIZE:
+                            await write(table)
+                for table in TABLES:
+                    await write(table)
+                for table, writer in writers.items():
+                    await asyncio.to_thread(writer.close)
+                    os.replace(paths[table].with_suffix(".tmp"), paths[table])
+            except Exception:
+                for table, writer in writers.items():
+                    writer.close()
+                    paths[table].with_suffix(".tmp").unlink(missing_ok=True)
+                raise
+
+            state = {
+                "approved_at": end.isoformat(),
+                "parts": state["parts"] + (1 if writers else 0),
+                "invoices": state["invoices"] + counts[INVOICES_TABLE],
+                "line_items": state["line_items"] + counts[LINE_ITEMS_TABLE]
+            }
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._save_watermark(state)
+            logger.info(
+                f"📦 Extraction snapshot appended {counts[INVOICES_TABLE]} invoices and "
+                f"{counts[LINE_ITEMS_TABLE]} line items up to {end.isoformat()}"
+            )
+            return {
+                "start": start.isoformat() if start else None,
+                "end": end.isoformat(),
+                "appended": counts,
+                "watermark": state
+            }
+
+
+# Global analytical snapshot of the extractions
+extraction_snapshot = ExtractionSnapshot(EXPORT_SNAPSHOT_DIR, lag_seconds=EXPORT_SNAPSHOT_LAG_SECONDS)
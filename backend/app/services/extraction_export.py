@@ -0,0 +1,185 @@
+"""Streaming bulk export of stored invoice extractions."""
+import csv
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.db.repositories import InvoiceExtractionRepository
+from app.services.extraction_columnar import INVOICES_TABLE, encode_arrow, encode_parquet
+
+logger = logging.getLogger(__name__)
+
+# Extractions fetched per cursor round trip
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Encoded output is sent to the client in chunks of about this size
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_KB", "64")) * 1024
+
+# One CSV row per line item, the invoice columns repeated on each
+CSV_HEADER = [
+    "Plan ID",
+    "Vendor Name",
+    "Vendor Address",
+    "Invoice Number",
+    "Invoice Date",
+    "Due Date",
+    "Currency",
+    "Subtotal",
+    "Tax Amount",
+    "Discount Amount",
+    "Total Amount",
+    "Payment Terms",
+    "Approved By",
+    "Approved At",
+    "Line Number",
+    "Line Description",
+    "Line Quantity",
+    "Line Unit Price",
+    "Line Total"
+]
+
+
+def _csv_rows(extraction: dict) -> List[List[Any]]:
+    """CSV rows for one extraction; an invoice without line items gets a single row."""
+    invoice_data = extraction.get("invoice_data") or {}
+    approved_at = extraction.get("approved_at")
+    invoice_columns = [
+        extraction.get("plan_id", ""),
+        invoice_data.get("vendor_name", ""),
+        invoice_data.get("vendor_address", ""),
+        invoice_data.get("invoice_number", ""),
+        invoice_data.get("invoice_date", ""),
+        invoice_data.get("due_date", ""),
+        invoice_data.get("currency", ""),
+        invoice_data.get("subtotal", ""),
+        invoice_data.get("tax_amount", ""),
+        invoice_data.get("discount_amount", ""),
+        invoice_data.get("total_amount", ""),
+        invoice_data.get("payment_terms", ""),
+        extraction.get("approved_by", ""),
+        approved_at.isoformat() if approved_at else ""
+    ]
+
+    line_items = invoice_data.get("line_items") or []
+    if not line_items:
+        return [invoice_columns + ["", "", "", "", ""]]
+    return [
+        invoice_columns + [
+            number,
+            item.get("description", ""),
+            item.get("quantity", ""),
+            item.get("unit_price", ""),
+            item.get("total", "")
+        ]
+        for number, item in enumerate(line_items, start=1)
+    ]
+
+
+async def _encode_ndjson(extractions: AsyncIterator[dict], table: str) -> AsyncIterator[bytes]:
+    """One JSON object per extraction and line, shaped like GET /extraction/{plan_id}/json."""
+    async for extraction in extractions:
+        record = InvoiceExtractionRepository.export_extraction_json(extraction)
+        yield (json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+async def _encode_csv(extractions: AsyncIterator[dict], table: str) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(CSV_HEADER)
+    async for extraction in extractions:
+        writer.writerows(_csv_rows(extraction))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+class ExportFormat:
+    """
+    An export encoding: its response media type, file extension and encoder.
+
+    Columnar formats export one table (invoices or line items) per file and
+    need pyarrow; the row formats ignore the table.
+    """
+
+    def __init__(
+        self,
+        media_type: str,
+        extension: str,
+        encode: Callable[[AsyncIterator[dict], str], AsyncIterator[bytes]],
+        columnar: bool = False
+    ):
+        self.media_type = media_type
+        self.extension = extension
+        self.encode = encode
+        self.columnar = columnar
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "ndjson": ExportFormat("application/x-ndjson", "ndjson", _encode_ndjson),
+    "csv": ExportFormat("text/csv", "csv", _encode_csv),
+    "parquet": ExportFormat("application/vnd.apache.parquet", "parquet", encode_parquet, columnar=True),
+    "arrow": ExportFormat("application/vnd.apache.arrow.stream", "arrows", encode_arrow, columnar=True)
+}
+
+
+async def _counted(extractions: AsyncIterator[dict], counter: Dict[str, int]) -> AsyncIterator[dict]:
+    async for extraction in extractions:
+        counter["extractions"] += 1
+        yield extraction
+
+
+async def export_extractions(
+    export_format: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    vendor_name: Optional[str] = None,
+    approved_by: Optional[str] = None,
+    table: str = INVOICES_TABLE
+) -> AsyncIterator[bytes]:
+    """
+    Encode the matching extractions as they are read from the database.
+
+    Only one cursor batch and one output chunk are held at a time, so
+    memory stays flat however many extractions match.
+
+    Args:
+        export_format: A key of EXPORT_FORMATS
+        start: Approved at or after this time
+        end: Approved before this time
+        vendor_name: Vendor name as extracted
+        approved_by: Only extractions approved by this approver
+        table: Table for columnar formats (invoices or line_items)
+
+    Yields:
+        Encoded chunks of about EXPORT_CHUNK_BYTES
+    """
+    started = time.perf_counter()
+    counter = {"extractions": 0}
+    extractions = InvoiceExtractionRepository.iter_extractions(
+        start=start,
+        end=end,
+        vendor_name=vendor_name,
+        approved_by=approved_by,
+        batch_size=EXPORT_BATCH_SIZE
+    )
+
+    pending: List[bytes] = []
+    pending_bytes = 0
+    async for data in EXPORT_FORMATS[export_format].encode(_counted(extractions, counter), table):
+        pending.append(data)
+        pending_bytes += len(data)
+        if pending_bytes >= EXPORT_CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, pending_bytes = [], 0
+    if pending:
+        yield b"".join(pending)
+
+    logger.info(
+        f"📤 Exported {counter['extractions']} extractions as {export_format} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
@@ -0,0 +1,359 @@
+"""Bounded priority job queue for agent work (new plans, approvals, clarifications)."""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Job types. Approval-like jobs resume work a user is waiting on, so they
+# are dispatched before new plans; bulk batch plans run last.
+PLAN_JOB = "plan"
+APPROVAL_JOB = "approval"
+BATCH_JOB = "batch"
+
+DEFAULT_PRIORITIES = {APPROVAL_JOB: 0, PLAN_JOB: 10, BATCH_JOB: 20}
+DEFAULT_CONCURRENCY = {APPROVAL_JOB: 8, PLAN_JOB: 4, BATCH_JOB: 2}
+DEFAULT_QUEUE_LIMITS = {APPROVAL_JOB: 500, PLAN_JOB: 100, BATCH_JOB: 1000}
+
+
+class QueueFullError(Exception):
+    """Job rejected because its queue is at the depth limit."""
+    pass
+
+
+class QueueClosedError(Exception):
+    """Job rejected because the queue is draining for shutdown."""
+    pass
+
+
+def parse_job_mapping(value: Optional[str], defaults: Dict[str, int]) -> Dict[str, int]:
+    """
+    Parse "type=N,type=N" settings on top of defaults, e.g. "plan=4,approval=8".
+
+    Invalid entries are logged and ignored.
+    """
+    result = dict(defaults)
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        try:
+            job_type, number = item.split("=", 1)
+            result[job_type.strip()] = int(number)
+        except ValueError:
+            logger.warning(f"Ignoring invalid job queue setting: {item}")
+    return result
+
+
+class Job:
+    """A unit of queued work."""
+
+    def __init__(
+        self,
+        job_type: str,
+        func: Callable,
+        args: tuple,
+        kwargs: dict,
+        description: str = "",
+        key: Optional[str] = None
+    ):
+        self.id = str(uuid.uuid4())
+        self.job_type = job_type
+        # Caller-chosen handle (e.g. plan_id) used to cancel the job
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.description = description or getattr(func, "__name__", "job")
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+
+
+class JobQueue:
+    """
+    Priority job scheduler with per-type concurrency and queue depth limits.
+
+    Each job type has its own FIFO queue, concurrency limit and depth limit;
+    a global concurrency limit caps total running jobs, and when slots are
+    scarce the type with the lowest priority number is dispatched first.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        priorities: Optional[Dict[str, int]] = None,
+        concurrency: Optional[Dict[str, int]] = None,
+        queue_limits: Optional[Dict[str, int]] = None,
+        drain_timeout: float = 30.0
+    ):
+        self.max_concurrency = max_concurrency
+        self.priorities = priorities or dict(DEFAULT_PRIORITIES)
+        self.concurrency = concurrency or dict(DEFAULT_CONCURRENCY)
+        self.queue_limits = queue_limits or dict(DEFAULT_QUEUE_LIMITS)
+        self.drain_timeout = drain_timeout
+
+        self.pending: Dict[str, Deque[Job]] = {job_type: deque() for job_type in self.priorities}
+        self.running: Dict[str, Set[asyncio.Task]] = {job_type: set() for job_type in self.priorities}
+        self._running_jobs: Dict[asyncio.Task, Job] = {}
+        self.accepting = True
+        self._idle: Optional[asyncio.Event] = None
+
+        # Counters for monitoring
+        self.stats: Dict[str, Dict[str, float]] = {
+            job_type: {
+                "submitted": 0, "started": 0, "completed": 0, "failed": 0, "rejected": 0, "cancelled": 0,
+                "wait_seconds_total": 0.0, "run_seconds_total": 0.0
+            }
+            for job_type in self.priorities
+        }
+
+    def _running_total(self) -> int:
+        return sum(len(tasks) for tasks in self.running.values())
+
+    def _pending_total(self) -> int:
+        return sum(len(jobs) for jobs in self.pending.values())
+
+    def is_full(self, job_type: str) -> bool:
+        """Whether a new job of this type would be rejected right now."""
+        return not self.accepting or len(self.pending.get(job_type, ())) >= self.queue_limits.get(job_type, 0)
+
+    def remaining_capacity(self, job_type: str) -> int:
+        """How many more jobs of this type can be queued right now."""
+        if not self.accepting:
+            return 0
+        return max(self.queue_limits.get(job_type, 0) - len(self.pending.get(job_type, ())), 0)
+
+    def submit(
+        self,
+        job_type: str,
+        func: Callable,
+        *args: Any,
+        description: str = "",
+        key: Optional[str] = None,
+        **kwargs: Any
+    ) -> Job:
+        """
+        Queue an async callable for execution.
+
+        Args:
+            job_type: One of the configured job types (e.g. PLAN_JOB, APPROVAL_JOB)
+            func: Coroutine function to run
+            *args, **kwargs: Arguments passed to func
+            description: Label used in logs
+            key: Handle for cancel() (e.g. the plan_id)
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            QueueFullError: If the job type's queue is at its depth limit
+            QueueClosedError: If the queue is draining for shutdown
+        """
+        if job_type not in self.pending:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        if not self.accepting:
+            self.stats[job_type]["rejected"] += 1
+            raise QueueClosedError("Server is shutting down")
+
+        if len(self.pending[job_type]) >= self.queue_limits.get(job_type, 0):
+            self.stats[job_type]["rejected"] += 1
+            logger.warning(
+                "🚦 %s queue full (%d pending), rejecting %s",
+                job_type, len(self.pending[job_type]), description or func.__name__
+            )
+            raise QueueFullError(f"{job_type} queue is full")
+
+        job = Job(job_type, func, args, kwargs, description, key)
+        self.pending[job_type].append(job)
+        self.stats[job_type]["submitted"] += 1
+        logger.debug("📥 Queued %s job %s (%s)", job_type, job.id, job.description)
+
+        self._dispatch()
+        return job
+
+    def submit_many(self, job_type: str, calls: List[Tuple]) -> List[Job]:
+        """
+        Queue several jobs of one type all-or-nothing, dispatching once.
+
+        Args:
+            job_type: One of the configured job types
+            calls: (func, args, description) or (func, args, description, key) per job
+
+        Returns:
+            List[Job]: The queued jobs, in order
+
+        Raises:
+            QueueFullError: If the queue can't take every job
+            QueueClosedError: If the queue is draining for shutdown
+        """
+        if job_type not in self.pending:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        if not self.accepting:
+            self.stats[job_type]["rejected"] += len(calls)
+            raise QueueClosedError("Server is shutting down")
+
+        if len(calls) > self.remaining_capacity(job_type):
+            self.stats[job_type]["rejected"] += len(calls)
+            logger.warning(
+                "🚦 %s queue can't take %d jobs (%d pending), rejecting all",
+                job_type, len(calls), len(self.pending[job_type])
+            )
+            raise QueueFullError(f"{job_type} queue is full")
+
+        jobs = [Job(job_type, func, args, {}, *call) for func, args, *call in calls]
+        self.pending[job_type].extend(jobs)
+        self.stats[job_type]["submitted"] += len(jobs)
+        logger.debug("📥 Queued %d %s jobs", len(jobs), job_type)
+
+        self._dispatch()
+        return jobs
+
+    def _dispatch(self) -> None:
+        """Start queued jobs while global and per-type capacity allows, highest priority first."""
+        for job_type in sorted(self.pending, key=lambda t: self.priorities.get(t, 0)):
+            queue = self.pending[job_type]
+            while (
+                queue
+                and self._running_total() < self.max_concurrency
+                and len(self.running[job_type]) < self.concurrency.get(job_type, 1)
+            ):
+                job = queue.popleft()
+                job.started_at = time.monotonic()
+                self.stats[job_type]["started"] += 1
+                self.stats[job_type]["wait_seconds_total"] += job.started_at - job.enqueued_at
+                task = asyncio.create_task(self._run(job))
+                self.running[job_type].add(task)
+                self._running_jobs[task] = job
+                task.add_done_callback(lambda t, jt=job_type: self._on_done(jt, t))
+
+    async def _run(self, job: Job) -> None:
+        try:
+            await job.func(*job.args, **job.kwargs)
+            self._record_finished(job, "completed")
+        except asyncio.CancelledError:
+            # Cancelled runs are cut short, so they stay out of avg_run_ms
+            self.stats[job.job_type]["cancelled"] += 1
+            logger.warning("⚠️ %s job %s (%s) cancelled", job.job_type, job.id, job.description)
+            raise
+        except Exception as e:
+            self._record_finished(job, "failed")
+            logger.error("❌ %s job %s (%s) failed: %s", job.job_type, job.id, job.description, e, exc_info=True)
+
+    def _record_finished(self, job: Job, outcome: str) -> None:
+        self.stats[job.job_type][outcome] += 1
+        self.stats[job.job_type]["run_seconds_total"] += time.monotonic() - job.started_at
+
+    def _on_done(self, job_type: str, task: asyncio.Task) -> None:
+        self.running[job_type].discard(task)
+        self._running_jobs.pop(task, None)
+        self._dispatch()
+        if self._idle is not None and not self._running_total() and not self._pending_total():
+            self._idle.set()
+
+    def cancel(self, key: str) -> List[asyncio.Task]:
+        """
+        Cancel every job submitted with this key.
+
+        Queued jobs are dropped; running jobs have their task cancelled,
+        which frees their slot as soon as the task unwinds.
+
+        Returns:
+            List[asyncio.Task]: The running tasks that were cancelled (await them to
+            know they have stopped)
+        """
+        dropped = 0
+        for job_type, queue in self.pending.items():
+            kept = deque(job for job in queue if job.key != key)
+            removed = len(queue) - len(kept)
+            if removed:
+                self.pending[job_type] = kept
+                self.stats[job_type]["cancelled"] += removed
+                dropped += removed
+
+        tasks = [task for task, job in self._running_jobs.items() if job.key == key and not task.done()]
+        for task in tasks:
+            task.cancel()
+
+        if dropped or tasks:
+            logger.info("🛑 Cancelled jobs for %s (%d queued, %d running)", key, dropped, len(tasks))
+        return tasks
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop accepting jobs and wait for queued and running jobs to finish.
+
+        Jobs still running after the timeout are cancelled; queued jobs that
+        never started are dropped (their plans stay checkpointed).
+        """
+        self.accepting = False
+        timeout = self.drain_timeout if timeout is None else timeout
+
+        if self._running_total() or self._pending_total():
+            logger.info(
+                "⏳ Draining job queue (%d running, %d queued, timeout %.0fs)",
+                self._running_total(), self._pending_total(), timeout
+            )
+            self._idle = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                dropped = self._pending_total()
+                for queue in self.pending.values():
+                    queue.clear()
+                tasks = [task for tasks in self.running.values() for task in tasks]
+                logger.warning(
+                    "⚠️ Drain timed out: cancelling %d running job(s), dropping %d queued",
+                    len(tasks), dropped
+                )
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        logger.info("✅ Job queue drained")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue gauges and counters for monitoring."""
+        job_types = {}
+        for job_type, counters in self.stats.items():
+            # Jobs dropped from the queue never started, so they don't count towards avg_wait_ms
+            started = counters["started"]
+            finished = counters["completed"] + counters["failed"]
+            job_types[job_type] = {
+                "priority": self.priorities.get(job_type),
+                "pending": len(self.pending[job_type]),
+                "running": len(self.running[job_type]),
+                "concurrency": self.concurrency.get(job_type),
+                "queue_limit": self.queue_limits.get(job_type),
+                "submitted": counters["submitted"],
+                "completed": counters["completed"],
+                "failed": counters["failed"],
+                "rejected": counters["rejected"],
+                "cancelled": counters["cancelled"],
+                "avg_wait_ms": round(counters["wait_seconds_total"] * 1000 / started, 1) if started else 0.0,
+                "avg_run_ms": round(counters["run_seconds_total"] * 1000 / finished, 1) if finished else 0.0
+            }
+        return {
+            "accepting": self.accepting,
+            "max_concurrency": self.max_concurrency,
+            "running": self._running_total(),
+            "pending": self._pending_total(),
+            "job_types": job_types
+        }
+
+
+def create_job_queue() -> JobQueue:
+    """Build the queue from JOB_* environment variables."""
+    return JobQueue(
+        max_concurrency=int(os.getenv("JOB_MAX_CONCURRENCY", "8")),
+        priorities=parse_job_mapping(os.getenv("JOB_PRIORITIES"), DEFAULT_PRIORITIES),
+        concurrency=parse_job_mapping(os.getenv("JOB_CONCURRENCY"), DEFAULT_CONCURRENCY),
+        queue_limits=parse_job_mapping(os.getenv("JOB_QUEUE_LIMITS"), DEFAULT_QUEUE_LIMITS),
+        drain_timeout=float(os.getenv("JOB_DRAIN_TIMEOUT", "30"))
+    )
+
+
+# Global job queue instance
+job_queue = create_job_queue()
@@ -6,35 +6,17 @@ NO DEVIATIONS from the working test
 import logging
 import os
 import time
-from typing import Optional
 from datetime import date
 from decimal import Decimal
 
 import langextract as lx
-from app.models.invoice_schema import InvoiceData
+from app.models.invoice_schema import InvoiceData, ExtractionResult
 from app.config.validation_rules import InvoiceValidator
+from app.services.deadlines import DeadlineExceededError, EXTRACTION_STAGE, run_with_deadline
 
 logger = logging.getLogger(__name__)
 
 
-class ExtractionResult:
-    """Result of invoice extraction."""
-    
-    def __init__(
-        self,
-        success: bool,
-        invoice_data: Optional[InvoiceData],
-        validation_errors: list,
-        extraction_time: float,
-        model_used: str
-    ):
-        self.success = success
-        self.invoice_data = invoice_data
-        self.validation_errors = validation_errors
-        self.extraction_time = extraction_time
-        self.model_used = model_used
-
-
 class LangExtractService:
     """Service matching EXACTLY the working test pattern."""
     
@@ -80,7 +62,7 @@ class LangExtractService:
         start_time = time.time()
         
         try:
-            logger.info(f"📊 Starting extraction [plan={plan_id}]")
+            logger.info("📊 Starting extraction [plan=%s]", plan_id, extra={"plan_id": plan_id})
             
             # Enhanced prompt with line items extraction
             prompt = """
@@ -175,7 +157,7 @@ class LangExtractService:
             )
             
             # ===== INPUT VALIDATION & DEBUG =====
-            logger.info(f"🔍 Validating inputs before lx.extract() [plan={plan_id}]")
+            logger.debug("🔍 Validating inputs before lx.extract() [plan=%s]", plan_id)
             
             # 1. Validate invoice_text
             if not invoice_text:
@@ -186,14 +168,14 @@ class LangExtractService:
             # Check encoding
             try:
                 invoice_text.encode('utf-8')
-                logger.info(f"✅ invoice_text is valid UTF-8 ({len(invoice_text)} chars)")
+                logger.debug("✅ invoice_text is valid UTF-8 (%d chars)", len(invoice_text))
             except UnicodeEncodeError as e:
                 raise ValueError(f"invoice_text has invalid UTF-8 encoding: {e}")
             
             # 2. Validate prompt
             if not prompt or not isinstance(prompt, str):
                 raise ValueError("prompt is empty or not a string")
-            logger.info(f"✅ prompt is valid ({len(prompt)} chars)")
+            logger.debug("✅ prompt is valid (%d chars)", len(prompt))
             
             # 3. Validate example
             if not example:
@@ -204,24 +186,24 @@ class LangExtractService:
                 raise ValueError("example.text is empty")
             if not example.extractions:
                 raise ValueError("example.extractions is empty")
-            logger.info(f"✅ example is valid ({len(example.extractions)} extractions)")
+            logger.debug("✅ example is valid (%d extractions)", len(example.extractions))
             
             # 4. Validate model_id
             if not cls._model_name:
                 raise ValueError("model_name is not set")
-            logger.info(f"✅ model_id is valid: {cls._model_name}")
+            logger.debug("✅ model_id is valid: %s", cls._model_name)
             
             # 5. Debug: Print first 200 chars of invoice
-            preview = invoice_text[:200].replace('\n', '\\n')
-            logger.info(f"📄 Invoice preview: {preview}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📄 Invoice preview: %s...", invoice_text[:200].replace('\n', '\\n'))
             
             # 6. Debug: Check for common JSON issues in invoice text
             if invoice_text.strip().startswith('{') or invoice_text.strip().startswith('['):
-                logger.warning(f"⚠️ Invoice text looks like JSON - this might cause issues")
+                logger.warning("⚠️ Invoice text looks like JSON - this might cause issues")
             
             # All validations passed
-            logger.info(f"✅ All inputs validated successfully [plan={plan_id}]")
-            logger.info(f"🔍 Calling lx.extract() [plan={plan_id}]")
+            logger.debug("✅ All inputs validated successfully [plan=%s]", plan_id)
+            logger.debug("🔍 Calling lx.extract() [plan=%s]", plan_id)
             
             # Enable debug to see what's happening
             debug_mode = os.getenv("LANGEXTRACT_DEBUG", "false").lower() == "true"
@@ -237,51 +219,52 @@ class LangExtractService:
                 )
             except Exception as extract_error:
                 # Log the error details
-                logger.error(f"❌ lx.extract() failed: {extract_error}")
-                logger.error(f"   Error type: {type(extract_error).__name__}")
+                logger.error("❌ lx.extract() failed: %s", extract_error)
+                logger.error("   Error type: %s", type(extract_error).__name__)
                 
                 # Check if it's a JSON parsing error
                 error_str = str(extract_error)
                 if "JSON" in error_str or "parse" in error_str.lower():
-                    logger.error(f"   This is a JSON parsing error from langextract library")
-                    logger.error(f"   The LLM likely returned malformed JSON")
-                    logger.error(f"   Invoice length: {len(invoice_text)} chars")
+                    logger.error("   This is a JSON parsing error from langextract library")
+                    logger.error("   The LLM likely returned malformed JSON")
+                    logger.error("   Invoice length: %d chars", len(invoice_text))
                 
                 raise
             
-            logger.info(f"✅ lx.extract() returned [plan={plan_id}]")
+            logger.debug("✅ lx.extract() returned [plan=%s]", plan_id)
             
             # ===== OUTPUT VALIDATION & DEBUG =====
-            logger.info(f"🔍 Validating lx.extract() output [plan={plan_id}]")
+            logger.debug("🔍 Validating lx.extract() output [plan=%s]", plan_id)
             
             # 1. Check annotated_doc exists
             if not annotated_doc:
                 raise ValueError("lx.extract() returned None")
-            logger.info(f"✅ annotated_doc exists: {type(annotated_doc)}")
+            logger.debug("✅ annotated_doc exists: %s", type(annotated_doc))
             
             # 2. Check has extractions attribute
             if not hasattr(annotated_doc, 'extractions'):
                 raise ValueError("annotated_doc has no 'extractions' attribute")
-            logger.info(f"✅ annotated_doc has extractions attribute")
+            logger.debug("✅ annotated_doc has extractions attribute")
             
             # 3. Check extractions is not empty
             if not annotated_doc.extractions:
                 raise ValueError("annotated_doc.extractions is empty or None")
-            logger.info(f"✅ Got {len(annotated_doc.extractions)} extractions")
+            logger.info("✅ Got %d extractions [plan=%s]", len(annotated_doc.extractions), plan_id)
             
             # 4. Debug: Print each extraction
-            for i, ext in enumerate(annotated_doc.extractions, 1):
-                logger.info(f"   Extraction {i}: {ext.extraction_class} = '{ext.extraction_text}'")
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, ext in enumerate(annotated_doc.extractions, 1):
+                    logger.debug("   Extraction %d: %s = '%s'", i, ext.extraction_class, ext.extraction_text)
             
             # ===== GENERATE VISUALIZATION =====
             # Generate and store visualization HTML
             try:
                 cls.visualize_extraction(annotated_doc, plan_id)
             except Exception as viz_err:
-                logger.warning(f"⚠️ Visualization generation failed: {viz_err}")
+                logger.warning("⚠️ Visualization generation failed: %s", viz_err)
             
             # ===== BUILD INVOICE DATA =====
-            logger.info(f"🔨 Building InvoiceData from extractions [plan={plan_id}]")
+            logger.debug("🔨 Building InvoiceData from extractions [plan=%s]", plan_id)
             extraction_dict = {}
             
             for extraction in annotated_doc.extractions:
@@ -360,68 +343,68 @@ class LangExtractService:
                                 )
                                 line_items.append(line_item)
                             except Exception as item_err:
-                                logger.warning(f"⚠️ Failed to parse line item: {item_err}")
+                                logger.warning("⚠️ Failed to parse line item: %s", item_err)
                                 continue
                         
                         if line_items:
                             extraction_dict['line_items'] = line_items
-                            logger.info(f"✅ Parsed {len(line_items)} line items")
+                            logger.debug("✅ Parsed %d line items", len(line_items))
                         
                     except json.JSONDecodeError as json_err:
-                        logger.warning(f"⚠️ Failed to parse LINE_ITEMS JSON: {json_err}")
+                        logger.warning("⚠️ Failed to parse LINE_ITEMS JSON: %s", json_err)
                     except Exception as e:
-                        logger.warning(f"⚠️ Failed to process LINE_ITEMS: {e}")
+                        logger.warning("⚠️ Failed to process LINE_ITEMS: %s", e)
             
             # Check required fields
             required = ['invoice_number', 'invoice_date', 'vendor_name', 'total_amount', 'subtotal']
             missing = [f for f in required if f not in extraction_dict]
             
             if missing:
-                logger.error(f"❌ Missing required fields: {missing}")
-                logger.error(f"   Available fields: {list(extraction_dict.keys())}")
+                logger.error("❌ Missing required fields: %s", missing)
+                logger.error("   Available fields: %s", list(extraction_dict.keys()))
                 raise ValueError(f"Missing required fields: {', '.join(missing)}")
             
-            logger.info(f"✅ All required fields present: {list(extraction_dict.keys())}")
+            logger.debug("✅ All required fields present: %s", list(extraction_dict.keys()))
             
             # Create InvoiceData with validation
             try:
-                logger.info(f"🔨 Creating InvoiceData object [plan={plan_id}]")
+                logger.debug("🔨 Creating InvoiceData object [plan=%s]", plan_id)
                 invoice_data = InvoiceData(**extraction_dict)
-                logger.info(f"✅ InvoiceData created successfully")
+                logger.debug("✅ InvoiceData created successfully")
                 
                 # Validate it can be serialized to JSON (common issue)
                 import json
                 try:
                     json.dumps(invoice_data.model_dump(), default=str)
-                    logger.info(f"✅ InvoiceData is JSON-serializable")
+                    logger.debug("✅ InvoiceData is JSON-serializable")
                 except Exception as json_err:
-                    logger.warning(f"⚠️ InvoiceData cannot be JSON-serialized: {json_err}")
+                    logger.warning("⚠️ InvoiceData cannot be JSON-serialized: %s", json_err)
                     
             except Exception as e:
-                logger.error(f"❌ Failed to create InvoiceData: {e}")
-                logger.error(f"   extraction_dict: {extraction_dict}")
+                logger.error("❌ Failed to create InvoiceData: %s", e)
+                logger.debug("   extraction_dict: %s", extraction_dict)
                 raise
             
             # ===== RUN VALIDATION RULES =====
-            logger.info(f"🔍 Running validation rules [plan={plan_id}]")
+            logger.debug("🔍 Running validation rules [plan=%s]", plan_id)
             validator = InvoiceValidator(invoice_data)
             validation_result = validator.validate()
             
             # Log validation results
             if validation_result['has_errors']:
-                logger.warning(f"⚠️ Validation found {len(validation_result['errors'])} errors")
+                logger.warning("⚠️ Validation found %d errors", len(validation_result['errors']))
                 for error in validation_result['errors']:
-                    logger.warning(f"   ERROR: {error}")
+                    logger.warning("   ERROR: %s", error)
             
             if validation_result['has_warnings']:
-                logger.info(f"ℹ️ Validation found {len(validation_result['warnings'])} warnings")
+                logger.info("ℹ️ Validation found %d warnings", len(validation_result['warnings']))
                 for warning in validation_result['warnings']:
-                    logger.info(f"   WARNING: {warning}")
+                    logger.debug("   WARNING: %s", warning)
             
             if validation_result['info']:
-                logger.info(f"ℹ️ Validation found {len(validation_result['info'])} info messages")
+                logger.debug("ℹ️ Validation found %d info messages", len(validation_result['info']))
                 for info in validation_result['info']:
-                    logger.info(f"   INFO: {info}")
+                    logger.debug("   INFO: %s", info)
             
             # Combine all validation messages
             all_validation_messages = (
@@ -435,10 +418,11 @@ class LangExtractService:
             
             extraction_time = time.time() - start_time
             logger.info(
-                f"{'✅' if success else '❌'} Extraction complete in {extraction_time:.2f}s "
-                f"[plan={plan_id}, errors={len(validation_result['errors'])}, "
-                f"warnings={len(validation_result['warnings'])}, "
-                f"info={len(validation_result['info'])}]"
+                "%s Extraction complete in %.2fs [plan=%s, errors=%d, warnings=%d, info=%d]",
+                '✅' if success else '❌', extraction_time, plan_id,
+                len(validation_result['errors']), len(validation_result['warnings']),
+                len(validation_result['info']),
+                extra={"plan_id": plan_id, "extraction_time": extraction_time}
             )
             
             # IMPORTANT: Return invoice_data even if validation fails
@@ -455,13 +439,11 @@ class LangExtractService:
             extraction_time = time.time() - start_time
             
             # Detailed error logging
-            logger.error(f"❌ Extraction failed: {type(e).__name__}: {e} [plan={plan_id}]")
-            logger.error(f"   Invoice length: {len(invoice_text)} chars")
-            logger.error(f"   Model: {cls._model_name}")
-            
-            # Log full traceback for debugging
-            import traceback
-            logger.error(f"   Traceback:\n{traceback.format_exc()}")
+            logger.error(
+                "❌ Extraction failed: %s: %s [plan=%s, invoice_length=%d chars, model=%s]",
+                type(e).__name__, e, plan_id, len(invoice_text) if invoice_text else 0, cls._model_name,
+                exc_info=True
+            )
             
             # User-friendly error message
             error_msg = str(e)
@@ -490,14 +472,24 @@ class LangExtractService:
     ) -> ExtractionResult:
         """
         Async wrapper around sync extraction.
-        Just runs sync version in thread pool.
+        Runs sync version in thread pool within the extraction stage deadline.
         """
         import asyncio
-        return await asyncio.to_thread(
-            cls.extract_invoice_data_sync,
-            invoice_text,
-            plan_id
-        )
+        try:
+            return await run_with_deadline(
+                EXTRACTION_STAGE,
+                asyncio.to_thread(cls.extract_invoice_data_sync, invoice_text, plan_id)
+            )
+        except DeadlineExceededError as e:
+            # The extraction thread can't be interrupted; its result is discarded
+            logger.error("❌ Extraction abandoned after %.0fs deadline [plan=%s]", e.timeout, plan_id)
+            return ExtractionResult(
+                success=False,
+                invoice_data=None,
+                validation_errors=[f"Extraction timed out after {e.timeout:.0f}s. The invoice may be too complex."],
+                extraction_time=e.timeout,
+                model_used=cls._model_name or "unknown"
+            )
     
     @classmethod
     def format_extraction_result(cls, result: ExtractionResult) -> str:
@@ -1,6 +1,7 @@
 """LLM service for managing AI model interactions."""
 import logging
 import os
+import re
 import asyncio
 from typing import Optional
 from datetime import datetime
@@ -9,9 +10,22 @@ from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 
+from app.services.deadlines import remaining
+
 logger = logging.getLogger(__name__)
 
 
+# Redaction patterns, compiled once at import (sanitize_for_logging runs on hot paths)
+_REDACTION_PATTERNS = (
+    # OpenAI API keys (sk-...)
+    (re.compile(r'sk-[a-zA-Z0-9]{20,}'), '[OPENAI_KEY_REDACTED]'),
+    # Anthropic API keys (sk-ant-...)
+    (re.compile(r'sk-ant-[a-zA-Z0-9]{20,}'), '[ANTHROPIC_KEY_REDACTED]'),
+    # Generic API keys
+    (re.compile(r'api[_-]?key["\']?\s*[:=]\s*["\']?[a-zA-Z0-9]{20,}', re.IGNORECASE), 'api_key=[REDACTED]'),
+)
+
+
 def sanitize_for_logging(text: str) -> str:
     """
     Sanitize text for logging by removing API keys and sensitive data.
@@ -22,16 +36,8 @@ def sanitize_for_logging(text: str) -> str:
     Returns:
         str: Sanitized text safe for logging
     """
-    import re
-    
-    # Remove OpenAI API keys (sk-...)
-    text = re.sub(r'sk-[a-zA-Z0-9]{20,}', '[OPENAI_KEY_REDACTED]', text)
-    
-    # Remove Anthropic API keys (sk-ant-...)
-    text = re.sub(r'sk-ant-[a-zA-Z0-9]{20,}', '[ANTHROPIC_KEY_REDACTED]', text)
-    
-    # Remove generic API keys
-    text = re.sub(r'api[_-]?key["\']?\s*[:=]\s*["\']?[a-zA-Z0-9]{20,}', 'api_key=[REDACTED]', text, flags=re.IGNORECASE)
+    for pattern, replacement in _REDACTION_PATTERNS:
+        text = pattern.sub(replacement, text)
     
     return text
 
@@ -169,7 +175,7 @@ class LLMService:
         is_mock = use_mock in ("true", "1", "yes")
         
         if is_mock:
-            logger.info("🎭 Mock mode is ENABLED - using dummy responses")
+            logger.debug("🎭 Mock mode is ENABLED - using dummy responses")
         
         return is_mock
     
@@ -186,8 +192,8 @@ class LLMService:
             str: Mock response appropriate for the agent
         """
         logger.info(
-            f"🎭 Mock mode: Generating mock response for {agent_name} agent "
-            f"(task_length={len(task)} chars)"
+            "🎭 Mock mode: Generating mock response for %s agent (task_length=%d chars)",
+            agent_name, len(task)
         )
         
         mock_responses = {
@@ -284,17 +290,18 @@ class LLMService:
     ) -> str:
         """Internal method for LLM streaming call with error handling."""
         logger.info(
-            f"🤖 {agent_name} Agent calling LLM (streaming mode) "
-            f"[plan_id={plan_id}]"
+            "🤖 %s Agent calling LLM (streaming mode) [plan_id=%s]",
+            agent_name, plan_id,
+            extra={"plan_id": plan_id, "agent": agent_name}
         )
         
-        # Truncate and sanitize prompt for logging (max 200 chars)
-        prompt_preview = prompt[:200] + "..." if len(prompt) > 200 else prompt
-        prompt_preview = sanitize_for_logging(prompt_preview)
-        logger.debug(
-            f"Prompt ({len(prompt)} chars) [plan_id={plan_id}, agent={agent_name}]: "
-            f"{prompt_preview}"
-        )
+        # Truncate and sanitize prompt for logging (max 200 chars) - only if it will be logged
+        if logger.isEnabledFor(logging.DEBUG):
+            prompt_preview = prompt[:200] + "..." if len(prompt) > 200 else prompt
+            logger.debug(
+                "Prompt (%d chars) [plan_id=%s, agent=%s]: %s",
+                len(prompt), plan_id, agent_name, sanitize_for_logging(prompt_preview)
+            )
         
         # Get LLM instance
         try:
@@ -314,13 +321,12 @@ class LLMService:
         
         try:
             # Collect full response
-            full_response = ""
+            response_chunks = []
             start_time = asyncio.get_event_loop().time()
             timeout = cls._get_timeout()
             
             # Stream the response with timeout
             async def stream_with_timeout():
-                nonlocal full_response
                 async for chunk in llm.astream([HumanMessage(content=prompt)]):
                     # Extract content from chunk
                     if hasattr(chunk, 'content'):
@@ -329,7 +335,12 @@ class LLMService:
                         token = str(chunk)
                     
                     if token:
-                        full_response += token
+                        response_chunks.append(token)
+                        logger.debug(
+                            "Token %d for %s Agent [plan_id=%s]",
+                            len(response_chunks), agent_name, plan_id,
+                            extra={"category": "llm.token", "plan_id": plan_id, "agent": agent_name}
+                        )
                         
                         # Send token via WebSocket
                         await websocket_manager.send_message(plan_id, {
@@ -343,10 +354,10 @@ class LLMService:
             try:
                 await asyncio.wait_for(stream_with_timeout(), timeout=timeout)
             except asyncio.TimeoutError:
-                error_msg = f"LLM call timed out after {timeout}s"
+                error_msg = f"LLM call timed out after {timeout:.0f}s"
                 logger.error(
                     f"❌ {error_msg} [plan_id={plan_id}, agent={agent_name}, "
-                    f"timeout={timeout}s]"
+                    f"timeout={timeout:.1f}s]"
                 )
                 
                 # Send error via WebSocket
@@ -363,6 +374,7 @@ class LLMService:
             
             # Calculate completion time
             completion_time = asyncio.get_event_loop().time() - start_time
+            full_response = "".join(response_chunks)
             
             # Send stream end message
             await websocket_manager.send_message(plan_id, {
@@ -373,9 +385,9 @@ class LLMService:
             })
             
             logger.info(
-                f"✅ {agent_name} Agent LLM call completed "
-                f"[plan_id={plan_id}, duration={completion_time:.2f}s, "
-                f"response_length={len(full_response)} chars]"
+                "✅ %s Agent LLM call completed [plan_id=%s, duration=%.2fs, response_length=%d chars]",
+                agent_name, plan_id, completion_time, len(full_response),
+                extra={"plan_id": plan_id, "agent": agent_name, "tokens": len(response_chunks)}
             )
             
             return full_response
@@ -467,9 +479,9 @@ class LLMService:
                 raise LLMError(error_msg) from e
     
     @classmethod
-    def _get_timeout(cls) -> int:
-        """Get configured timeout value."""
-        return int(os.getenv("LLM_TIMEOUT", "60"))
+    def _get_timeout(cls) -> float:
+        """Get the call timeout: LLM_TIMEOUT, capped by the enclosing stage deadline."""
+        return remaining(default=float(os.getenv("LLM_TIMEOUT", "60")))
     
     @classmethod
     def reset(cls):
@@ -0,0 +1,104 @@
+"""Wire encodings for real-time messages sent to WebSocket clients."""
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON_ENCODING = "json"
+MSGPACK_ENCODING = "msgpack"
+DEFAULT_ENCODING = JSON_ENCODING
+SUPPORTED_ENCODINGS = (JSON_ENCODING, MSGPACK_ENCODING)
+
+
+def is_msgpack_available() -> bool:
+    """Check if the optional msgpack package is installed."""
+    return msgpack is not None
+
+
+def resolve_encoding(requested: Optional[str]) -> str:
+    """
+    Resolve the encoding a client asked for to one we can actually serve.
+
+    Unknown values, or msgpack without the package installed, fall back
+    to JSON so that older clients keep working.
+
+    Args:
+        requested: Encoding name from the connection query string
+
+    Returns:
+        str: Negotiated encoding name
+    """
+    encoding = (requested or DEFAULT_ENCODING).strip().lower()
+
+    if encoding not in SUPPORTED_ENCODINGS:
+        logger.warning(f"Unsupported WebSocket encoding '{requested}', using {DEFAULT_ENCODING}")
+        return DEFAULT_ENCODING
+
+    if encoding == MSGPACK_ENCODING and not is_msgpack_available():
+        logger.warning(
+            "msgpack encoding requested but msgpack is not installed. "
+            "Install with: pip install msgpack"
+        )
+        return DEFAULT_ENCODING
+
+    return encoding
+
+
+def _default(value: Any) -> Any:
+    """Convert values that neither JSON nor MessagePack handle natively."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def encode_message(message: Dict[str, Any], encoding: str = DEFAULT_ENCODING) -> Union[str, bytes]:
+    """
+    Serialize a message for the wire.
+
+    JSON produces a compact text frame (same shape as ``send_json``);
+    MessagePack produces a binary frame.
+
+    Args:
+        message: Message dict
+        encoding: Negotiated encoding name
+
+    Returns:
+        str for text frames, bytes for binary frames
+    """
+    if encoding == MSGPACK_ENCODING:
+        return msgpack.packb(message, default=_default, use_bin_type=True)
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+def decode_message(payload: Union[str, bytes]) -> Dict[str, Any]:
+    """
+    Parse a frame received from a client.
+
+    Text frames are always JSON; binary frames are MessagePack.
+
+    Args:
+        payload: Raw frame payload
+
+    Returns:
+        Decoded message dict
+
+    Raises:
+        ValueError: If the payload cannot be decoded
+    """
+    if isinstance(payload, (bytes, bytearray)):
+        if not is_msgpack_available():
+            raise ValueError("Binary frame received but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
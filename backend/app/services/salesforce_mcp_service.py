@@ -6,6 +6,8 @@ import os
 import subprocess
 from typing import Dict, Any, List, Optional
 
+from app.services.deadlines import DeadlineExceededError, EXTERNAL_API_STAGE, run_with_deadline
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,7 +66,14 @@ class SalesforceMCPService:
                 stderr=asyncio.subprocess.PIPE
             )
             
-            stdout, stderr = await process.communicate()
+            try:
+                stdout, stderr = await run_with_deadline(EXTERNAL_API_STAGE, process.communicate())
+            except (DeadlineExceededError, asyncio.CancelledError):
+                # Don't leave the CLI running after we stop waiting for it
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
             
             if process.returncode == 0:
                 return json.loads(stdout.decode())
@@ -1,21 +1,77 @@
 """WebSocket connection management service."""
+import asyncio
 import logging
-from typing import Dict, Set, List
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Set, List, Union, Optional, Any, Deque, Tuple
 from fastapi import WebSocket
 
+from app.services.message_codec import DEFAULT_ENCODING, encode_message
+
 logger = logging.getLogger(__name__)
 
 
+class StreamSubscriber:
+    """A Server-Sent Events listener for one plan."""
+    
+    def __init__(self, plan_id: str, max_queue: int):
+        self.plan_id = plan_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        # Set when the listener falls too far behind; it must reconnect and
+        # resume from history with Last-Event-ID
+        self.overflowed = False
+
+
 class WebSocketManager:
     """Manages WebSocket connections for real-time updates."""
     
     def __init__(self):
         # Store active connections: {plan_id: {websocket1, websocket2, ...}}
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        # Wire encoding negotiated by each connection (json | msgpack)
+        self.connection_encodings: Dict[WebSocket, str] = {}
         # Buffer messages for plans without active connections
         self.message_buffer: Dict[str, List[dict]] = {}
+        
+        # Heartbeat configuration (seconds)
+        self.heartbeat_interval = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+        self.heartbeat_timeout = float(os.getenv("WS_HEARTBEAT_TIMEOUT", "60"))
+        self.send_timeout = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+        # Monotonic time of the last frame received from each connection
+        self.last_seen: Dict[WebSocket, float] = {}
+        # Connections that answer heartbeats (or ping on their own) and can be
+        # reaped for silence; others rely on protocol-level pings and send failures
+        self.heartbeat_clients: Set[WebSocket] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # Acknowledged delivery: connections that opted in with ?ack=true
+        self.ack_clients: Set[WebSocket] = set()
+        # Futures waiting on client acks: {message_id: future}
+        self.pending_acks: Dict[str, asyncio.Future] = {}
+        self.ack_timeout = float(os.getenv("WS_ACK_TIMEOUT", "5"))
+        # Event log shared with Server-Sent Events streams:
+        # {plan_id: deque[(event_id, message)]}, least recently used plans evicted first
+        self.event_history: "OrderedDict[str, Deque[Tuple[int, dict]]]" = OrderedDict()
+        self.event_sequence: Dict[str, int] = {}
+        self.stream_subscribers: Dict[str, Set[StreamSubscriber]] = {}
+        self.event_history_size = int(os.getenv("SSE_HISTORY_SIZE", "500"))
+        self.event_history_plans = int(os.getenv("SSE_HISTORY_PLANS", "1000"))
+        self.stream_queue_size = int(os.getenv("SSE_QUEUE_SIZE", "1000"))
+        # Counters for connection gauges
+        self.reaped_total = 0
+        self.send_failures_total = 0
+        self.ack_timeouts_total = 0
     
-    async def connect(self, websocket: WebSocket, plan_id: str, user_id: str):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        plan_id: str,
+        user_id: str,
+        encoding: str = DEFAULT_ENCODING,
+        ack: bool = False
+    ):
         """Accept and register a new WebSocket connection."""
         await websocket.accept()
         
@@ -23,7 +79,11 @@ class WebSocketManager:
             self.active_connections[plan_id] = set()
         
         self.active_connections[plan_id].add(websocket)
-        logger.info(f"WebSocket connected for plan {plan_id}, user {user_id}")
+        self.connection_encodings[websocket] = encoding
+        self.last_seen[websocket] = time.monotonic()
+        if ack:
+            self.ack_clients.add(websocket)
+        logger.info(f"WebSocket connected for plan {plan_id}, user {user_id}, encoding {encoding}, ack {ack}")
         logger.info(f"Active connections for plan {plan_id}: {len(self.active_connections[plan_id])}")
         
         # Send any buffered messages
@@ -31,7 +91,7 @@ class WebSocketManager:
             logger.info(f"Sending {len(self.message_buffer[plan_id])} buffered messages for plan {plan_id}")
             for message in self.message_buffer[plan_id]:
                 try:
-                    await websocket.send_json(message)
+                    await self._send_payload(websocket, encode_message(message, encoding))
                 except Exception as e:
                     logger.error(f"Error sending buffered message: {e}")
             # Clear buffer after sending
@@ -39,6 +99,11 @@ class WebSocketManager:
     
     def disconnect(self, websocket: WebSocket, plan_id: str):
         """Remove a WebSocket connection."""
+        self.connection_encodings.pop(websocket, None)
+        self.last_seen.pop(websocket, None)
+        self.heartbeat_clients.discard(websocket)
+        self.ack_clients.discard(websocket)
+        
         if plan_id in self.active_connections:
             self.active_connections[plan_id].discard(websocket)
             
@@ -48,40 +113,299 @@ class WebSocketManager:
             
             logger.info(f"WebSocket disconnected for plan {plan_id}")
     
+    def mark_alive(self, websocket: WebSocket, heartbeat: bool = False):
+        """
+        Record that a frame was received from a connection.
+        
+        Args:
+            websocket: Connection that sent the frame
+            heartbeat: True if the frame was part of the heartbeat protocol
+                (heartbeat_ack, ping or pong)
+        """
+        if websocket in self.connection_encodings:
+            self.last_seen[websocket] = time.monotonic()
+            if heartbeat:
+                self.heartbeat_clients.add(websocket)
+    
+    async def _send_payload(self, websocket: WebSocket, payload: Union[str, bytes]):
+        """Send an already-encoded payload as a text or binary frame, bounded by the send timeout."""
+        if isinstance(payload, bytes):
+            send = websocket.send_bytes(payload)
+        else:
+            send = websocket.send_text(payload)
+        await asyncio.wait_for(send, timeout=self.send_timeout)
+    
+    async def send_personal_message(self, websocket: WebSocket, message: dict):
+        """Send a message to a single connection using its negotiated encoding."""
+        encoding = self.connection_encodings.get(websocket, DEFAULT_ENCODING)
+        await self._send_payload(websocket, encode_message(message, encoding))
+    
+    def _publish_event(self, plan_id: str, message: dict) -> int:
+        """Assign the next event ID, record the message in history and fan it out to SSE listeners."""
+        event_id = self.event_sequence.get(plan_id, 0) + 1
+        self.event_sequence[plan_id] = event_id
+        
+        history = self.event_history.get(plan_id)
+        if history is None:
+            history = deque(maxlen=self.event_history_size)
+            self.event_history[plan_id] = history
+        self.event_history.move_to_end(plan_id)
+        history.append((event_id, message))
+        
+        # Bound memory across plans: drop history for the least recently active ones
+        while len(self.event_history) > self.event_history_plans:
+            evicted_plan, _ = self.event_history.popitem(last=False)
+            if evicted_plan not in self.stream_subscribers:
+                self.event_sequence.pop(evicted_plan, None)
+        
+        for subscriber in list(self.stream_subscribers.get(plan_id, ())):
+            try:
+                subscriber.queue.put_nowait((event_id, message))
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                logger.warning(f"⚠️ SSE listener for plan {plan_id} fell behind, closing stream")
+        
+        return event_id
+    
+    def subscribe_stream(self, plan_id: str, last_event_id: Optional[int] = None) -> Tuple[StreamSubscriber, List[Tuple[int, dict]]]:
+        """
+        Register a Server-Sent Events listener for a plan.
+        
+        Args:
+            plan_id: Plan identifier
+            last_event_id: Last event the client saw (from Last-Event-ID), if resuming
+            
+        Returns:
+            (subscriber, backlog) where backlog holds the events to replay first
+        """
+        subscriber = StreamSubscriber(plan_id, self.stream_queue_size)
+        self.stream_subscribers.setdefault(plan_id, set()).add(subscriber)
+        
+        history = list(self.event_history.get(plan_id, ()))
+        current = self.event_sequence.get(plan_id, 0)
+        if last_event_id is None or last_event_id > current:
+            # New listener, or the sequence restarted since the client last saw it
+            backlog = history
+        else:
+            backlog = [(event_id, message) for event_id, message in history if event_id > last_event_id]
+        
+        logger.info(
+            f"SSE stream opened for plan {plan_id} "
+            f"(last_event_id={last_event_id}, replaying {len(backlog)} events)"
+        )
+        return subscriber, backlog
+    
+    def unsubscribe_stream(self, subscriber: StreamSubscriber):
+        """Remove a Server-Sent Events listener."""
+        subscribers = self.stream_subscribers.get(subscriber.plan_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.stream_subscribers[subscriber.plan_id]
+        logger.info(f"SSE stream closed for plan {subscriber.plan_id}")
+    
     async def send_message(self, plan_id: str, message: dict):
         """Send a message to all connections for a specific plan."""
         msg_type = message.get("type", "unknown")
-        logger.info(f"📨 send_message called: plan_id={plan_id}, type={msg_type}")
         
-        if plan_id not in self.active_connections or not self.active_connections[plan_id]:
+        # Every message is also an event for SSE listeners
+        self._publish_event(plan_id, message)
+        
+        connections = self.active_connections.get(plan_id)
+        if not connections:
             # No active connections - buffer the message
-            logger.warning(f"⚠️ No active connections for plan {plan_id}, buffering {msg_type} message")
-            logger.warning(f"⚠️ Active connections: {list(self.active_connections.keys())}")
-            if plan_id not in self.message_buffer:
-                self.message_buffer[plan_id] = []
-            self.message_buffer[plan_id].append(message)
-            logger.warning(f"⚠️ Buffered {len(self.message_buffer[plan_id])} messages for plan {plan_id}")
+            buffer = self.message_buffer.setdefault(plan_id, [])
+            buffer.append(message)
+            logger.debug(
+                "⚠️ No active connections for plan %s, buffered %s message (%d buffered)",
+                plan_id, msg_type, len(buffer),
+                extra={"category": "ws.send", "plan_id": plan_id, "msg_type": msg_type}
+            )
             return
         
-        logger.info(f"✅ Sending {msg_type} to {len(self.active_connections[plan_id])} connection(s)")
+        logger.debug(
+            "📨 Sending %s to %d connection(s) for plan %s",
+            msg_type, len(connections), plan_id,
+            extra={"category": "ws.send", "plan_id": plan_id, "msg_type": msg_type}
+        )
         disconnected = set()
+        # Serialize once per encoding rather than once per connection
+        encoded: Dict[str, Union[str, bytes]] = {}
         
-        for connection in self.active_connections[plan_id]:
+        for connection in list(connections):
+            encoding = self.connection_encodings.get(connection, DEFAULT_ENCODING)
             try:
-                await connection.send_json(message)
-                logger.info(f"✅ Sent {msg_type} successfully")
+                if encoding not in encoded:
+                    encoded[encoding] = encode_message(message, encoding)
+                await self._send_payload(connection, encoded[encoding])
             except Exception as e:
-                logger.error(f"❌ Error sending message: {e}")
+                logger.error("❌ Error sending %s to plan %s: %r", msg_type, plan_id, e)
+                self.send_failures_total += 1
                 disconnected.add(connection)
         
         # Clean up disconnected connections
         for connection in disconnected:
-            self.disconnect(connection, plan_id)
+            await self._reap(connection, plan_id, reason="send failed")
+    
+    async def send_message_with_ack(self, plan_id: str, message: dict, timeout: Optional[float] = None) -> bool:
+        """
+        Send a critical message and wait for a client to acknowledge it.
+        
+        The message gets a ``message_id`` and ``requires_ack`` flag. If no
+        ack-capable client is connected, the message goes through the normal
+        send/buffer path and this returns immediately. If no ack arrives in
+        time, the message is put back in the buffer so it is replayed on the
+        next connect (clients dedupe by ``message_id``).
+        
+        Args:
+            plan_id: Plan identifier
+            message: Message dict (modified in place with message_id/requires_ack)
+            timeout: Seconds to wait for the ack (default WS_ACK_TIMEOUT)
+            
+        Returns:
+            bool: True if a client acknowledged the message
+        """
+        message_id = message.setdefault("message_id", str(uuid.uuid4()))
+        message["requires_ack"] = True
+        
+        ack_connections = self.active_connections.get(plan_id, set()) & self.ack_clients
+        if not ack_connections:
+            await self.send_message(plan_id, message)
+            return False
+        
+        future = asyncio.get_running_loop().create_future()
+        self.pending_acks[message_id] = future
+        try:
+            await self.send_message(plan_id, message)
+            await asyncio.wait_for(future, timeout=timeout or self.ack_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.ack_timeouts_total += 1
+            logger.warning(
+                f"⚠️ No ack for {message.get('type')} {message_id} on plan {plan_id}, "
+                f"buffering for redelivery"
+            )
+            self.message_buffer.setdefault(plan_id, []).append(message)
+            return False
+        finally:
+            self.pending_acks.pop(message_id, None)
+    
+    def acknowledge(self, message_id: str) -> bool:
+        """
+        Resolve a pending ack.
+        
+        Args:
+            message_id: ID of the acknowledged message
+            
+        Returns:
+            bool: True if a sender was waiting on this ack
+        """
+        future = self.pending_acks.get(message_id)
+        if future and not future.done():
+            future.set_result(True)
+            return True
+        return False
     
     async def broadcast(self, message: dict):
         """Broadcast a message to all active connections."""
         for plan_id in list(self.active_connections.keys()):
             await self.send_message(plan_id, message)
+    
+    async def _reap(self, websocket: WebSocket, plan_id: str, reason: str):
+        """Drop a dead connection and close it without waiting on the peer."""
+        if websocket not in self.connection_encodings:
+            return
+        
+        self.disconnect(websocket, plan_id)
+        self.reaped_total += 1
+        logger.info(f"Reaped WebSocket for plan {plan_id} ({reason})")
+        
+        try:
+            await asyncio.wait_for(websocket.close(code=1001), timeout=self.send_timeout)
+        except Exception:
+            # Peer is already gone - nothing else to do
+            pass
+    
+    async def _heartbeat_once(self):
+        """Send one heartbeat round and reap connections that are dead or silent."""
+        now = time.monotonic()
+        heartbeat = {
+            "type": "heartbeat",
+            "timestamp": datetime.utcnow().isoformat() + "Z"
+        }
+        
+        for plan_id, connections in list(self.active_connections.items()):
+            for connection in list(connections):
+                idle = now - self.last_seen.get(connection, now)
+                if connection in self.heartbeat_clients and idle > self.heartbeat_timeout:
+                    await self._reap(connection, plan_id, reason=f"no heartbeat for {idle:.0f}s")
+                    continue
+                
+                try:
+                    await self.send_personal_message(connection, heartbeat)
+                except Exception as e:
+                    self.send_failures_total += 1
+                    await self._reap(connection, plan_id, reason=f"heartbeat failed: {e!r}")
+    
+    async def _heartbeat_loop(self):
+        """Run heartbeat rounds until cancelled."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._heartbeat_once()
+            except Exception as e:
+                logger.error(f"WebSocket heartbeat round failed: {e}")
+    
+    def start_heartbeat(self):
+        """Start the background heartbeat/reaper task (call from app startup)."""
+        if self.heartbeat_interval <= 0:
+            logger.info("WebSocket heartbeat disabled (WS_HEARTBEAT_INTERVAL<=0)")
+            return
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+            logger.info(
+                f"WebSocket heartbeat started (interval={self.heartbeat_interval}s, "
+                f"timeout={self.heartbeat_timeout}s)"
+            )
+    
+    async def stop_heartbeat(self):
+        """Stop the background heartbeat/reaper task (call from app shutdown)."""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get connection gauges for monitoring.
+        
+        Returns:
+            dict with total and per-plan connection counts, buffered message
+            counts and reaping/send-failure counters
+        """
+        return {
+            "total_connections": sum(len(c) for c in self.active_connections.values()),
+            "connections_per_plan": {
+                plan_id: len(connections) for plan_id, connections in self.active_connections.items()
+            },
+            "heartbeat_clients": len(self.heartbeat_clients),
+            "stream_subscribers_per_plan": {
+                plan_id: len(subscribers) for plan_id, subscribers in self.stream_subscribers.items()
+            },
+            "buffered_messages_per_plan": {
+                plan_id: len(messages) for plan_id, messages in self.message_buffer.items()
+            },
+            "ack_clients": len(self.ack_clients),
+            "pending_acks": len(self.pending_acks),
+            "reaped_total": self.reaped_total,
+            "send_failures_total": self.send_failures_total,
+            "ack_timeouts_total": self.ack_timeouts_total,
+            "heartbeat_interval": self.heartbeat_interval,
+            "heartbeat_timeout": self.heartbeat_timeout
+        }
 
 
 # Global WebSocket manager instance
@@ -1,10 +1,13 @@
 """Zoho Invoice MCP client service for interacting with Zoho Invoice data."""
+import asyncio
 import logging
 import os
 import requests
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
+from app.services.deadlines import DeadlineExceededError, EXTERNAL_API_STAGE, require_remaining, run_with_deadline
+
 logger = logging.getLogger(__name__)
 
 
@@ -88,7 +91,11 @@ class ZohoMCPService:
                 'refresh_token': self.refresh_token
             }
             
-            response = requests.post(token_url, data=payload, timeout=10)
+            # requests is blocking; run it off the event loop so parallel agents keep running
+            response = await run_with_deadline(
+                EXTERNAL_API_STAGE,
+                asyncio.to_thread(requests.post, token_url, data=payload, timeout=require_remaining(EXTERNAL_API_STAGE, 10))
+            )
             response.raise_for_status()
             
             data = response.json()
@@ -99,13 +106,20 @@ class ZohoMCPService:
             logger.info("Access token refreshed successfully")
             return self._access_token
             
+        except DeadlineExceededError:
+            # Out of time rather than unauthorized; let the request report it
+            raise
         except Exception as e:
             logger.error(f"Failed to refresh access token: {e}")
             return None
     
     async def _make_api_request(self, endpoint: str, method: str = 'GET', params: Dict = None, data: Dict = None) -> Dict[str, Any]:
         """Make authenticated API request to Zoho Invoice."""
-        access_token = await self._get_access_token()
+        try:
+            access_token = await self._get_access_token()
+        except DeadlineExceededError as e:
+            logger.error(f"API request not sent: {e}")
+            return {"success": False, "error": str(e)}
         if not access_token:
             return {"success": False, "error": "No valid access token"}
         
@@ -116,14 +130,16 @@ class ZohoMCPService:
         }
         
         try:
+            timeout = require_remaining(EXTERNAL_API_STAGE, 10)
             if method == 'GET':
-                response = requests.get(url, headers=headers, params=params, timeout=10)
+                request = asyncio.to_thread(requests.get, url, headers=headers, params=params, timeout=timeout)
             elif method == 'POST':
-                response = requests.post(url, headers=headers, json=data, timeout=10)
+                request = asyncio.to_thread(requests.post, url, headers=headers, json=data, timeout=timeout)
             elif method == 'PUT':
-                response = requests.put(url, headers=headers, json=data, timeout=10)
+                request = asyncio.to_thread(requests.put, url, headers=headers, json=data, timeout=timeout)
             else:
                 return {"success": False, "error": f"Unsupported method: {method}"}
+            response = await run_with_deadline(EXTERNAL_API_STAGE, request)
             
             response.raise_for_status()
             result = response.json()
@@ -0,0 +1,109 @@
+"""Benchmark logging overhead on the WebSocket send hot path.
+
+Compares the per-message cost of WebSocketManager.send_message with:
+  - legacy: three INFO f-string lines per message written synchronously
+  - configured: configure_logging() defaults (lazy DEBUG, sampling, queue handler)
+  - disabled: logging turned off entirely
+
+Log output goes to a temp file so terminal speed doesn't skew the numbers.
+
+Usage:
+    python benchmark_logging.py [--messages 20000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config.logging_config import TEXT_FORMAT, configure_logging, shutdown_logging
+from app.services.websocket_service import WebSocketManager
+
+legacy_logger = logging.getLogger("app.services.websocket_service")
+
+
+class NullWebSocket:
+    """Stand-in client that accepts frames without doing any I/O."""
+
+    async def send_text(self, data: str):
+        pass
+
+    async def send_bytes(self, data: bytes):
+        pass
+
+
+async def _run(manager: WebSocketManager, plan_id: str, messages: int, legacy: bool) -> float:
+    start = time.perf_counter()
+    for i in range(messages):
+        message = {"type": "agent_message_streaming", "agent": "Invoice", "content": f"token{i} ", "plan_id": plan_id}
+        if legacy:
+            # What send_message logged per message before lazy/sampled logging
+            msg_type = message["type"]
+            legacy_logger.info(f"📨 send_message called: plan_id={plan_id}, type={msg_type}")
+            legacy_logger.info(f"✅ Sending {msg_type} to {len(manager.active_connections[plan_id])} connection(s)")
+            legacy_logger.info(f"✅ Sent {msg_type} successfully")
+        await manager.send_message(plan_id, message)
+    return time.perf_counter() - start
+
+
+def measure(mode: str, messages: int, log_path: str) -> float:
+    """Return microseconds per message for a logging mode."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.disable(logging.NOTSET)
+
+    if mode == "legacy":
+        handler = logging.FileHandler(log_path)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    elif mode == "configured":
+        configure_logging()
+        # Point the listener's stream handler at the temp file
+        from app.config import logging_config
+        for handler in logging_config._listener.handlers:
+            handler.setStream(open(log_path, "a"))
+    else:
+        logging.disable(logging.CRITICAL)
+
+    manager = WebSocketManager()
+    plan_id = "benchmark-plan"
+    manager.active_connections[plan_id] = {NullWebSocket()}
+
+    elapsed = asyncio.run(_run(manager, plan_id, messages, legacy=(mode == "legacy")))
+    shutdown_logging()
+    return elapsed * 1_000_000 / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000, help="Messages to send per mode")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("LOGGING OVERHEAD BENCHMARK")
+    print(f"{args.messages} streamed messages per mode")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        print(f"\n{'mode':<14}{'us/message':>14}{'log bytes':>14}")
+        for mode in ("legacy", "configured", "disabled"):
+            log_path = os.path.join(tmp, f"{mode}.log")
+            open(log_path, "w").close()
+            results[mode] = measure(mode, args.messages, log_path)
+            print(f"{mode:<14}{results[mode]:>14.2f}{os.path.getsize(log_path):>14,}")
+
+    baseline = results["disabled"]
+    print(f"\nLogging overhead per message: legacy {results['legacy'] - baseline:.2f}us, "
+          f"configured {results['configured'] - baseline:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
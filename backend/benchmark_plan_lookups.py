@@ -0,0 +1,173 @@
+"""Benchmark plan, message and extraction lookups with and without the index registry.
+
+Seeds a scratch database with --plans plans (one message each, an
+extraction for every tenth plan, five plans per session), then times the
+repository lookups the API makes:
+  - plan by id            PlanRepository.get_by_id
+  - session plans         PlanRepository.get_page(session_id)
+  - plan messages         MessageRepository.get_by_plan_id
+  - plan extraction       InvoiceExtractionRepository.get_extraction
+
+Each lookup is timed with only the _id index (collection scans), then again
+after ensure_indexes() applies the registry. Needs a running MongoDB
+(MONGODB_URL); the scratch database is dropped afterwards unless --keep.
+
+Usage:
+    python benchmark_plan_lookups.py [--plans 1000000] [--lookups 200] [--scan-lookups 10]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.db.indexes import INDEX_REGISTRY, ensure_indexes
+from app.db.mongodb import MongoDB
+from app.db.repositories import InvoiceExtractionRepository, MessageRepository, PlanRepository
+
+SEED_BATCH = 10_000
+PLANS_PER_SESSION = 5
+
+
+async def seed(plans: int) -> list:
+    """Insert the benchmark data; returns the plan ids."""
+    db = MongoDB.get_database()
+    plan_ids = []
+    start = datetime.utcnow() - timedelta(days=365)
+
+    for offset in range(0, plans, SEED_BATCH):
+        plan_docs, message_docs, extraction_docs = [], [], []
+        for i in range(offset, min(offset + SEED_BATCH, plans)):
+            plan_id = str(uuid.uuid4())
+            created_at = start + timedelta(seconds=i * 30)
+            plan_ids.append(plan_id)
+            plan_docs.append({
+                "plan_id": plan_id,
+                "session_id": f"session-{i // PLANS_PER_SESSION}",
+                "user_id": "default_user",
+                "description": f"Process invoice INV-{i:07d}",
+                "status": random.choice(["completed", "completed", "completed", "rejected", "pending_approval"]),
+                "steps": [],
+                "agent_progress": [{"agent_name": "Planner", "status": "planning completed", "timestamp": created_at}],
+                "created_at": created_at,
+                "updated_at": created_at
+            })
+            message_docs.append({
+                "plan_id": plan_id,
+                "agent_name": "Invoice",
+                "agent_type": "specialized",
+                "content": "Invoice processed",
+                "timestamp": created_at,
+                "metadata": {}
+            })
+            if i % 10 == 0:
+                extraction_docs.append({
+                    "plan_id": plan_id,
+                    "success": True,
+                    "invoice_data": {"vendor_name": f"Vendor {i % 500}", "invoice_number": f"INV-{i:07d}"},
+                    "validation_errors": [],
+                    "approved_by": "user",
+                    "created_at": created_at
+                })
+
+        await db["plans"].insert_many(plan_docs, ordered=False)
+        await db["messages"].insert_many(message_docs, ordered=False)
+        if extraction_docs:
+            await db["invoice_extractions"].insert_many(extraction_docs, ordered=False)
+        print(f"\r  seeded {len(plan_ids):,}/{plans:,} plans", end="", flush=True)
+
+    print()
+    return plan_ids
+
+
+async def time_lookups(plan_ids: list, lookups: int) -> dict:
+    """Milliseconds per call for each lookup (list of samples)."""
+    indices = random.sample(range(len(plan_ids)), min(lookups, len(plan_ids)))
+    queries = {
+        "plan by id": lambda i: PlanRepository.get_by_id(plan_ids[i]),
+        "session plans": lambda i: PlanRepository.get_page(f"session-{i // PLANS_PER_SESSION}"),
+        "plan messages": lambda i: MessageRepository.get_by_plan_id(plan_ids[i]),
+        "plan extraction": lambda i: InvoiceExtractionRepository.get_extraction(plan_ids[i])
+    }
+
+    results = {}
+    for name, query in queries.items():
+        samples = []
+        for i in indices:
+            started = time.perf_counter()
+            await query(i)
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = samples
+    return results
+
+
+def report(label: str, results: dict) -> None:
+    print(f"\n{label}")
+    print(f"{'lookup':<18}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, samples in results.items():
+        ordered = sorted(samples)
+        p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+        print(f"{name:<18}{statistics.median(ordered):>10.2f}{p95:>10.2f}{ordered[-1]:>10.2f}")
+
+
+async def run(args) -> None:
+    MongoDB.client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    MongoDB.database = MongoDB.client[args.database]
+    db = MongoDB.get_database()
+    collections = sorted({spec.collection for spec in INDEX_REGISTRY})
+
+    try:
+        await MongoDB.client.drop_database(args.database)
+        print(f"Seeding {args.plans:,} plans into '{args.database}'...")
+        started = time.perf_counter()
+        plan_ids = await seed(args.plans)
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+
+        # Collection scans: only the _id index
+        for collection in collections:
+            await db[collection].drop_indexes()
+        before = await time_lookups(plan_ids, args.scan_lookups)
+        report(f"WITHOUT INDEXES ({args.scan_lookups} lookups each)", before)
+
+        started = time.perf_counter()
+        result = await ensure_indexes()
+        print(f"\nBuilt {len(result['created'])} indexes in {time.perf_counter() - started:.1f}s")
+        after = await time_lookups(plan_ids, args.lookups)
+        report(f"WITH INDEX REGISTRY ({args.lookups} lookups each)", after)
+
+        print("\nSpeedup (p50):")
+        for name in before:
+            speedup = statistics.median(before[name]) / max(statistics.median(after[name]), 0.001)
+            print(f"  {name:<18}{speedup:>10.0f}x")
+    finally:
+        if not args.keep:
+            await MongoDB.client.drop_database(args.database)
+        MongoDB.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=1_000_000, help="Plans to seed")
+    parser.add_argument("--lookups", type=int, default=200, help="Timed lookups per query with indexes")
+    parser.add_argument("--scan-lookups", type=int, default=10, help="Timed lookups per query without indexes")
+    parser.add_argument("--database", default="macae_benchmark", help="Scratch database (dropped before and after)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("PLAN LOOKUP BENCHMARK")
+    print("=" * 60)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Benchmark WebSocket wire encodings for a simulated plan run.
+
+Reports bytes on the wire and serialization CPU for JSON and MessagePack
+framing, with and without permessage-deflate (emulated with zlib using
+the same raw-deflate + context takeover settings browsers negotiate).
+
+Usage:
+    python benchmark_websocket_encoding.py [--runs 200] [--tokens 400] [--line-items 25]
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.message_codec import (
+    JSON_ENCODING,
+    MSGPACK_ENCODING,
+    encode_message,
+    is_msgpack_available
+)
+
+
+def _timestamp() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def build_plan_run_messages(tokens: int, line_items: int) -> list:
+    """Build the sequence of messages a typical invoice plan sends."""
+    plan_id = str(uuid.uuid4())
+    messages = [{
+        "type": "plan_approval_request",
+        "data": {
+            "id": plan_id,
+            "plan_id": plan_id,
+            "m_plan_id": plan_id,
+            "user_request": "Process this invoice from Acme Corporation for professional services",
+            "status": "pending_approval",
+            "steps": [{
+                "id": "1",
+                "action": "I've analyzed your task: This appears to be an invoice processing task. Routing to Invoice Agent.",
+                "agent": "Planner",
+                "status": "pending"
+            }],
+            "facts": "Routing to: Invoice Agent",
+            "context": {"participant_descriptions": {"Planner": "Analyzing task and creating execution plan"}},
+            "timestamp": _timestamp()
+        }
+    }, {
+        "type": "agent_message",
+        "data": {
+            "agent_name": "Invoice",
+            "content": "📊 Processing invoice extraction...",
+            "status": "in_progress",
+            "timestamp": _timestamp()
+        }
+    }, {
+        "type": "agent_stream_start",
+        "agent": "Invoice",
+        "plan_id": plan_id,
+        "timestamp": _timestamp()
+    }]
+
+    words = ["invoice", "vendor", "payment", "total", "verified", "due", "terms", "amount", "line", "item"]
+    for i in range(tokens):
+        messages.append({
+            "type": "agent_message_streaming",
+            "agent": "Invoice",
+            "content": words[i % len(words)] + " ",
+            "plan_id": plan_id
+        })
+
+    messages.append({
+        "type": "agent_stream_end",
+        "agent": "Invoice",
+        "plan_id": plan_id,
+        "timestamp": _timestamp()
+    })
+
+    invoice_data = {
+        "vendor_name": "Acme Corporation",
+        "vendor_address": "123 Business St, New York, NY 10001",
+        "invoice_number": "INV-2024-001",
+        "invoice_date": "2024-11-15",
+        "due_date": "2024-12-15",
+        "currency": "USD",
+        "subtotal": "5500.00",
+        "tax_amount": "440.00",
+        "discount_amount": None,
+        "total_amount": "5940.00",
+        "line_items": [
+            {
+                "description": f"Professional Services - Consulting block {i}",
+                "quantity": "4",
+                "unit_price": "125.00",
+                "total": "500.00"
+            }
+            for i in range(line_items)
+        ],
+        "payment_terms": "Net 30",
+        "notes": None
+    }
+    messages.append({
+        "type": "extraction_approval_request",
+        "data": {
+            "plan_id": plan_id,
+            "extraction_result": {
+                "success": True,
+                "invoice_data": invoice_data,
+                "validation_errors": ["[Line Items Sum Check] Line items sum (12500.00) doesn't match subtotal (5500.00)"],
+                "extraction_time": 2.13,
+                "model_used": "gemini-2.5-flash-lite"
+            },
+            "visualization_url": f"/api/v3/extraction/{plan_id}/visualize",
+            "timestamp": _timestamp()
+        }
+    })
+    messages.append({
+        "type": "final_result_message",
+        "data": {
+            "content": "Invoice extraction completed and approved.",
+            "status": "completed",
+            "timestamp": _timestamp()
+        }
+    })
+    return messages
+
+
+def measure(messages: list, encoding: str, deflate: bool, runs: int) -> dict:
+    """Encode the plan run `runs` times and collect byte and CPU totals."""
+    wire_bytes = 0
+    start = time.process_time()
+
+    for _ in range(runs):
+        # One compressor per connection: permessage-deflate keeps the window
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS) if deflate else None
+        wire_bytes = 0
+        for message in messages:
+            payload = encode_message(message, encoding)
+            if isinstance(payload, str):
+                payload = payload.encode("utf-8")
+            if compressor:
+                # RFC 7692: strip the trailing 0x00 0x00 0xff 0xff of the sync flush
+                payload = (compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+            wire_bytes += len(payload)
+
+    cpu = time.process_time() - start
+    return {
+        "bytes_per_run": wire_bytes,
+        "cpu_ms_per_run": cpu * 1000 / runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200, help="Plan runs to simulate")
+    parser.add_argument("--tokens", type=int, default=400, help="Streamed LLM tokens per run")
+    parser.add_argument("--line-items", type=int, default=25, help="Line items in the extraction payload")
+    args = parser.parse_args()
+
+    messages = build_plan_run_messages(args.tokens, args.line_items)
+
+    print("=" * 60)
+    print("WEBSOCKET ENCODING BENCHMARK")
+    print(f"{len(messages)} messages per plan run, {args.runs} runs")
+    print("=" * 60)
+
+    encodings = [JSON_ENCODING]
+    if is_msgpack_available():
+        encodings.append(MSGPACK_ENCODING)
+    else:
+        print("⚠️  msgpack not installed - skipping MessagePack rows (pip install msgpack)")
+
+    baseline = None
+    print(f"\n{'mode':<22}{'bytes/run':>12}{'vs json':>10}{'cpu ms/run':>14}")
+    for encoding in encodings:
+        for deflate in (False, True):
+            result = measure(messages, encoding, deflate, args.runs)
+            if baseline is None:
+                baseline = result["bytes_per_run"]
+            label = encoding + (" + deflate" if deflate else "")
+            ratio = result["bytes_per_run"] / baseline
+            print(
+                f"{label:<22}{result['bytes_per_run']:>12,}{ratio:>9.0%}"
+                f"{result['cpu_ms_per_run']:>14.3f}"
+            )
+
+    print("\nCPU includes deflate time where enabled; the client pays the matching inflate cost.")
+
+
+if __name__ == "__main__":
+    main()
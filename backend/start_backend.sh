@@ -12,4 +12,7 @@ fi
 
 # Start the backend server
 echo "✅ Starting backend on port 8000..."
-python3 -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
+python3 -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload \
+    --ws-per-message-deflate "${WS_PER_MESSAGE_DEFLATE:-true}" \
+    --ws-ping-interval "${WS_HEARTBEAT_INTERVAL:-20}" \
+    --ws-ping-timeout "${WS_HEARTBEAT_TIMEOUT:-60}"
@@ -54,6 +54,44 @@ def test_routing():
         print(f"   Expected: {expected_agent}, Got: {actual_agent}")
         print()
     
+    print("Testing parallel fan-out (only explicitly named external systems):\n")
+    
+    fan_out_cases = [
+        ("Reconcile the Zoho invoice against the Salesforce opportunity", ["zoho", "salesforce"]),
+        ("Show me all Zoho invoices for the auditor", ["zoho"]),
+        ("Invoice for month-end closing support", ["invoice"]),
+        (
+            "Process this invoice: Acme Audit LLC, audit services for Q3. Invoice number INV-1001, "
+            "subtotal $4,500.00, total amount $4,860.00, due date 2025-04-30",
+            ["invoice"]
+        ),
+        (
+            "Check this Zoho invoice:\nInvoice number INV-2002\nBill to: Contoso\n"
+            "Description: Salesforce license renewal\nSubtotal $1,000.00\nTotal amount $1,080.00",
+            ["zoho"]
+        ),
+        ("List Zoho customers missing from salesforcedotcom exports", ["zoho"]),
+    ]
+    
+    for task, expected_agents in fan_out_cases:
+        state = AgentState(
+            task_description=task,
+            plan_id="test-plan",
+            messages=[],
+            current_agent="Planner"
+        )
+        
+        result = planner_node(state)
+        actual_agents = result.get("next_agents")
+        
+        status = "✅" if actual_agents == expected_agents else "❌"
+        if actual_agents != expected_agents:
+            all_passed = False
+        
+        print(f"{status} Task: '{task.splitlines()[0][:70]}'")
+        print(f"   Expected: {expected_agents}, Got: {actual_agents}")
+        print()
+    
     print("=" * 60)
     if all_passed:
         print("✅ ALL ROUTING TESTS PASSED")